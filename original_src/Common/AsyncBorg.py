@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# coding: latin-1
+"""
+This module provides an asyncio front end for the PiBorg board modules (Python 3 only)
+
+Use by creating an instance of the asynchronous class, then await the same functions the board provides, e.g.
+import AsyncBorg
+TB = AsyncBorg.AsyncThunderBorg()
+await TB.Init()
+voltage = await TB.GetBatteryReading()
+await TB.SetMotor1(0.5)
+
+An existing board instance can be wrapped instead, e.g.
+TB = AsyncBorg.AsyncThunderBorg(ThunderBorg.ThunderBorg())
+Values are read straight from the wrapped board, e.g. TB.foundChip, to change them use TB.board
+
+Each function call is run on a single worker thread dedicated to the board's I2C bus, so calls happen in order.
+When several tasks await the same Get / Is / Has / Read call at once they share a single bus transaction.
+"""
+
+# Import the libraries we need
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+# Constant values
+COALESCE_PREFIXES           = ('Get', 'Is', 'Has', 'Read')  # Function names which only read from the board
+
+# Shared values used by this module
+executorList                = {}    # Worker for each bus, keyed by bus number
+executorListLock            = threading.Lock()
+
+
+def GetExecutor(busNumber):
+    """
+executor = GetExecutor(busNumber)
+
+Returns the single worker thread executor used for all calls to boards on the given bus, creating it if needed
+    """
+    with executorListLock:
+        executor = executorList.get(busNumber)
+        if executor == None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+            executorList[busNumber] = executor
+        return executor
+
+
+def ShutdownExecutors(wait = True):
+    """
+ShutdownExecutors([wait])
+
+Stops the worker threads for every bus, if wait is True any calls already queued are completed first
+    """
+    with executorListLock:
+        for executor in executorList.values():
+            executor.shutdown(wait)
+        executorList.clear()
+
+
+# Class used to wrap a board for asyncio
+class AsyncBoard:
+    """
+This class wraps a blocking board object, or module, so its functions can be awaited
+
+board                   The blocking board object, or module, calls are forwarded to
+coalesce                True to share one transaction between concurrent awaits of the same Get / Is / Has / Read call
+pending                 Calls currently in progress which may be shared, keyed by function name and parameters
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.coalesce = True
+        self.pending = {}
+
+
+    def Call(self, name, *args, **kwargs):
+        """
+future = Call(name, *args, **kwargs)
+
+Queues board.name(*args, **kwargs) on the worker for the board's bus and returns an awaitable for the result
+Must be called from a coroutine or callback running in the event loop
+Under most circumstances you should call the function by name on this object instead, e.g. await TB.GetMotor1()
+        """
+        loop = asyncio.get_running_loop()
+        key = (name, args, tuple(sorted(kwargs.items())))
+        if self.coalesce and name.startswith(COALESCE_PREFIXES):
+            future = self.pending.get(key)
+            if future == None:
+                future = self.Submit(loop, name, args, kwargs)
+                self.pending[key] = future
+                future.add_done_callback(lambda done: self.pending.pop(key, None))
+            # Shielded so one awaiting task being cancelled does not cancel the shared call for the others
+            return asyncio.shield(future)
+        else:
+            return self.Submit(loop, name, args, kwargs)
+
+
+    def Submit(self, loop, name, args, kwargs = None):
+        """
+future = Submit(loop, name, args, [kwargs])
+
+Runs board.name(*args, **kwargs) on the worker for the board's bus, use Call instead
+        """
+        if kwargs == None:
+            kwargs = {}
+        function = functools.partial(getattr(self.board, name), *args, **kwargs)
+        executor = GetExecutor(self.board.busNumber)
+        return loop.run_in_executor(executor, function)
+
+
+    def __getattr__(self, name):
+        if name == 'board':
+            raise AttributeError(name)
+        value = getattr(self.board, name)
+        if not callable(value):
+            return value
+
+        def CallBoard(*args, **kwargs):
+            return self.Call(name, *args, **kwargs)
+        CallBoard.__name__ = name
+        CallBoard.__doc__ = value.__doc__
+        self.__dict__[name] = CallBoard
+        return CallBoard
+
+
+class AsyncThunderBorg(AsyncBoard):
+    """
+Asynchronous version of ThunderBorg.ThunderBorg, a new board is created if one is not supplied
+    """
+
+    def __init__(self, board = None):
+        if board == None:
+            import ThunderBorg
+            board = ThunderBorg.ThunderBorg()
+        AsyncBoard.__init__(self, board)
+
+
+class AsyncZeroBorg(AsyncBoard):
+    """
+Asynchronous version of ZeroBorg.ZeroBorg, a new board is created if one is not supplied
+    """
+
+    def __init__(self, board = None):
+        if board == None:
+            import ZeroBorg
+            board = ZeroBorg.ZeroBorg()
+        AsyncBoard.__init__(self, board)
+
+
+class AsyncPicoBorgRev(AsyncBoard):
+    """
+Asynchronous version of PicoBorgRev.PicoBorgRev, a new board is created if one is not supplied
+    """
+
+    def __init__(self, board = None):
+        if board == None:
+            import PicoBorgRev
+            board = PicoBorgRev.PicoBorgRev()
+        AsyncBoard.__init__(self, board)
+
+
+class AsyncDiablo(AsyncBoard):
+    """
+Asynchronous version of Diablo.Diablo, a new board is created if one is not supplied
+    """
+
+    def __init__(self, board = None):
+        if board == None:
+            import Diablo
+            board = Diablo.Diablo()
+        AsyncBoard.__init__(self, board)
+
+
+class AsyncUltraBorg(AsyncBoard):
+    """
+Asynchronous version of UltraBorg.UltraBorg, a new board is created if one is not supplied
+    """
+
+    def __init__(self, board = None):
+        if board == None:
+            import UltraBorg
+            board = UltraBorg.UltraBorg()
+        AsyncBoard.__init__(self, board)
+
+
+class AsyncXLoBorg(AsyncBoard):
+    """
+Asynchronous version of the XLoBorg module functions, e.g.
+XLB = AsyncBorg.AsyncXLoBorg()
+await XLB.Init()
+x, y, z = await XLB.ReadAccelerometer()
+An XLoBorg.XLoBorg instance can be passed as board to use the class instead of the module functions
+    """
+
+    def __init__(self, board = None):
+        if board == None:
+            import XLoBorg
+            board = XLoBorg
+        AsyncBoard.__init__(self, board)
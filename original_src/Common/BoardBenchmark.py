@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module measures the Python side cost of every public function of the PiBorg board modules
+
+Run it directly to benchmark everything and save the results, e.g.
+python BoardBenchmark.py --output before.json
+python BoardBenchmark.py --output after.json --compare before.json
+
+Or use it from Python, e.g.
+import BoardBenchmark
+results = BoardBenchmark.RunBenchmarks(calls = 1000, boards = ['ThunderBorg', 'UltraBorg'])
+BoardBenchmark.SaveResults(results, 'tb-ub.json')
+
+Every board is attached to an emulated bus with an EchoDevice, which answers each read with the command byte
+and zeros, so the numbers are the cost of the board module and transport with no hardware or emulation time.
+For each function the results give:
+calls                   Number of calls timed
+callsPerSecond          Calls completed per second
+p50                     Median time for a single call, in seconds
+p99                     99th percentile time for a single call, in seconds
+retainedBlocksPerCall   Memory blocks still allocated after the calls, per call (None if not supported)
+peakBytesPerCall        Highest extra memory in use during a single call, in bytes (None if not supported)
+
+Functions which wait for an EEPROM write are only called slowCalls times, as the wait dominates their cost.
+Results are saved as JSON with sorted keys, so runs from different versions can be compared with diff.
+"""
+
+# Import the libraries we need
+from __future__ import print_function
+import sys
+import gc
+import json
+import inspect
+import platform
+import BoardEmulator
+import I2CBus
+
+# Best clock available for timing short calls
+try:
+    timer = I2CBus.time.perf_counter
+except AttributeError:
+    timer = I2CBus.time.time
+
+# Memory tracing, not available before Python 3.4
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# Constant values
+BOARD_CLASSES = {
+    'ThunderBorg': ('ThunderBorg', 'ThunderBorg'),
+    'ZeroBorg': ('ZeroBorg', 'ZeroBorg'),
+    'PicoBorgRev': ('PicoBorgRev', 'PicoBorgRev'),
+    'Diablo': ('Diablo', 'Diablo'),
+    'UltraBorg': ('UltraBorg', 'UltraBorg'),
+    'XLoBorg': ('XLoBorg', None),           # Module level functions
+}
+SKIPPED_FUNCTIONS           = ['Init', 'InitBusOnly', 'Help', 'Print', 'NoPrint']
+SLOW_PREFIXES               = ('SetBatteryMonitoringLimits', 'SetServoMinimum', 'SetServoMaximum', 'SetServoStartup')
+MEMORY_CALLS                = 20    # Calls used for each memory measurement
+
+# Replies the EchoDevice gives instead of zeros, needed where a board keeps values read during Init
+# Each entry is the name of the command in the board module and the reply values after the command byte
+ECHO_REPLIES = {
+    'UltraBorg': [
+        ('COMMAND_GET_PWM_MIN_1', [0x07, 0xD0]),    # 2000
+        ('COMMAND_GET_PWM_MIN_2', [0x07, 0xD0]),
+        ('COMMAND_GET_PWM_MIN_3', [0x07, 0xD0]),
+        ('COMMAND_GET_PWM_MIN_4', [0x07, 0xD0]),
+        ('COMMAND_GET_PWM_MAX_1', [0x0F, 0xA0]),    # 4000
+        ('COMMAND_GET_PWM_MAX_2', [0x0F, 0xA0]),
+        ('COMMAND_GET_PWM_MAX_3', [0x0F, 0xA0]),
+        ('COMMAND_GET_PWM_MAX_4', [0x0F, 0xA0]),
+    ],
+}
+
+# Values used for each parameter name, as functions of the board being tested
+PARAMETER_VALUES = {
+    'power': lambda board: 0.5,
+    'power1': lambda board: 0.5,
+    'power2': lambda board: -0.5,
+    'power3': lambda board: 0.25,
+    'power4': lambda board: -0.25,
+    'state': lambda board: True,
+    'r': lambda board: 1.0,
+    'g': lambda board: 0.5,
+    'b': lambda board: 0.0,
+    'b0': lambda board: 0,
+    'b1': lambda board: 0,
+    'b2': lambda board: 0,
+    'b3': lambda board: 0,
+    'colours': lambda board: [[1.0, 0.5, 0.0]] * 4,
+    'counts': lambda board: 100,
+    'timeout': lambda board: 1,
+    'minimum': lambda board: 7.0,
+    'maximum': lambda board: 35.0,
+    'position': lambda board: 0.5,
+    'position1': lambda board: 0.5,
+    'position2': lambda board: -0.5,
+    'position3': lambda board: 0.25,
+    'position4': lambda board: -0.25,
+    'pwmLevel': lambda board: 3000,
+    'command': lambda board: 0x99,          # COMMAND_GET_ID, the same on every board
+    'data': lambda board: [],
+    'length': lambda board: 4,
+    'reply': lambda board: bytearray([0x99, 0, 0, 0]),
+    'function': lambda board: board.GetServoPosition1,
+    'sequence': lambda board: [[1.0, 1.0], [1.0, -1.0], [-1.0, -1.0], [-1.0, 1.0]],
+    'frames': lambda board: board.CompilePhaseTable([[1.0, -1.0]])[0],
+    'count': lambda board: 1,
+    'setFunction': lambda board: board.SetServoPosition1,
+    'getFunction': lambda board: board.GetServoPosition1,
+    'value': lambda board: 0.5,
+}
+
+# Default user settings
+printFunction = None
+slowCalls = 5
+
+
+def Print(message):
+    """
+Print(message)
+
+Wrapper used by the BoardBenchmark module to print messages, will call printFunction if set, print otherwise
+    """
+    if printFunction == None:
+        print(message)
+    else:
+        printFunction(message)
+
+
+def NoPrint(message):
+    """
+NoPrint(message)
+
+Does nothing, intended for disabling diagnostic printout by using:
+BoardBenchmark.printFunction = BoardBenchmark.NoPrint
+    """
+    pass
+
+
+# Class used as the fake transport for benchmarking
+class EchoDevice(BoardEmulator.EmulatedDevice):
+    """
+This class stands in for the bus device, answering every read with the last command byte followed by zeros
+It does as little work as possible so the benchmarks measure the board modules rather than the emulation
+
+replies                 Reply values to give instead of zeros, keyed by (address, command)
+    """
+
+    def __init__(self):
+        BoardEmulator.EmulatedDevice.__init__(self)
+        self.command = 0
+        self.replies = {}
+
+
+    def write(self, frame):
+        self.transactionCount += 1
+        self.command = bytearray(frame[:1])[0]
+        return len(frame)
+
+
+    def readinto(self, buffer):
+        self.transactionCount += 1
+        return self.EchoReply(buffer)
+
+
+    def EchoReply(self, buffer):
+        length = len(buffer)
+        reply = bytearray((self.command,)) + self.replies.get((self.address, self.command), b'')[:length - 1]
+        buffer[:length] = reply + bytearray(length - len(reply))
+        return length
+
+
+    def Transfer(self, address, frame, buffer):
+        self.transactionCount += 1
+        self.address = address
+        self.command = bytearray(frame[:1])[0]
+        return self.EchoReply(buffer)
+
+
+def InstallEchoBus(busNumber = 1):
+    """
+bus = InstallEchoBus([busNumber])
+
+Installs an emulated bus for busNumber which uses an EchoDevice, see BoardEmulator.InstallBus
+    """
+    bus = BoardEmulator.InstallBus(busNumber)
+    bus.device = EchoDevice()
+    return bus
+
+
+def GetParameters(function):
+    """
+names = GetParameters(function)
+
+Returns the names of the parameters a function needs, not including self or parameters with defaults
+    """
+    try:
+        spec = inspect.getfullargspec(function)
+    except AttributeError:
+        spec = inspect.getargspec(function)
+    names = list(spec.args)
+    if inspect.ismethod(function):
+        names = names[1:]
+    if spec.defaults:
+        names = names[:-len(spec.defaults)]
+    return names
+
+
+def GetFunctions(board):
+    """
+functions = GetFunctions(board)
+
+Returns a list of (name, function, arguments) for every public function of a board object or module to benchmark
+Functions taking parameters without a value in PARAMETER_VALUES are left out
+    """
+    functions = []
+    for name in sorted(dir(board)):
+        if name.startswith('_') or not name[0].isupper() or name in SKIPPED_FUNCTIONS:
+            continue
+        function = getattr(board, name)
+        if not (inspect.ismethod(function) or inspect.isfunction(function)):
+            continue
+        if inspect.isfunction(function) and getattr(function, '__module__', None) != getattr(board, '__name__', None):
+            continue
+        parameters = GetParameters(function)
+        if [parameter for parameter in parameters if parameter not in PARAMETER_VALUES]:
+            Print('Skipping %s, unknown parameters %s' % (name, ', '.join(parameters)))
+            continue
+        arguments = tuple(PARAMETER_VALUES[parameter](board) for parameter in parameters)
+        functions.append((name, function, arguments))
+    return functions
+
+
+def Percentile(times, fraction):
+    """
+value = Percentile(times, fraction)
+
+Returns the value at fraction (0 to 1) of the way through a sorted list of times
+    """
+    index = int(fraction * (len(times) - 1) + 0.5)
+    return times[index]
+
+
+def MeasureMemory(function, arguments):
+    """
+retainedBlocks, peakBytes = MeasureMemory(function, arguments)
+
+Measures the memory blocks kept and the peak extra memory used per call, both are None if tracemalloc is not available
+    """
+    if tracemalloc == None:
+        return None, None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*arguments)
+        startBlocks = sys.getallocatedblocks()
+        peakBytes = 0
+        for i in range(MEMORY_CALLS):
+            # Clearing the traces also resets the peak
+            tracemalloc.clear_traces()
+            function(*arguments)
+            peakBytes += tracemalloc.get_traced_memory()[1]
+        retainedBlocks = sys.getallocatedblocks() - startBlocks
+    finally:
+        tracemalloc.stop()
+    return float(retainedBlocks) / MEMORY_CALLS, float(peakBytes) / MEMORY_CALLS
+
+
+def MeasureFunction(function, arguments, calls):
+    """
+result = MeasureFunction(function, arguments, calls)
+
+Times calls calls of function(*arguments), returning the result dictionary described in the module help
+    """
+    function(*arguments)
+    times = [0.0] * calls
+    runStart = timer()
+    for i in range(calls):
+        start = timer()
+        function(*arguments)
+        times[i] = timer() - start
+    runTime = timer() - runStart
+    times.sort()
+    retainedBlocks, peakBytes = MeasureMemory(function, arguments)
+    return {'calls': calls,
+            'callsPerSecond': calls / runTime,
+            'p50': Percentile(times, 0.50),
+            'p99': Percentile(times, 0.99),
+            'retainedBlocksPerCall': retainedBlocks,
+            'peakBytesPerCall': peakBytes}
+
+
+def CreateBoard(name, busNumber):
+    """
+board = CreateBoard(name, busNumber)
+
+Imports the module for a board name from BOARD_CLASSES and returns an initialised board object, or the module itself
+    """
+    moduleName, className = BOARD_CLASSES[name]
+    module = __import__(moduleName)
+    module.printFunction = NoPrint
+    if className == None:
+        BoardEmulator.UseEmulatedSMBus(module)
+        module.busNumber = busNumber
+        module.Init(False)
+        return module
+    board = getattr(module, className)()
+    board.printFunction = board.NoPrint
+    board.busNumber = busNumber
+    device = I2CBus.GetBus(busNumber).device
+    for command, reply in ECHO_REPLIES.get(name, []):
+        device.replies[(board.i2cAddress, getattr(module, command))] = bytearray(reply)
+    board.Init(False)
+    return board
+
+
+def RunBenchmarks(calls = 1000, boards = None, busNumber = 1):
+    """
+results = RunBenchmarks([calls], [boards], [busNumber])
+
+Benchmarks every public function of each board named in boards, all of BOARD_CLASSES if not given
+Each function is called calls times, EEPROM writing functions are called slowCalls times instead
+Returns a dictionary keyed by '<board>.<function>' of result dictionaries, plus an 'environment' entry
+    """
+    if boards == None:
+        boards = sorted(BOARD_CLASSES.keys())
+    bus = InstallEchoBus(busNumber)
+    results = {}
+    for name in boards:
+        board = CreateBoard(name, busNumber)
+        for functionName, function, arguments in GetFunctions(board):
+            if functionName.startswith(SLOW_PREFIXES):
+                count = slowCalls
+            else:
+                count = calls
+            result = MeasureFunction(function, arguments, count)
+            results['%s.%s' % (name, functionName)] = result
+            Print('%-40s %10.0f calls/s  p50 %7.1f us  p99 %7.1f us' % (
+                    '%s.%s' % (name, functionName), result['callsPerSecond'], result['p50'] * 1e6, result['p99'] * 1e6))
+    results['environment'] = {'python': platform.python_version(),
+                              'implementation': platform.python_implementation(),
+                              'machine': platform.machine(),
+                              'transactions': bus.device.transactionCount}
+    return results
+
+
+def SaveResults(results, path):
+    """
+SaveResults(results, path)
+
+Writes results from RunBenchmarks to a JSON file at path, keys are sorted so files can be compared with diff
+    """
+    with open(path, 'w') as resultFile:
+        json.dump(results, resultFile, indent = 1, sort_keys = True)
+        resultFile.write('\n')
+
+
+def LoadResults(path):
+    """
+results = LoadResults(path)
+
+Reads results saved by SaveResults
+    """
+    with open(path, 'r') as resultFile:
+        return json.load(resultFile)
+
+
+def CompareResults(old, new, threshold = 0.1):
+    """
+changes = CompareResults(old, new, [threshold])
+
+Compares the p50 times of two sets of results, printing every function which changed by more than threshold (0.1 = 10%)
+Returns a dictionary of new p50 / old p50 ratios keyed by function, for functions in both sets of results
+    """
+    changes = {}
+    for name in sorted(new.keys()):
+        if name == 'environment' or name not in old:
+            continue
+        ratio = new[name]['p50'] / old[name]['p50']
+        changes[name] = ratio
+        if abs(ratio - 1.0) > threshold:
+            if ratio < 1.0:
+                Print('%-40s %5.1fx faster' % (name, 1.0 / ratio))
+            else:
+                Print('%-40s %5.1fx slower' % (name, ratio))
+    return changes
+
+
+# Auto-run code if this script is loaded directly
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description = 'Benchmarks the PiBorg board modules against a fake I2C bus')
+    parser.add_argument('--calls', type = int, default = 1000, help = 'calls timed for each function')
+    parser.add_argument('--board', action = 'append', choices = sorted(BOARD_CLASSES.keys()), help = 'board to benchmark, may be repeated, default all')
+    parser.add_argument('--output', help = 'JSON file to save the results to')
+    parser.add_argument('--compare', help = 'JSON file from an earlier run to compare the results with')
+    args = parser.parse_args()
+    results = RunBenchmarks(args.calls, args.board)
+    if args.output:
+        SaveResults(results, args.output)
+    if args.compare:
+        CompareResults(LoadResults(args.compare), results)
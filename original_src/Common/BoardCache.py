@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module provides the read and write caches shared by the PiBorg board classes
+
+The board classes inherit the cache functions from ReadCache, and from WriteCache for the boards which drive motors, e.g.
+class ThunderBorg(BoardCache.ReadCache, BoardCache.WriteCache):
+Each board class sets the tables for its own commands, see ReadCache and WriteCache,
+along with the settings and counters described by the board class itself.
+
+The caches are turned on and off on each board, e.g.
+TB.writeCache = True
+TB.readFromCache = True
+TB.readCache = True
+"""
+
+# Import the libraries we need
+import I2CBus
+
+
+# Class used to add the read cache to a board class
+class ReadCache:
+    """
+This class keeps replies to reads of values which only change when written, used when readCache is True
+
+The board class sets:
+readCacheTtl            Time in seconds each cached reply is kept for, keyed by the GET command
+readCacheInvalidates    Cached replies to forget when a command is sent, keyed by the command sent
+readCacheEntries        Cached reply and time read for each GET command, None until the first reply is kept
+readCacheHits           Number of reads answered from the read cache
+readCacheMisses         Number of reads which could have been cached but had to be read from the board
+    """
+
+    def ForgetReadCache(self, command):
+        """
+ForgetReadCache(command)
+
+Removes the cached replies which sending command would change, see readCacheInvalidates
+        """
+        if self.readCacheEntries:
+            for cached in self.readCacheInvalidates.get(command, []):
+                self.readCacheEntries.pop(cached, None)
+
+
+    def LookupReadCache(self, command, length):
+        """
+reply = LookupReadCache(command, length)
+
+Returns the cached reply for a GET command, or None if it has to be read from the board
+Updates readCacheHits and readCacheMisses for commands which can be cached
+        """
+        ttl = self.readCacheTtl.get(command)
+        if ttl == None:
+            return None
+        if self.readCacheEntries:
+            entry = self.readCacheEntries.get(command)
+            if (entry != None) and (len(entry[0]) >= length) and (I2CBus.monotonic() - entry[1] < ttl):
+                self.readCacheHits += 1
+                return entry[0][:length]
+        self.readCacheMisses += 1
+        return None
+
+
+    def StoreReadCache(self, command, reply):
+        """
+StoreReadCache(command, reply)
+
+Keeps a reply read from the board in the read cache, if command is one which can be cached
+        """
+        if command in self.readCacheTtl:
+            if self.readCacheEntries == None:
+                self.readCacheEntries = {}
+            self.readCacheEntries[command] = (reply, I2CBus.monotonic())
+
+
+    def ResetReadCache(self):
+        """
+ResetReadCache()
+
+Forgets every reply in the read cache and clears readCacheHits and readCacheMisses
+        """
+        self.readCacheEntries = {}
+        self.readCacheHits = 0
+        self.readCacheMisses = 0
+
+
+# Class used to add the write cache to a board class
+class WriteCache:
+    """
+This class keeps the last value sent to each motor and LED as a shadow register
+With writeCache True writes which would not change anything are skipped,
+with readFromCache True reads are answered from the shadow registers, either can be used without the other
+
+The board class sets:
+cachedWrites            Registers set by each cached write and the direction value added before the data (None for no direction)
+cachedReads             Shadow register each cached read is answered from, keyed by the GET command
+cacheInvalidates        Shadow registers each write changes in ways the cache cannot follow
+shadowRegisters         Last value and time sent for each register, keyed by register name, None until the first write
+    """
+
+    def CachedWrite(self, command, data):
+        """
+CachedWrite(command, data)
+
+Sends a raw command to the board through the write cache, used by RawWrite
+If writeCache is True the write is skipped if IsWriteCached shows it would not change anything
+The shadow registers are updated if either writeCache or readFromCache is True
+        """
+        if self.writeCache:
+            # Checked before holding the bus too, so a skipped write does not wait for a turn on a shared bus
+            if self.IsWriteCached(command, data):
+                return
+            with self.i2cBus.Hold(command):
+                if self.IsWriteCached(command, data):
+                    return
+                self.i2cBus.Write(self.i2cAddress, command, data)
+                self.UpdateWriteCache(command, data)
+        elif self.readFromCache:
+            with self.i2cBus.Hold(command):
+                self.i2cBus.Write(self.i2cAddress, command, data)
+                self.UpdateWriteCache(command, data)
+        else:
+            self.i2cBus.Write(self.i2cAddress, command, data)
+
+
+    def IsWriteCached(self, command, data):
+        """
+cached = IsWriteCached(command, data)
+
+Returns True if the write cache shows sending command with data would not change anything on the board
+Every register the command sets must have been sent the same value less than cacheRefresh seconds ago
+        """
+        if (self.shadowRegisters == None) or (command not in self.cachedWrites):
+            return False
+        registers, direction = self.cachedWrites[command]
+        if direction == None:
+            value = list(data)
+        else:
+            value = [direction] + list(data)
+        oldest = I2CBus.monotonic() - self.cacheRefresh
+        for register in registers:
+            shadow = self.shadowRegisters.get(register)
+            if (shadow == None) or (shadow[0] != value) or (shadow[1] < oldest):
+                return False
+        return True
+
+
+    def UpdateWriteCache(self, command, data):
+        """
+UpdateWriteCache(command, data)
+
+Records command with data as sent to the board in the write cache
+        """
+        if self.shadowRegisters == None:
+            self.shadowRegisters = {}
+        for register in self.cacheInvalidates.get(command, []):
+            self.shadowRegisters.pop(register, None)
+        if command in self.cachedWrites:
+            registers, direction = self.cachedWrites[command]
+            if direction == None:
+                value = list(data)
+            else:
+                value = [direction] + list(data)
+            now = I2CBus.monotonic()
+            for register in registers:
+                self.shadowRegisters[register] = (value, now)
+
+
+    def ReadWriteCache(self, command, length):
+        """
+reply = ReadWriteCache(command, length)
+
+Returns the reply a GET command would give based on the write cache, padded to length bytes
+Returns None if the value has not been written less than cacheRefresh seconds ago
+        """
+        if (self.shadowRegisters == None) or (command not in self.cachedReads):
+            return None
+        shadow = self.shadowRegisters.get(self.cachedReads[command])
+        if (shadow == None) or (shadow[1] < I2CBus.monotonic() - self.cacheRefresh):
+            return None
+        reply = bytearray([command] + shadow[0])
+        return reply + bytearray(length - len(reply))
+
+
+    def ResetWriteCache(self):
+        """
+ResetWriteCache()
+
+Forgets all values in the write cache, the next cached writes will all be sent
+        """
+        self.shadowRegisters = {}
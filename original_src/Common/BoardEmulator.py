@@ -0,0 +1,989 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module emulates the PiBorg boards in software, so the board modules can be used without any hardware
+
+Use by installing an emulated bus, attaching emulated boards to it, then using the board modules as normal, e.g.
+import BoardEmulator
+import ThunderBorg
+bus = BoardEmulator.InstallBus(1)
+emulatedTB = bus.Attach(BoardEmulator.EmulatedThunderBorg())
+TB = ThunderBorg.ThunderBorg()
+TB.Init()
+TB.SetMotor1(0.5)
+print(emulatedTB.motors[0])
+
+The XLoBorg module uses smbus, point it at the emulated bus with UseEmulatedSMBus, e.g.
+import XLoBorg
+BoardEmulator.AttachXLoBorg(bus)
+BoardEmulator.UseEmulatedSMBus(XLoBorg)
+XLoBorg.Init()
+The XLoBorg class talks through I2CBus like the other boards, so it only needs AttachXLoBorg
+
+Each emulated bus can add latency to every transaction and inject failures, see EmulatedDevice
+The board modules are imported for their command values, the board directories next to this one are added to the path to find them
+"""
+
+# Import the libraries we need
+import os
+import sys
+import errno
+import random
+import I2CBus
+
+# Constant values
+BOARD_DIRECTORIES           = ['ThunderBorg', 'ZeroBorg', 'PicoBorgRev', 'Diabolo', 'UltraBorg', 'XLoBorg']
+FAILSAFE_TIMEOUT            = 0.25  # Time without any commands before the communications failsafe stops the motors
+ENCODER_COUNTS_PER_SECOND   = 1000  # Encoder counts per second seen by an emulated motor at full power
+
+
+def AddBoardPaths():
+    """
+AddBoardPaths()
+
+Adds the board directories next to the one holding this module to the end of the import path
+    """
+    baseDirectory = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    for directory in BOARD_DIRECTORIES:
+        path = os.path.join(baseDirectory, directory)
+        if os.path.isdir(path) and (path not in sys.path):
+            sys.path.append(path)
+
+AddBoardPaths()
+
+
+def InstallBus(busNumber = 1):
+    """
+bus = InstallBus([busNumber])
+
+Replaces I2C bus busNumber for this process with a new, empty, EmulatedBus
+Boards which call Init or InitBusOnly afterwards will talk to the emulated bus instead of /dev/i2c-<busNumber>
+    """
+    bus = EmulatedBus(busNumber)
+    with I2CBus.busListLock:
+        oldBus = I2CBus.busList.get(busNumber)
+        I2CBus.busList[busNumber] = bus
+    if oldBus != None:
+        oldBus.Close()
+    return bus
+
+
+def AttachXLoBorg(bus, addressAccelerometer = 0x1C, addressCompass = 0x0E):
+    """
+accelerometer, compass = AttachXLoBorg(bus, [addressAccelerometer], [addressCompass])
+
+Attaches an emulated XLoBorg, an accelerometer and a compass chip, to an EmulatedBus
+    """
+    accelerometer = bus.Attach(EmulatedAccelerometer(), addressAccelerometer)
+    compass = bus.Attach(EmulatedCompass(), addressCompass)
+    return accelerometer, compass
+
+
+def UseEmulatedSMBus(module):
+    """
+UseEmulatedSMBus(module)
+
+Points a module which uses smbus, such as XLoBorg, at the emulated buses
+The bus numbers used must have been set up with InstallBus first
+    """
+    module.smbus = EmulatedSMBusModule()
+
+
+# Class used to stand in for /dev/i2c-N
+class EmulatedDevice:
+    """
+This class stands in for the file object of an I2C bus device, passing each transfer to an emulated chip
+
+chips                   Emulated chips on the bus, keyed by address
+address                 The I2C address currently selected
+latency                 Time in seconds added to every transaction
+failureRate             Chance of each transaction failing with an IOError, from 0 to 1
+corruptionRate          Chance of each read returning a reply for the wrong command, from 0 to 1
+failNext                Number of upcoming transactions which will fail with an IOError
+transactionCount        Number of transactions attempted
+random                  Random number generator used for fault injection, seed it for repeatable runs
+    """
+
+    def __init__(self):
+        self.chips = {}
+        self.address = None
+        self.latency = 0.0
+        self.failureRate = 0.0
+        self.corruptionRate = 0.0
+        self.failNext = 0
+        self.transactionCount = 0
+        self.random = random.Random()
+
+
+    def Transaction(self, address):
+        """
+chip = Transaction(address)
+
+Counts a transaction, applies the latency and failure injection, then returns the chip at address
+        """
+        self.transactionCount += 1
+        if self.latency > 0:
+            I2CBus.time.sleep(self.latency)
+        if self.failNext > 0:
+            self.failNext -= 1
+            raise IOError(errno.EIO, 'Emulated I2C failure')
+        if self.failureRate > 0 and self.random.random() < self.failureRate:
+            raise IOError(errno.EIO, 'Emulated I2C failure')
+        chip = self.chips.get(address)
+        if chip == None:
+            raise IOError(errno.EREMOTEIO, 'No emulated device at %02X' % (address))
+        return chip
+
+
+    def Reply(self, chip, buffer):
+        """
+count = Reply(chip, buffer)
+
+Fills buffer with the reply from chip, applying the corruption injection
+        """
+        length = len(buffer)
+        reply = chip.Read(length)
+        if self.corruptionRate > 0 and self.random.random() < self.corruptionRate:
+            reply[0] ^= 0xFF
+        buffer[:length] = reply
+        return length
+
+
+    def write(self, frame):
+        chip = self.Transaction(self.address)
+        chip.Write(bytearray(frame))
+        return len(frame)
+
+
+    def readinto(self, buffer):
+        chip = self.Transaction(self.address)
+        return self.Reply(chip, buffer)
+
+
+    def Transfer(self, address, frame, buffer):
+        """
+count = Transfer(address, frame, buffer)
+
+Emulates a combined write then read (I2C_RDWR) as a single transaction
+        """
+        chip = self.Transaction(address)
+        chip.Write(bytearray(frame))
+        return self.Reply(chip, buffer)
+
+
+    def close(self):
+        pass
+
+
+# Class used to replace I2CBus.I2CBus with an emulated bus
+class EmulatedBus(I2CBus.I2CBus):
+    """
+This class behaves like I2CBus.I2CBus, but talks to emulated chips instead of a bus device
+
+device                  The EmulatedDevice holding the emulated chips, latency and failure settings
+    """
+
+    def __init__(self, busNumber):
+        I2CBus.I2CBus.__init__(self, busNumber, EmulatedDevice())
+        self.processLock = False
+
+
+    def Attach(self, chip, address = None):
+        """
+chip = Attach(chip, [address])
+
+Attaches an emulated chip to the bus, if address is not given the chip's default address is used
+        """
+        if address == None:
+            address = chip.defaultAddress
+        chip.bus = self
+        chip.address = address
+        self.device.chips[address] = chip
+        return chip
+
+
+    def Detach(self, address):
+        """
+Detach(address)
+
+Removes the emulated chip at address from the bus
+        """
+        chip = self.device.chips.pop(address, None)
+        if chip != None:
+            chip.bus = None
+
+
+    def MoveChip(self, chip, newAddress):
+        """
+MoveChip(chip, newAddress)
+
+Moves an emulated chip to a new address, as done by COMMAND_SET_I2C_ADD
+        """
+        self.device.chips.pop(chip.address, None)
+        self.Attach(chip, newAddress)
+
+
+    def SelectAddress(self, address):
+        """
+SelectAddress(address)
+
+Points the emulated device at the given I2C slave address
+        """
+        self.address = address
+        self.device.address = address
+
+
+    def ReadCombined(self, address, command, length):
+        """
+reply = ReadCombined(address, command, length)
+
+Sends a command byte to the chip at address and reads length bytes back as a single emulated transaction
+Raises ValueError if length is more than I2C_FRAME_MAX_LEN, as the real bus does
+        """
+        if length > I2CBus.I2C_FRAME_MAX_LEN:
+            raise ValueError('Cannot read %d bytes, the most a single read can be is %d' % (length, I2CBus.I2C_FRAME_MAX_LEN))
+        self.Acquire()
+        try:
+            self.writeFrame[0] = command
+            count = self.device.Transfer(address, self.writeViews[1], self.readViews[length])
+            return self.readFrame[:count]
+        finally:
+            self.Release()
+
+
+    def SetCombinedReads(self, state):
+        """
+SetCombinedReads(state)
+
+Sets if Read should use single combined transactions (True) or a separate write and read (False)
+        """
+        self.combinedReads = state
+
+
+# Classes used to stand in for the smbus module
+class EmulatedSMBusModule:
+    """
+This class stands in for the smbus module, see UseEmulatedSMBus
+    """
+
+    def SMBus(self, busNumber):
+        bus = I2CBus.GetBus(busNumber)
+        return EmulatedSMBus(bus)
+
+
+class EmulatedSMBus:
+    """
+This class provides the smbus.SMBus calls used by the PiBorg modules on top of an EmulatedBus
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+
+
+    def write_byte(self, address, value):
+        with self.bus:
+            self.bus.SelectAddress(address)
+            self.bus.device.write(bytearray([value]))
+
+
+    def write_byte_data(self, address, register, value):
+        with self.bus:
+            self.bus.SelectAddress(address)
+            self.bus.device.write(bytearray([register, value]))
+
+
+    def read_byte(self, address):
+        buffer = bytearray(1)
+        with self.bus:
+            self.bus.SelectAddress(address)
+            self.bus.device.readinto(buffer)
+        return buffer[0]
+
+
+    def read_byte_data(self, address, register):
+        return self.read_i2c_block_data(address, register, 1)[0]
+
+
+    def read_i2c_block_data(self, address, register, length):
+        buffer = bytearray(length)
+        with self.bus:
+            self.bus.device.Transfer(address, bytearray([register]), buffer)
+        return list(buffer)
+
+
+# Base class for all emulated chips
+class EmulatedChip:
+    """
+Base class for an emulated device on the I2C bus
+
+defaultAddress          Address used when attached without giving one
+bus                     The EmulatedBus the chip is attached to
+address                 The address the chip is attached at
+    """
+
+    defaultAddress          = 0x00
+
+    def __init__(self):
+        self.bus = None
+        self.address = self.defaultAddress
+
+
+    def Write(self, data):
+        """
+Write(data)
+
+Called for every frame written to the chip, data is a bytearray
+        """
+        pass
+
+
+    def Read(self, length):
+        """
+reply = Read(length)
+
+Called for every read from the chip, returns a bytearray of length bytes
+        """
+        return bytearray(length)
+
+
+# Base class for the PiBorg command protocol
+class EmulatedBoard(EmulatedChip):
+    """
+Base class for an emulated PiBorg board
+Writes are a command byte followed by its data, reads return the command byte followed by the reply to the last GET
+
+board                   The board module the command values are taken from
+boardId                 The value returned for COMMAND_GET_ID, the default address is the board class's i2cAddress
+getCommands             Functions returning the reply values for each GET command, keyed by command
+setCommands             Functions called with the data for each SET command, keyed by command
+commandCounts           Number of times each command has been received, keyed by command
+failsafe                True if the communications failsafe is enabled
+    """
+
+    def __init__(self, board, boardId, address):
+        EmulatedChip.__init__(self)
+        self.board = board
+        self.boardId = boardId
+        self.defaultAddress = address
+        self.address = address
+        self.reply = bytearray()
+        self.commandCounts = {}
+        self.failsafe = False
+        self.lastCommand = I2CBus.monotonic()
+        self.getCommands = {board.COMMAND_GET_ID: lambda: [self.boardId]}
+        self.setCommands = {board.COMMAND_SET_I2C_ADD: self.SetAddress}
+
+
+    def Write(self, data):
+        command = data[0]
+        self.commandCounts[command] = self.commandCounts.get(command, 0) + 1
+        self.CheckFailsafe()
+        if command in self.getCommands:
+            self.reply = bytearray([command] + list(self.getCommands[command]()))
+        elif command in self.setCommands:
+            self.setCommands[command](data[1:])
+
+
+    def Read(self, length):
+        reply = self.reply[:length]
+        if len(reply) < length:
+            reply += bytearray(length - len(reply))
+        return reply
+
+
+    def CheckFailsafe(self):
+        """
+CheckFailsafe()
+
+Stops the motors if the failsafe is enabled and the board has not been commanded recently
+        """
+        now = I2CBus.monotonic()
+        if self.failsafe and (now - self.lastCommand) > FAILSAFE_TIMEOUT:
+            self.MotorsOff()
+        self.lastCommand = now
+
+
+    def MotorsOff(self):
+        """
+MotorsOff()
+
+Stops all motors, overridden by boards with motors
+        """
+        pass
+
+
+    def SetAddress(self, data):
+        if self.bus != None:
+            self.bus.MoveChip(self, data[0])
+
+
+    def SetFailsafe(self, data):
+        self.failsafe = (data[0] != self.board.COMMAND_VALUE_OFF)
+
+
+    def GetFailsafe(self):
+        return [self.OnOff(self.failsafe)]
+
+
+    def OnOff(self, state):
+        """
+value = OnOff(state)
+
+Converts a True / False state to the board's on / off value
+        """
+        if state:
+            return self.board.COMMAND_VALUE_ON
+        else:
+            return self.board.COMMAND_VALUE_OFF
+
+
+# Base class for the boards which drive motors
+class EmulatedMotorBoard(EmulatedBoard):
+    """
+Base class for an emulated PiBorg motor controller
+
+motors                  [direction, pwm] for each motor, in command order (A, B, ...)
+epoLatched              True if the emergency power off has been tripped
+epoIgnore               True if the emergency power off is being ignored
+    """
+
+    def __init__(self, board, boardId, address, motorCount):
+        EmulatedBoard.__init__(self, board, boardId, address)
+        self.motors = [[board.COMMAND_VALUE_FWD, 0] for i in range(motorCount)]
+        self.epoLatched = False
+        self.epoIgnore = False
+        self.setCommands[board.COMMAND_ALL_OFF] = lambda data: self.MotorsOff()
+        self.setCommands[board.COMMAND_SET_FAILSAFE] = self.SetFailsafe
+        self.getCommands[board.COMMAND_GET_FAILSAFE] = self.GetFailsafe
+
+
+    def AddMotorCommands(self, index, setForward, setReverse, get):
+        """
+AddMotorCommands(index, setForward, setReverse, get)
+
+Adds the commands for a single motor
+        """
+        self.setCommands[setForward] = lambda data: self.SetMotor(index, self.board.COMMAND_VALUE_FWD, data[0])
+        self.setCommands[setReverse] = lambda data: self.SetMotor(index, self.board.COMMAND_VALUE_REV, data[0])
+        self.getCommands[get] = lambda: self.motors[index]
+
+
+    def AddAllMotorCommands(self, setForward, setReverse):
+        """
+AddAllMotorCommands(setForward, setReverse)
+
+Adds the commands which set every motor at once
+        """
+        self.setCommands[setForward] = lambda data: self.SetAllMotors(self.board.COMMAND_VALUE_FWD, data[0])
+        self.setCommands[setReverse] = lambda data: self.SetAllMotors(self.board.COMMAND_VALUE_REV, data[0])
+
+
+    def AddEpoCommands(self):
+        """
+AddEpoCommands()
+
+Adds the emergency power off commands
+        """
+        board = self.board
+        self.setCommands[board.COMMAND_RESET_EPO] = lambda data: setattr(self, 'epoLatched', False)
+        self.getCommands[board.COMMAND_GET_EPO] = lambda: [self.OnOff(self.epoLatched)]
+        self.setCommands[board.COMMAND_SET_EPO_IGNORE] = lambda data: setattr(self, 'epoIgnore', data[0] != board.COMMAND_VALUE_OFF)
+        self.getCommands[board.COMMAND_GET_EPO_IGNORE] = lambda: [self.OnOff(self.epoIgnore)]
+
+
+    def CanMove(self):
+        """
+state = CanMove()
+
+Returns False if the motors are being held off by the emergency power off
+        """
+        return self.epoIgnore or not self.epoLatched
+
+
+    def SetMotor(self, index, direction, pwm):
+        if self.CanMove():
+            self.motors[index] = [direction, pwm]
+
+
+    def SetAllMotors(self, direction, pwm):
+        for index in range(len(self.motors)):
+            self.SetMotor(index, direction, pwm)
+
+
+    def MotorsOff(self):
+        for motor in self.motors:
+            motor[0] = self.board.COMMAND_VALUE_FWD
+            motor[1] = 0
+
+
+    def TripEpo(self):
+        """
+TripEpo()
+
+Emulates the emergency power off switch being broken
+        """
+        self.epoLatched = True
+        if not self.epoIgnore:
+            self.MotorsOff()
+
+
+# Base class for the boards with encoder moves
+class EmulatedEncoderBoard(EmulatedMotorBoard):
+    """
+Base class for an emulated PiBorg motor controller with encoder based moves
+
+encoderMode             True if encoder move mode is enabled
+encoderSpeed            PWM limit used for encoder moves
+moveEnds                Time each motor will finish its current encoder move
+encoderRate             Encoder counts per second seen by a motor at full power
+    """
+
+    def __init__(self, board, boardId, address):
+        EmulatedMotorBoard.__init__(self, board, boardId, address, 2)
+        self.encoderMode = False
+        self.encoderSpeed = board.PWM_MAX
+        self.moveEnds = [0.0, 0.0]
+        self.encoderRate = ENCODER_COUNTS_PER_SECOND
+        self.AddMotorCommands(0, board.COMMAND_SET_A_FWD, board.COMMAND_SET_A_REV, board.COMMAND_GET_A)
+        self.AddMotorCommands(1, board.COMMAND_SET_B_FWD, board.COMMAND_SET_B_REV, board.COMMAND_GET_B)
+        self.AddAllMotorCommands(board.COMMAND_SET_ALL_FWD, board.COMMAND_SET_ALL_REV)
+        self.AddEpoCommands()
+        self.setCommands[board.COMMAND_SET_ENC_MODE] = lambda data: setattr(self, 'encoderMode', data[0] != board.COMMAND_VALUE_OFF)
+        self.getCommands[board.COMMAND_GET_ENC_MODE] = lambda: [self.OnOff(self.encoderMode)]
+        self.setCommands[board.COMMAND_MOVE_A_FWD] = lambda data: self.EncoderMove([0], data)
+        self.setCommands[board.COMMAND_MOVE_A_REV] = lambda data: self.EncoderMove([0], data)
+        self.setCommands[board.COMMAND_MOVE_B_FWD] = lambda data: self.EncoderMove([1], data)
+        self.setCommands[board.COMMAND_MOVE_B_REV] = lambda data: self.EncoderMove([1], data)
+        self.setCommands[board.COMMAND_MOVE_ALL_FWD] = lambda data: self.EncoderMove([0, 1], data)
+        self.setCommands[board.COMMAND_MOVE_ALL_REV] = lambda data: self.EncoderMove([0, 1], data)
+        self.getCommands[board.COMMAND_GET_ENC_MOVING] = lambda: [self.OnOff(self.IsMoving())]
+        self.setCommands[board.COMMAND_SET_ENC_SPEED] = lambda data: setattr(self, 'encoderSpeed', data[0])
+        self.getCommands[board.COMMAND_GET_ENC_SPEED] = lambda: [self.encoderSpeed]
+
+
+    def EncoderMove(self, indexes, data):
+        if not (self.encoderMode and self.CanMove()):
+            return
+        counts = (data[0] << 8) + data[1]
+        speed = max(self.encoderSpeed, 1) / float(self.board.PWM_MAX)
+        moveEnd = I2CBus.monotonic() + counts / (self.encoderRate * speed)
+        for index in indexes:
+            self.moveEnds[index] = moveEnd
+
+
+    def IsMoving(self):
+        now = I2CBus.monotonic()
+        for moveEnd in self.moveEnds:
+            if moveEnd > now:
+                return True
+        return False
+
+
+    def MotorsOff(self):
+        EmulatedMotorBoard.MotorsOff(self)
+        self.moveEnds = [0.0, 0.0]
+
+
+class EmulatedThunderBorg(EmulatedMotorBoard):
+    """
+Emulated ThunderBorg
+
+leds                    [r, g, b] for LED 1 and LED 2
+ledShowBattery          True if the LEDs are showing the battery level
+batteryVoltage          Voltage returned for battery readings
+batteryLimits           [minimum, maximum] raw battery monitoring limits
+driveFaults             Drive fault state for each motor
+externalLeds            [b, g, r] levels for each external LED, as set by the last SetExternalLedColours
+    """
+
+    def __init__(self):
+        import ThunderBorg as board
+        EmulatedMotorBoard.__init__(self, board, board.I2C_ID_THUNDERBORG, board.ThunderBorg.i2cAddress, 2)
+        self.leds = [[0, 0, 0], [0, 0, 0]]
+        self.ledShowBattery = True
+        self.batteryVoltage = 12.0
+        self.batteryLimits = [int(board.BATTERY_MIN_DEFAULT * 0xFF / board.VOLTAGE_PIN_MAX),
+                              int(board.BATTERY_MAX_DEFAULT * 0xFF / board.VOLTAGE_PIN_MAX)]
+        self.driveFaults = [False, False]
+        self.externalLeds = []
+        self.AddMotorCommands(0, board.COMMAND_SET_A_FWD, board.COMMAND_SET_A_REV, board.COMMAND_GET_A)
+        self.AddMotorCommands(1, board.COMMAND_SET_B_FWD, board.COMMAND_SET_B_REV, board.COMMAND_GET_B)
+        self.AddAllMotorCommands(board.COMMAND_SET_ALL_FWD, board.COMMAND_SET_ALL_REV)
+        self.setCommands[board.COMMAND_SET_LED1] = lambda data: self.SetLeds([0], data)
+        self.getCommands[board.COMMAND_GET_LED1] = lambda: self.leds[0]
+        self.setCommands[board.COMMAND_SET_LED2] = lambda data: self.SetLeds([1], data)
+        self.getCommands[board.COMMAND_GET_LED2] = lambda: self.leds[1]
+        self.setCommands[board.COMMAND_SET_LEDS] = lambda data: self.SetLeds([0, 1], data)
+        self.setCommands[board.COMMAND_SET_LED_BATT_MON] = lambda data: setattr(self, 'ledShowBattery', data[0] != board.COMMAND_VALUE_OFF)
+        self.getCommands[board.COMMAND_GET_LED_BATT_MON] = lambda: [self.OnOff(self.ledShowBattery)]
+        self.getCommands[board.COMMAND_GET_DRIVE_A_FAULT] = lambda: [self.OnOff(self.driveFaults[0])]
+        self.getCommands[board.COMMAND_GET_DRIVE_B_FAULT] = lambda: [self.OnOff(self.driveFaults[1])]
+        self.getCommands[board.COMMAND_GET_BATT_VOLT] = self.GetBattery
+        self.setCommands[board.COMMAND_SET_BATT_LIMITS] = lambda data: setattr(self, 'batteryLimits', [data[0], data[1]])
+        self.getCommands[board.COMMAND_GET_BATT_LIMITS] = lambda: self.batteryLimits
+        self.setCommands[board.COMMAND_WRITE_EXTERNAL_LED] = self.WriteExternalLed
+
+
+    def SetLeds(self, indexes, data):
+        for index in indexes:
+            self.leds[index] = [data[0], data[1], data[2]]
+
+
+    def GetBattery(self):
+        level = (self.batteryVoltage - self.board.VOLTAGE_PIN_CORRECTION) / self.board.VOLTAGE_PIN_MAX
+        raw = max(0, min(self.board.COMMAND_ANALOG_MAX, int(level * self.board.COMMAND_ANALOG_MAX + 0.5)))
+        return [(raw >> 8) & 0xFF, raw & 0xFF]
+
+
+    def WriteExternalLed(self, data):
+        if data[0] == 0:
+            # Start marker
+            self.externalLeds = []
+        else:
+            self.externalLeds.append([data[1], data[2], data[3]])
+
+
+class EmulatedZeroBorg(EmulatedMotorBoard):
+    """
+Emulated ZeroBorg
+
+led                     True if the LED is on
+ledIr                   True if the LED is showing IR messages
+newIr                   True if an IR message has arrived since the last GetIrMessage
+irMessage               Bytes of the last IR message, see ReceiveIr
+analog                  Voltages returned for analog ports 1 and 2
+    """
+
+    def __init__(self):
+        import ZeroBorg as board
+        EmulatedMotorBoard.__init__(self, board, board.I2C_ID_ZEROBORG, board.ZeroBorg.i2cAddress, 4)
+        self.led = False
+        self.ledIr = True
+        self.newIr = False
+        self.irMessage = bytearray(board.IR_MAX_BYTES)
+        self.analog = [0.0, 0.0]
+        self.AddMotorCommands(0, board.COMMAND_SET_A_FWD, board.COMMAND_SET_A_REV, board.COMMAND_GET_A)
+        self.AddMotorCommands(1, board.COMMAND_SET_B_FWD, board.COMMAND_SET_B_REV, board.COMMAND_GET_B)
+        self.AddMotorCommands(2, board.COMMAND_SET_C_FWD, board.COMMAND_SET_C_REV, board.COMMAND_GET_C)
+        self.AddMotorCommands(3, board.COMMAND_SET_D_FWD, board.COMMAND_SET_D_REV, board.COMMAND_GET_D)
+        self.AddAllMotorCommands(board.COMMAND_SET_ALL_FWD, board.COMMAND_SET_ALL_REV)
+        self.AddEpoCommands()
+        self.setCommands[board.COMMAND_SET_LED] = lambda data: setattr(self, 'led', data[0] != board.COMMAND_VALUE_OFF)
+        self.getCommands[board.COMMAND_GET_LED] = lambda: [self.OnOff(self.led)]
+        self.setCommands[board.COMMAND_SET_LED_IR] = lambda data: setattr(self, 'ledIr', data[0] != board.COMMAND_VALUE_OFF)
+        self.getCommands[board.COMMAND_GET_LED_IR] = lambda: [self.OnOff(self.ledIr)]
+        self.getCommands[board.COMMAND_GET_NEW_IR] = lambda: [self.OnOff(self.newIr)]
+        self.getCommands[board.COMMAND_GET_LAST_IR] = self.GetIr
+        self.getCommands[board.COMMAND_GET_ANALOG_1] = lambda: self.GetAnalog(0)
+        self.getCommands[board.COMMAND_GET_ANALOG_2] = lambda: self.GetAnalog(1)
+
+
+    def ReceiveIr(self, message):
+        """
+ReceiveIr(message)
+
+Emulates an IR message arriving, message is a hexadecimal string as returned by ZeroBorg.GetIrMessage
+        """
+        raw = bytearray.fromhex(message)[:self.board.IR_MAX_BYTES]
+        self.irMessage = raw + bytearray(self.board.IR_MAX_BYTES - len(raw))
+        self.newIr = True
+
+
+    def GetIr(self):
+        self.newIr = False
+        return self.irMessage
+
+
+    def GetAnalog(self, index):
+        raw = max(0, min(self.board.COMMAND_ANALOG_MAX, int(self.analog[index] / 3.3 * self.board.COMMAND_ANALOG_MAX + 0.5)))
+        return [(raw >> 8) & 0xFF, raw & 0xFF]
+
+
+class EmulatedPicoBorgRev(EmulatedEncoderBoard):
+    """
+Emulated PicoBorg Reverse
+
+led                     True if the LED is on
+driveFault              Drive fault state
+    """
+
+    def __init__(self):
+        import PicoBorgRev as board
+        EmulatedEncoderBoard.__init__(self, board, board.I2C_ID_PICOBORG_REV, board.PicoBorgRev.i2cAddress)
+        self.led = False
+        self.driveFault = False
+        self.setCommands[board.COMMAND_SET_LED] = lambda data: setattr(self, 'led', data[0] != board.COMMAND_VALUE_OFF)
+        self.getCommands[board.COMMAND_GET_LED] = lambda: [self.OnOff(self.led)]
+        self.getCommands[board.COMMAND_GET_DRIVE_FAULT] = lambda: [self.OnOff(self.driveFault)]
+
+
+class EmulatedDiablo(EmulatedEncoderBoard):
+    """
+Emulated Diablo
+
+enabled                 True if the motor drives are enabled
+    """
+
+    def __init__(self):
+        import Diablo as board
+        EmulatedEncoderBoard.__init__(self, board, board.I2C_ID_DIABLO, board.Diablo.i2cAddress)
+        self.enabled = True
+        self.setCommands[board.COMMAND_SET_ENABLED] = lambda data: setattr(self, 'enabled', data[0] != board.COMMAND_VALUE_OFF)
+        self.getCommands[board.COMMAND_GET_ENABLED] = lambda: [self.OnOff(self.enabled)]
+
+
+    def CanMove(self):
+        return self.enabled and EmulatedEncoderBoard.CanMove(self)
+
+
+class EmulatedUltraBorg(EmulatedBoard):
+    """
+Emulated UltraBorg
+
+distances               Distance in millimeters seen by each ultrasonic module, None for no object in range
+attached                True for each ultrasonic module which is attached, unattached modules read as 0
+distanceNoise           Standard deviation in millimeters of the noise added to each raw reading
+filterFactor            Fraction of each new reading added to the filtered readings
+filtered                Current filtered time in microseconds for each ultrasonic module
+pwm                     Current PWM level for each servo
+pwmMinimum              Minimum PWM level for each servo (EEPROM)
+pwmMaximum              Maximum PWM level for each servo (EEPROM)
+pwmStartup              Startup PWM level for each servo (EEPROM)
+    """
+
+    def __init__(self):
+        import UltraBorg as board
+        EmulatedBoard.__init__(self, board, board.I2C_ID_SERVO_USM, board.UltraBorg.i2cAddress)
+        self.distances = [None, None, None, None]
+        self.attached = [True, True, True, True]
+        self.distanceNoise = 0.0
+        self.filterFactor = 0.25
+        self.filtered = [None, None, None, None]
+        self.pwmMinimum = [board.PWM_MIN] * 4
+        self.pwmMaximum = [board.PWM_MAX] * 4
+        self.pwmStartup = [board.PWM_UNSET] * 4
+        self.pwm = [(board.PWM_MIN + board.PWM_MAX) // 2] * 4
+        rawCommands = [board.COMMAND_GET_TIME_USM1, board.COMMAND_GET_TIME_USM2, board.COMMAND_GET_TIME_USM3, board.COMMAND_GET_TIME_USM4]
+        filterCommands = [board.COMMAND_GET_FILTER_USM1, board.COMMAND_GET_FILTER_USM2, board.COMMAND_GET_FILTER_USM3, board.COMMAND_GET_FILTER_USM4]
+        setCommands = [board.COMMAND_SET_PWM1, board.COMMAND_SET_PWM2, board.COMMAND_SET_PWM3, board.COMMAND_SET_PWM4]
+        getCommands = [board.COMMAND_GET_PWM1, board.COMMAND_GET_PWM2, board.COMMAND_GET_PWM3, board.COMMAND_GET_PWM4]
+        calibrateCommands = [board.COMMAND_CALIBRATE_PWM1, board.COMMAND_CALIBRATE_PWM2, board.COMMAND_CALIBRATE_PWM3, board.COMMAND_CALIBRATE_PWM4]
+        for index in range(4):
+            self.AddServoCommands(index, rawCommands[index], filterCommands[index], setCommands[index], getCommands[index], calibrateCommands[index])
+            self.AddLimitCommands(self.pwmMinimum, index, getattr(board, 'COMMAND_SET_PWM_MIN_%d' % (index + 1)), getattr(board, 'COMMAND_GET_PWM_MIN_%d' % (index + 1)))
+            self.AddLimitCommands(self.pwmMaximum, index, getattr(board, 'COMMAND_SET_PWM_MAX_%d' % (index + 1)), getattr(board, 'COMMAND_GET_PWM_MAX_%d' % (index + 1)))
+            self.AddLimitCommands(self.pwmStartup, index, getattr(board, 'COMMAND_SET_PWM_BOOT_%d' % (index + 1)), getattr(board, 'COMMAND_GET_PWM_BOOT_%d' % (index + 1)))
+
+
+    def AddServoCommands(self, index, getRaw, getFiltered, setPwm, getPwm, calibratePwm):
+        self.getCommands[getRaw] = lambda: self.Split(self.ReadUltrasonic(index)[0])
+        self.getCommands[getFiltered] = lambda: self.Split(self.ReadUltrasonic(index)[1])
+        self.setCommands[setPwm] = lambda data: self.SetPwm(index, (data[0] << 8) + data[1], True)
+        self.setCommands[calibratePwm] = lambda data: self.SetPwm(index, (data[0] << 8) + data[1], False)
+        self.getCommands[getPwm] = lambda: self.Split(self.pwm[index])
+
+
+    def AddLimitCommands(self, values, index, setCommand, getCommand):
+        def SetLimit(data):
+            values[index] = (data[0] << 8) + data[1]
+        self.setCommands[setCommand] = SetLimit
+        self.getCommands[getCommand] = lambda: self.Split(values[index])
+
+
+    def Split(self, value):
+        """
+[high, low] = Split(value)
+
+Splits a 16 bit value into bytes, most significant first
+        """
+        value = int(value)
+        return [(value >> 8) & 0xFF, value & 0xFF]
+
+
+    def ReadUltrasonic(self, index):
+        """
+raw, filtered = ReadUltrasonic(index)
+
+Takes a new reading from an ultrasonic module, returning the raw and filtered times in microseconds
+        """
+        if not self.attached[index]:
+            return 0, 0
+        distance = self.distances[index]
+        if distance == None:
+            self.filtered[index] = None
+            return 0xFFFF, 0xFFFF
+        if self.distanceNoise > 0:
+            distance += self.bus.device.random.gauss(0.0, self.distanceNoise)
+        raw = max(1, min(0xFFFE, distance / self.board.USM_US_TO_MM))
+        if self.filtered[index] == None:
+            self.filtered[index] = raw
+        else:
+            self.filtered[index] += (raw - self.filtered[index]) * self.filterFactor
+        return raw, self.filtered[index]
+
+
+    def SetPwm(self, index, level, checkLimits):
+        if checkLimits:
+            low = min(self.pwmMinimum[index], self.pwmMaximum[index])
+            high = max(self.pwmMinimum[index], self.pwmMaximum[index])
+            level = max(low, min(high, level))
+        self.pwm[index] = level
+
+
+# Base class for the register based chips used on the XLoBorg
+class EmulatedRegisterChip(EmulatedChip):
+    """
+Base class for an emulated chip with auto-incrementing registers
+A write sets the register pointer then writes any following bytes, a read returns registers from the pointer onwards
+
+registers               Current register values
+pointer                 Register the next read or write will use
+    """
+
+    def __init__(self):
+        EmulatedChip.__init__(self)
+        self.registers = bytearray(256)
+        self.pointer = 0
+
+
+    def Write(self, data):
+        self.pointer = data[0]
+        for value in data[1:]:
+            self.WriteRegister(self.pointer, value)
+            self.pointer = (self.pointer + 1) & 0xFF
+
+
+    def Read(self, length):
+        self.Update()
+        reply = bytearray(length)
+        for i in range(length):
+            reply[i] = self.registers[self.pointer]
+            self.pointer = (self.pointer + 1) & 0xFF
+        return reply
+
+
+    def WriteRegister(self, register, value):
+        self.registers[register] = value
+
+
+    def Update(self):
+        """
+Update()
+
+Called before each read to refresh the measurement registers
+        """
+        pass
+
+
+    def SetSigned8(self, register, value):
+        self.registers[register] = int(max(-128, min(127, value))) & 0xFF
+
+
+    def SetSigned16(self, register, value):
+        value = int(max(-32768, min(32767, value))) & 0xFFFF
+        self.registers[register] = value >> 8
+        self.registers[register + 1] = value & 0xFF
+
+
+class EmulatedAccelerometer(EmulatedRegisterChip):
+    """
+Emulated MMA8452Q accelerometer, as used on the XLoBorg
+Samples are taken at the data rate set in CTRL_REG1 while active, the status shows when a new sample is ready
+and when one was overwritten before being read, reading the X register clears them
+
+acceleration            [x, y, z] acceleration in G
+samples                 Number of samples taken since the chip last went active
+    """
+
+    defaultAddress          = 0x1C
+
+    REG_STATUS              = 0x00
+    REG_WHO_AM_I            = 0x0D
+    REG_XYZ_DATA_CFG        = 0x0E
+    REG_CTRL_REG1           = 0x2A
+    WHO_AM_I                = 0x2A
+    DATA_RATES              = [800.0, 400.0, 200.0, 100.0, 50.0, 12.5, 6.25, 1.56]
+
+    def __init__(self):
+        EmulatedRegisterChip.__init__(self)
+        self.acceleration = [0.0, 0.0, 1.0]
+        self.registers[self.REG_WHO_AM_I] = self.WHO_AM_I
+        self.activeTime = 0.0
+        self.samples = 0
+        self.samplesRead = 0
+
+
+    def WriteRegister(self, register, value):
+        if register == self.REG_CTRL_REG1 and (value & 0x01) and not (self.registers[register] & 0x01):
+            # Going active, the first sample is ready one sample period later
+            self.activeTime = I2CBus.monotonic()
+            self.samples = 0
+            self.samplesRead = 0
+        self.registers[register] = value
+
+
+    def Read(self, length):
+        reply = EmulatedRegisterChip.Read(self, length)
+        start = (self.pointer - length) & 0xFF
+        if start <= 0x01 < start + length:
+            self.samplesRead = self.samples
+        return reply
+
+
+    def Update(self):
+        control = self.registers[self.REG_CTRL_REG1]
+        if control & 0x01:
+            rate = self.DATA_RATES[(control >> 3) & 0x07]
+            self.samples = int((I2CBus.monotonic() - self.activeTime) * rate)
+        unread = self.samples - self.samplesRead
+        if unread > 1:
+            self.registers[self.REG_STATUS] = 0xFF
+        elif unread == 1:
+            self.registers[self.REG_STATUS] = 0x0F
+        else:
+            self.registers[self.REG_STATUS] = 0x00
+        fullScale = 2 << (self.registers[self.REG_XYZ_DATA_CFG] & 0x03)
+        x, y, z = self.acceleration
+        if self.registers[self.REG_CTRL_REG1] & 0x02:
+            # Fast read, 8 bit values
+            countsPerG = 128.0 / fullScale
+            self.SetSigned8(0x01, x * countsPerG)
+            self.SetSigned8(0x02, y * countsPerG)
+            self.SetSigned8(0x03, z * countsPerG)
+        else:
+            # 12 bit values, left justified
+            countsPerG = 2048.0 / fullScale
+            self.SetSigned16(0x01, int(x * countsPerG) << 4)
+            self.SetSigned16(0x03, int(y * countsPerG) << 4)
+            self.SetSigned16(0x05, int(z * countsPerG) << 4)
+
+
+class EmulatedCompass(EmulatedRegisterChip):
+    """
+Emulated MAG3110 magnetometer, as used on the XLoBorg
+
+field                   [x, y, z] magnetic field in raw counts
+temperature             Die temperature in degrees Celsius
+    """
+
+    defaultAddress          = 0x0E
+
+    REG_DR_STATUS           = 0x00
+    REG_WHO_AM_I            = 0x07
+    REG_DIE_TEMP            = 0x0F
+    WHO_AM_I                = 0xC4
+
+    def __init__(self):
+        EmulatedRegisterChip.__init__(self)
+        self.field = [0, 0, 0]
+        self.temperature = 20
+        self.registers[self.REG_WHO_AM_I] = self.WHO_AM_I
+
+
+    def Update(self):
+        x, y, z = self.field
+        self.SetSigned16(0x01, x)
+        self.SetSigned16(0x03, y)
+        self.SetSigned16(0x05, z)
+        self.SetSigned8(self.REG_DIE_TEMP, self.temperature)
+        self.registers[self.REG_DR_STATUS] = 0x0F
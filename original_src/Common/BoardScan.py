@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module scans I2C buses for all of the PiBorg boards in a single pass
+
+Use by calling ScanForBoards with the bus numbers to check, e.g.
+import BoardScan
+boards = BoardScan.ScanForBoards([0, 1])
+for address, names in boards[1].items():
+    print('%02X is a %s' % (address, ' or '.join(names)))
+
+Each address on each bus is sent COMMAND_GET_ID once and the reply checked against every known board identifier.
+Buses are scanned in parallel, one thread per bus.
+The result is stored in an inventory file so later scans only need to check the boards are still there.
+A bus is fully scanned again once its last full scan is older than inventoryMaxAge, so newly added boards are found.
+
+printFunction           Function reference to call when printing text, if None "print" is used
+inventoryPath           File used to store the last scan results for each bus
+inventoryMaxAge         Time in seconds a full scan is trusted for before the whole bus is scanned again
+"""
+
+# Import the libraries we need
+from __future__ import print_function
+import os
+import json
+import threading
+import time
+import I2CBus
+
+# Constant values
+COMMAND_GET_ID              = 0x99  # Get the board identifier, the same for every board
+I2C_ID_LEN                  = 4     # Shortest reply length used by any of the boards
+ADDRESS_FIRST               = 0x03
+ADDRESS_LAST                = 0x77
+
+# Board identifiers, matching the I2C_ID_* values in each board module
+# Note that the ThunderBorg and PicoBorg Reverse use the same identifier
+BOARD_IDS = {
+    0x15: ['ThunderBorg', 'PicoBorgRev'],
+    0x36: ['UltraBorg'],
+    0x37: ['Diablo'],
+    0x40: ['ZeroBorg'],
+}
+
+# Default user settings
+printFunction = None
+inventoryPath = os.path.expanduser('~/.piborg-inventory.json')
+inventoryMaxAge = 3600.0
+
+
+def Print(message):
+    """
+Print(message)
+
+Wrapper used by the BoardScan module to print messages, will call printFunction if set, print otherwise
+    """
+    if printFunction == None:
+        print(message)
+    else:
+        printFunction(message)
+
+
+def NoPrint(message):
+    """
+NoPrint(message)
+
+Does nothing, intended for disabling diagnostic printout by using:
+BoardScan.printFunction = BoardScan.NoPrint
+    """
+    pass
+
+
+def IdentifyAddress(bus, address):
+    """
+names = IdentifyAddress(bus, address)
+
+Asks the device at address on an I2CBus for its identifier
+Returns a list of the board names it could be, or None if there is no PiBorg board at that address
+    """
+    try:
+        i2cRecv = bus.Read(address, COMMAND_GET_ID, I2C_ID_LEN)
+    except KeyboardInterrupt:
+        raise
+    except:
+        return None
+    if len(i2cRecv) == I2C_ID_LEN and i2cRecv[0] == COMMAND_GET_ID:
+        return BOARD_IDS.get(i2cRecv[1])
+    else:
+        return None
+
+
+def ScanBus(busNumber, addresses = None):
+    """
+boards = ScanBus(busNumber, [addresses])
+
+Scans a single I2C bus and returns a dictionary of board names lists, keyed by address
+If addresses is given only those addresses are checked, otherwise 0x03 to 0x77 are checked
+The bus is held for the whole scan, so other users of the bus wait until it is finished
+    """
+    if addresses == None:
+        addresses = range(ADDRESS_FIRST, ADDRESS_LAST + 1)
+    boards = {}
+    try:
+        bus = I2CBus.GetBus(busNumber)
+    except KeyboardInterrupt:
+        raise
+    except:
+        Print('Could not open I2C bus #%d' % (busNumber))
+        return boards
+    with bus:
+        for address in addresses:
+            names = IdentifyAddress(bus, address)
+            if names:
+                boards[address] = names
+    return boards
+
+
+def ReadInventoryFile():
+    """
+stored = ReadInventoryFile()
+
+Reads the inventory file at inventoryPath as stored, returns an empty dictionary if there is no inventory
+    """
+    try:
+        with open(inventoryPath, 'r') as inventoryFile:
+            return json.load(inventoryFile)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def LoadInventory():
+    """
+inventory = LoadInventory()
+
+Reads the last scan results from inventoryPath, returns a dictionary keyed by bus number
+Each entry is a dictionary of board name lists keyed by address, an empty dictionary is returned if there is no inventory
+    """
+    inventory = {}
+    for busNumber, boards in ReadInventoryFile().items():
+        if busNumber.isdigit():
+            inventory[int(busNumber)] = dict((int(address), names) for address, names in boards.items())
+    return inventory
+
+
+def LoadScanTimes():
+    """
+scanTimes = LoadScanTimes()
+
+Reads the time, from time.time, each bus in the inventory was last fully scanned, returns a dictionary keyed by bus number
+Buses recorded by older versions of this module have no time, so are fully scanned by the next ScanForBoards
+    """
+    stored = ReadInventoryFile().get('fullScanTimes', {})
+    return dict((int(busNumber), scanTime) for busNumber, scanTime in stored.items())
+
+
+def SaveInventory(inventory, scanTimes = None):
+    """
+SaveInventory(inventory, [scanTimes])
+
+Writes scan results, a dictionary keyed by bus number as returned by ScanForBoards, to inventoryPath
+scanTimes is the time each bus was last fully scanned, keyed by bus number, see LoadScanTimes
+    """
+    stored = {}
+    for busNumber, boards in inventory.items():
+        stored[str(busNumber)] = dict((str(address), names) for address, names in boards.items())
+    if scanTimes:
+        stored['fullScanTimes'] = dict((str(busNumber), scanTime) for busNumber, scanTime in scanTimes.items())
+    try:
+        with open(inventoryPath, 'w') as inventoryFile:
+            json.dump(stored, inventoryFile, indent = 1, sort_keys = True)
+    except (IOError, OSError):
+        Print('Failed writing the board inventory to %s' % (inventoryPath))
+
+
+def ScanForBoards(busNumbers = [1], useInventory = True):
+    """
+boards = ScanForBoards([busNumbers], [useInventory])
+
+Scans each I2C bus in busNumbers for PiBorg boards, using one thread per bus
+Returns a dictionary keyed by bus number, each entry is a dictionary of board name lists keyed by address, e.g.
+{1: {0x15: ['ThunderBorg', 'PicoBorgRev'], 0x36: ['UltraBorg']}}
+A board identifier shared by more than one type of board gives all of the possible names
+
+If useInventory is True (the default) a bus found in the inventory only has its recorded addresses checked,
+the full scan is only done if a recorded board is missing or has changed,
+or if the last full scan of the bus is more than inventoryMaxAge seconds old
+Boards added to a bus are not seen by the quick check, so are found by the next full scan,
+pass useInventory as False to look for them straight away
+The inventory is updated with the results
+    """
+    inventory = LoadInventory()
+    scanTimes = LoadScanTimes()
+    results = {}
+
+    def ScanOneBus(busNumber):
+        known = inventory.get(busNumber)
+        now = time.time()
+        scanned = scanTimes.get(busNumber)
+        # A clock which has gone backwards since the last full scan counts as out of date too
+        recent = (scanned != None) and (0 <= now - scanned < inventoryMaxAge)
+        if useInventory and known and recent:
+            boards = ScanBus(busNumber, sorted(known.keys()))
+            if boards == known:
+                results[busNumber] = boards
+                return
+            Print('I2C bus #%d has changed since the last scan' % (busNumber))
+        results[busNumber] = ScanBus(busNumber)
+        scanTimes[busNumber] = now
+
+    threads = []
+    for busNumber in busNumbers:
+        thread = threading.Thread(target = ScanOneBus, args = (busNumber,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    for busNumber in busNumbers:
+        boards = results[busNumber]
+        if len(boards) == 0:
+            Print('No boards found on I2C bus #%d' % (busNumber))
+        for address in sorted(boards.keys()):
+            Print('Found %s at %02X (bus #%d)' % (' or '.join(boards[address]), address, busNumber))
+        inventory[busNumber] = boards
+    SaveInventory(inventory, scanTimes)
+    return results
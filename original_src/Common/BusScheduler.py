@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module shares an I2C bus between boards by priority, so motor commands are not held up by sensor reads or LED updates
+
+Use by creating a scheduler for the bus and attaching each board after it has been initialised, e.g.
+import BusScheduler
+import ThunderBorg
+import UltraBorg
+TB = ThunderBorg.ThunderBorg()
+TB.Init()
+UB = UltraBorg.UltraBorg()
+UB.Init()
+scheduler = BusScheduler.GetScheduler(TB.busNumber)
+scheduler.Attach(TB)
+scheduler.Attach(UB)
+scheduler.SetRateBudget(BusScheduler.PRIORITY_COSMETIC, 20)
+...
+print(scheduler.GetStatistics())
+
+The board functions are used exactly as before, every RawWrite / RawRead asks the scheduler for a turn on the bus.
+When the bus is busy the waiting transfers go in priority order, earliest deadline first within a priority:
+PRIORITY_SAFETY         Motor, servo, failsafe and EPO commands
+PRIORITY_SENSOR         Readings from the boards
+PRIORITY_COSMETIC       LED commands
+Each priority can be given a rate budget, transfers over budget wait until the budget allows them.
+A transfer which finishes after its deadline is counted as missed.
+Cosmetic transfers which are already late are moved up alongside the sensor readings.
+Boards keep a group of transfers together with "with bus.Hold(command):", the group gets the priority of command.
+A plain "with bus:" hold has no command to go by, so it waits as cosmetic.
+
+The XLoBorg module functions talk to the bus through smbus, so cannot be attached, an XLoBorg.XLoBorg instance can.
+"""
+
+# Import the libraries we need
+import threading
+import I2CBus
+
+# Constant values
+PRIORITY_SAFETY             = 0
+PRIORITY_SENSOR             = 1
+PRIORITY_COSMETIC           = 2
+PRIORITY_NAMES              = ['safety', 'sensor', 'cosmetic']
+
+# Time in seconds each priority allows from asking for the bus to finishing the transfer
+DEADLINES_DEFAULT = [0.005, 0.050, 0.250]
+
+# Shared values used by this module
+schedulerList               = {}    # BusScheduler for each bus, keyed by bus number
+schedulerListLock           = threading.Lock()
+
+
+def GetScheduler(busNumber = 1):
+    """
+scheduler = GetScheduler([busNumber])
+
+Returns the BusScheduler for the given bus number, creating it the first time it is requested
+    """
+    with schedulerListLock:
+        scheduler = schedulerList.get(busNumber)
+        if scheduler == None:
+            scheduler = BusScheduler(I2CBus.GetBus(busNumber))
+            schedulerList[busNumber] = scheduler
+        return scheduler
+
+
+def GetCommandPriorities(module):
+    """
+priorities = GetCommandPriorities(module)
+
+Works out the priority for each COMMAND_* value in a board module from its name, returns a dictionary keyed by command
+LED commands are cosmetic, other SET / MOVE / CALIBRATE / OFF / RESET commands are safety, everything else is a sensor reading
+    """
+    priorities = {}
+    for name in dir(module):
+        if not name.startswith('COMMAND_') or name.startswith('COMMAND_VALUE_'):
+            continue
+        if 'LED' in name:
+            priority = PRIORITY_COSMETIC
+        elif name.startswith(('COMMAND_SET_', 'COMMAND_MOVE_', 'COMMAND_CALIBRATE_', 'COMMAND_ALL_OFF', 'COMMAND_RESET_')):
+            priority = PRIORITY_SAFETY
+        else:
+            priority = PRIORITY_SENSOR
+        priorities[getattr(module, name)] = priority
+    return priorities
+
+
+# Class used to decide which transfer gets the bus next
+class BusScheduler:
+    """
+This class hands out turns on an I2C bus in priority and deadline order
+
+bus                     The I2CBus being shared
+deadlines               Time in seconds each priority allows for a transfer, indexed by priority
+rates                   Transfers per second allowed for each priority, None for no limit, see SetRateBudget
+missedFunction          Function called with (priority, command, lateness) when a transfer misses its deadline, None for none
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.deadlines = list(DEADLINES_DEFAULT)
+        self.rates = [None, None, None]
+        self.bursts = [1.0, 1.0, 1.0]
+        self.tokens = [1.0, 1.0, 1.0]
+        self.tokenTime = I2CBus.monotonic()
+        self.missedFunction = None
+        self.condition = threading.Condition(threading.Lock())
+        self.pending = []
+        self.sequence = 0
+        self.owner = None
+        self.ownerDepth = 0
+        self.current = None
+        self.busHeld = False
+        self.ResetStatistics()
+
+
+    def Attach(self, board, priorities = None):
+        """
+Attach(board, [priorities])
+
+Routes an initialised board's RawWrite / RawRead calls through the scheduler
+If priorities is given it is a dictionary of priority keyed by command, otherwise GetCommandPriorities is used
+        """
+        if isinstance(board.i2cBus, ScheduledBus):
+            board.i2cBus = board.i2cBus.bus
+        if priorities == None:
+            priorities = GetCommandPriorities(__import__(board.__class__.__module__))
+        board.i2cBus = ScheduledBus(self, board.i2cBus, priorities)
+
+
+    def Detach(self, board):
+        """
+Detach(board)
+
+Returns a board to using the bus directly
+        """
+        if isinstance(board.i2cBus, ScheduledBus):
+            board.i2cBus = board.i2cBus.bus
+
+
+    def SetRateBudget(self, priority, rate, burst = 1):
+        """
+SetRateBudget(priority, rate, [burst])
+
+Limits a priority to rate transfers per second, with up to burst transfers allowed back to back
+A rate of None removes the limit
+        """
+        with self.condition:
+            self.RefillTokens(I2CBus.monotonic())
+            self.rates[priority] = rate
+            self.bursts[priority] = float(burst)
+            self.tokens[priority] = min(self.tokens[priority], float(burst))
+            self.condition.notify_all()
+
+
+    def RefillTokens(self, now):
+        """
+RefillTokens(now)
+
+Adds the rate budget earned since the last refill, must be called while holding the condition
+        """
+        elapsed = now - self.tokenTime
+        self.tokenTime = now
+        for priority in range(len(self.rates)):
+            rate = self.rates[priority]
+            if rate != None:
+                self.tokens[priority] = min(self.bursts[priority], self.tokens[priority] + rate * elapsed)
+
+
+    def NextRequest(self, now):
+        """
+request, wait = NextRequest(now)
+
+Returns the pending request which should get the bus next, and None for the wait
+If every pending request is over its rate budget returns None and the time until one will be allowed
+Cosmetic requests past their deadline compete as sensor readings, so they cannot be held off for ever
+Must be called while holding the condition
+        """
+        best = None
+        bestKey = None
+        wait = None
+        for request in self.pending:
+            priority = request[0]
+            rate = self.rates[priority]
+            if rate != None and self.tokens[priority] < 1.0:
+                if rate > 0:
+                    needed = (1.0 - self.tokens[priority]) / rate
+                    if wait == None or needed < wait:
+                        wait = needed
+                continue
+            if priority > PRIORITY_SENSOR and request[1] < now:
+                key = [PRIORITY_SENSOR, request[1], request[2]]
+            else:
+                key = request[:3]
+            if best == None or key < bestKey:
+                best = request
+                bestKey = key
+        if best != None:
+            return best, None
+        return None, wait
+
+
+    def Acquire(self, priority, command = None):
+        """
+Acquire(priority, [command])
+
+Waits for a turn on the bus at the given priority, then takes the bus lock
+A thread which already has a turn gets the bus straight away, each call must be matched by a call to Release
+        """
+        thread = threading.current_thread()
+        with self.condition:
+            if self.owner is thread:
+                self.ownerDepth += 1
+                return
+            now = I2CBus.monotonic()
+            self.sequence += 1
+            # [priority, deadline, sequence, requested, command], the order of the first three decides who goes first
+            request = [priority, now + self.deadlines[priority], self.sequence, now, command]
+            self.pending.append(request)
+            while True:
+                now = I2CBus.monotonic()
+                self.RefillTokens(now)
+                if self.owner == None:
+                    best, wait = self.NextRequest(now)
+                    if best is request:
+                        break
+                else:
+                    wait = None
+                self.condition.wait(wait)
+            self.pending.remove(request)
+            if self.rates[priority] != None:
+                self.tokens[priority] -= 1.0
+            self.owner = thread
+            self.ownerDepth = 1
+            self.current = request
+            self.waitTimes[priority] += now - request[3]
+        try:
+            self.bus.Acquire()
+            self.busHeld = True
+        except:
+            self.Release()
+            raise
+
+
+    def Release(self):
+        """
+Release()
+
+Gives up the turn taken by Acquire, letting the next waiting transfer have the bus
+        """
+        with self.condition:
+            self.ownerDepth -= 1
+            if self.ownerDepth > 0:
+                return
+            request = self.current
+            self.current = None
+            self.owner = None
+            if self.busHeld:
+                self.busHeld = False
+                self.bus.Release()
+            now = I2CBus.monotonic()
+            priority = request[0]
+            self.transfers[priority] += 1
+            lateness = now - request[1]
+            if lateness > 0:
+                self.missed[priority] += 1
+                if lateness > self.worstLateness[priority]:
+                    self.worstLateness[priority] = lateness
+            self.condition.notify_all()
+        if lateness > 0 and self.missedFunction != None:
+            self.missedFunction(priority, request[4], lateness)
+
+
+    def GetStatistics(self):
+        """
+stats = GetStatistics()
+
+Returns a dictionary keyed by priority name ('safety', 'sensor', 'cosmetic'), each entry is a dictionary of:
+transfers               Number of turns given out
+missed                  Number of those which finished after their deadline
+worstLateness           Longest time in seconds a transfer finished after its deadline
+waitTime                Total time in seconds spent waiting for a turn
+        """
+        stats = {}
+        for priority in range(len(PRIORITY_NAMES)):
+            stats[PRIORITY_NAMES[priority]] = {'transfers': self.transfers[priority],
+                                               'missed': self.missed[priority],
+                                               'worstLateness': self.worstLateness[priority],
+                                               'waitTime': self.waitTimes[priority]}
+        return stats
+
+
+    def ResetStatistics(self):
+        """
+ResetStatistics()
+
+Clears the counters returned by GetStatistics
+        """
+        self.transfers = [0, 0, 0]
+        self.missed = [0, 0, 0]
+        self.worstLateness = [0.0, 0.0, 0.0]
+        self.waitTimes = [0.0, 0.0, 0.0]
+
+
+# Class given to a board in place of its I2CBus
+class ScheduledBus:
+    """
+This class stands in for an I2CBus, asking the scheduler for a turn before each transfer
+Anything else is passed straight to the real bus
+
+scheduler               The BusScheduler handing out turns
+bus                     The real I2CBus
+priorities              Priority for each command, keyed by command, unknown commands are sensor readings
+holdPriority            Priority used when the bus is held with "with bus:", Hold gives the priority of its command instead
+    """
+
+    def __init__(self, scheduler, bus, priorities):
+        self.scheduler = scheduler
+        self.bus = bus
+        self.priorities = priorities
+        self.holdPriority = PRIORITY_COSMETIC
+
+
+    def Write(self, address, command, data):
+        self.scheduler.Acquire(self.priorities.get(command, PRIORITY_SENSOR), command)
+        try:
+            self.bus.Write(address, command, data)
+        finally:
+            self.scheduler.Release()
+
+
+    def Read(self, address, command, length, delay = 0):
+        self.scheduler.Acquire(self.priorities.get(command, PRIORITY_SENSOR), command)
+        try:
+            return self.bus.Read(address, command, length, delay)
+        finally:
+            self.scheduler.Release()
+
+
+    def ReadCombined(self, address, command, length):
+        self.scheduler.Acquire(self.priorities.get(command, PRIORITY_SENSOR), command)
+        try:
+            return self.bus.ReadCombined(address, command, length)
+        finally:
+            self.scheduler.Release()
+
+
+    def Acquire(self):
+        self.scheduler.Acquire(self.holdPriority)
+
+
+    def Release(self):
+        self.scheduler.Release()
+
+
+    def __enter__(self):
+        self.Acquire()
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.Release()
+
+
+    def Hold(self, command = None):
+        """
+with bus.Hold([command]):
+
+Holds the bus for a group of transfers at the priority of command, or holdPriority if command is not given
+        """
+        if command == None:
+            return ScheduledHold(self.scheduler, self.holdPriority, None)
+        return ScheduledHold(self.scheduler, self.priorities.get(command, PRIORITY_SENSOR), command)
+
+
+    def __getattr__(self, name):
+        if name == 'bus':
+            raise AttributeError(name)
+        return getattr(self.bus, name)
+
+
+# Class given out by ScheduledBus.Hold
+class ScheduledHold:
+    """
+This class takes a turn on the bus at a set priority for the length of a "with" block
+
+scheduler               The BusScheduler handing out turns
+priority                Priority the turn is asked for at
+command                 Command the turn is for, passed to missedFunction, None if not known
+    """
+
+    def __init__(self, scheduler, priority, command):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.command = command
+
+
+    def __enter__(self):
+        self.scheduler.Acquire(self.priority, self.command)
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.scheduler.Release()
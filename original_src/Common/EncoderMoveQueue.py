@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module runs a queue of encoder moves on a PicoBorg Reverse or Diablo from a background thread
+
+Use by creating a queue for an initialised board in encoder move mode, adding moves and starting it, e.g.
+import EncoderMoveQueue
+import PicoBorgRev
+PBR = PicoBorgRev.PicoBorgRev()
+PBR.Init()
+PBR.SetEncoderMoveMode(True)
+moves = EncoderMoveQueue.EncoderMoveQueue(PBR)
+moves.Start()
+moves.Add([(100, 100, 0.5), (-50, 50, 0.25), (200, 200, 1.0)])
+moves.Wait()
+for timing in moves.GetTimings():
+    print(timing)
+moves.Stop()
+
+Each move is (counts1, counts2, speed), counts for motors 1 and 2 and the encoder speed limit from 0 to 1.
+A speed of None keeps the current limit.
+The next move is sent as soon as WaitWhileEncoderMoving sees the last one finish, so the calling thread is free.
+If sending a move or moveFunction raises an exception the queue stops, dropping any moves left, and Wait returns False.
+Call Stop then Start to carry on.
+"""
+
+# Import the libraries we need
+import threading
+import I2CBus
+
+
+# Class used to play queued encoder moves on a board
+class EncoderMoveQueue:
+    """
+This class sends queued encoder moves to a board one after another on a background thread
+
+board                   The PicoBorgRev or Diablo being driven
+timeout                 Time in seconds to wait for each move before giving up, -1 to wait for ever
+moveFunction            Function called with each move's timing once it finishes, None for none
+thread                  The background thread, None when stopped
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.timeout = -1
+        self.moveFunction = None
+        self.thread = None
+        self.moves = []
+        self.busy = False
+        self.timings = []
+        self.moveCount = 0
+        self.lastSpeed = None
+        # Moves are held on the bus as motor commands, so a BusScheduler gives them the motor priority
+        self.holdCommand = getattr(__import__(board.__class__.__module__), 'COMMAND_MOVE_ALL_FWD', None)
+        self.condition = threading.Condition(threading.Lock())
+        self.stopEvent = threading.Event()
+
+
+    def Add(self, moves):
+        """
+Add(moves)
+
+Adds a list of (counts1, counts2, speed) moves to the end of the queue
+        """
+        with self.condition:
+            for counts1, counts2, speed in moves:
+                self.moves.append((int(counts1), int(counts2), speed))
+            self.condition.notify_all()
+
+
+    def AddMove(self, counts1, counts2, speed = None):
+        """
+AddMove(counts1, counts2, [speed])
+
+Adds a single move to the end of the queue
+        """
+        self.Add([(counts1, counts2, speed)])
+
+
+    def Clear(self):
+        """
+Clear()
+
+Drops any queued moves which have not been sent, the move in progress is finished
+        """
+        with self.condition:
+            del self.moves[:]
+            self.condition.notify_all()
+
+
+    def IsBusy(self):
+        """
+busy = IsBusy()
+
+Returns True while there are moves waiting to be sent or a move is in progress
+        """
+        with self.condition:
+            return self.busy or len(self.moves) > 0
+
+
+    def Wait(self, timeout = None):
+        """
+finished = Wait([timeout])
+
+Waits for all queued moves to finish, or for timeout seconds if given
+Returns True if the moves have finished, False if the timeout ran out first or the queue stopped
+        """
+        if timeout != None:
+            endTime = I2CBus.monotonic() + timeout
+        with self.condition:
+            while True:
+                if self.thread != None and self.stopEvent.is_set():
+                    # Stopping, or the thread died part way through, any moves left were dropped
+                    return False
+                if not (self.busy or len(self.moves) > 0):
+                    return True
+                if timeout == None:
+                    self.condition.wait()
+                else:
+                    remaining = endTime - I2CBus.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+
+
+    def GetTimings(self):
+        """
+timings = GetTimings()
+
+Returns the timing of each move finished since the last ResetTimings, oldest first, as dictionaries of:
+index                   Number of the move, counting from 0 for the first move sent
+counts1                 Counts asked for on motor 1
+counts2                 Counts asked for on motor 2
+speed                   Encoder speed limit used, None if it was left unchanged
+gap                     Time in seconds from the previous move being seen to finish to this move being sent
+moveTime                Time in seconds from the move being sent to it being seen to finish
+latency                 Most the finish could have been seen late by, see WaitWhileEncoderMoving
+finished                True if the move finished, False if it timed out or the queue was stopped
+        """
+        with self.condition:
+            return list(self.timings)
+
+
+    def ResetTimings(self):
+        """
+ResetTimings()
+
+Clears the timings returned by GetTimings
+        """
+        with self.condition:
+            del self.timings[:]
+
+
+    def Start(self):
+        """
+Start()
+
+Starts sending moves on a background thread, moves can be added before or after starting
+        """
+        if self.thread != None:
+            return
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target = self.Run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def Stop(self):
+        """
+Stop()
+
+Drops any queued moves, stops the motors and waits for the background thread to finish
+        """
+        if self.thread == None:
+            return
+        self.stopEvent.set()
+        with self.condition:
+            del self.moves[:]
+            self.condition.notify_all()
+        # Stopping the motors ends the move in progress, so the thread is not held up waiting for it
+        self.board.MotorsOff()
+        self.thread.join()
+        self.thread = None
+
+
+    def Run(self):
+        """
+Run()
+
+The sending loop, run by the background thread, use Start instead
+        """
+        try:
+            lastFinish = None
+            while not self.stopEvent.is_set():
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+                    while len(self.moves) == 0 and not self.stopEvent.is_set():
+                        # Nothing to do, the next move is sent whenever it arrives
+                        lastFinish = None
+                        self.condition.wait()
+                    if self.stopEvent.is_set():
+                        break
+                    counts1, counts2, speed = self.moves.pop(0)
+                    self.busy = True
+                sendTime = self.SendMove(counts1, counts2, speed)
+                finished = self.board.WaitWhileEncoderMoving(self.timeout) and not self.stopEvent.is_set()
+                finishTime = I2CBus.monotonic()
+                if lastFinish == None:
+                    gap = 0.0
+                else:
+                    gap = sendTime - lastFinish
+                lastFinish = finishTime
+                timing = {'index': self.moveCount,
+                          'counts1': counts1,
+                          'counts2': counts2,
+                          'speed': speed,
+                          'gap': gap,
+                          'moveTime': finishTime - sendTime,
+                          'latency': 0.0,
+                          'finished': finished}
+                if finished:
+                    timing['moveTime'] = self.board.encoderMoveTime
+                    timing['latency'] = self.board.encoderLatency
+                self.moveCount += 1
+                with self.condition:
+                    self.timings.append(timing)
+                if self.moveFunction != None:
+                    self.moveFunction(timing)
+        finally:
+            # Also reached if a move or moveFunction raises, so Wait is not left waiting for moves which will never be sent
+            self.stopEvent.set()
+            with self.condition:
+                self.busy = False
+                del self.moves[:]
+                self.condition.notify_all()
+
+
+    def SendMove(self, counts1, counts2, speed):
+        """
+sendTime = SendMove(counts1, counts2, speed)
+
+Sends the speed limit and encoder move commands for a single move while holding the bus
+Returns the time the move was sent
+        """
+        board = self.board
+        with board.i2cBus.Hold(self.holdCommand):
+            if speed != None and (speed != self.lastSpeed or board.encoderSpeed == None):
+                board.SetEncoderSpeed(speed)
+                self.lastSpeed = speed
+            sendTime = I2CBus.monotonic()
+            if counts1 == counts2:
+                board.EncoderMoveMotors(counts1)
+            else:
+                if counts1 != 0:
+                    board.EncoderMoveMotor1(counts1)
+                if counts2 != 0:
+                    board.EncoderMoveMotor2(counts2)
+        return sendTime
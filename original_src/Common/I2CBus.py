@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module provides the I2C transport shared by the PiBorg board modules
+
+Each I2C bus is opened once per process and shared by every board attached to it, e.g.
+import I2CBus
+bus = I2CBus.GetBus(1)
+bus.Write(0x15, 8, [255])
+reply = bus.Read(0x15, 21, 6)
+
+Reads can optionally be performed as a single combined I2C_RDWR transaction, e.g.
+bus.SetCombinedReads(True)
+
+Each transfer holds the bus lock, which is shared by threads in this process and by other processes using this module.
+Several transfers can be kept together by holding the lock around them, e.g.
+with bus:
+    bus.Write(0x15, 8, [255])
+    bus.Write(0x15, 11, [255])
+The boards use "with bus.Hold(command):" instead, which also tells BusScheduler what the group is for.
+
+The ThunderBorg, ZeroBorg, PicoBorgRev, Diablo and UltraBorg modules all talk to their boards through this module.
+Under most circumstances you should use the board modules instead of calling the bus directly.
+"""
+
+# Import the libraries we need
+import io
+import fcntl
+import ctypes
+import threading
+import time
+
+# Clock used for timing, time.monotonic is not available before Python 3.3
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    monotonic = time.time
+
+# Constant values
+I2C_SLAVE                   = 0x0703
+I2C_FUNCS                   = 0x0705
+I2C_RDWR                    = 0x0707
+I2C_M_RD                    = 0x0001        # Message flag for a read, writes have no flags
+I2C_FUNC_I2C                = 0x00000001    # Adapter supports plain I2C transactions, needed for I2C_RDWR
+I2C_FRAME_MAX_LEN           = 32            # Largest frame sent or received in a single transfer
+
+# Shared values used by this module
+busList                     = {}    # Open I2CBus objects, keyed by bus number
+busListLock                 = threading.Lock()
+
+
+def GetBus(busNumber = 1):
+    """
+bus = GetBus([busNumber])
+
+Returns the shared I2CBus for the given bus number, opening /dev/i2c-<busNumber> the first time it is requested
+Every board on the same bus shares the same I2CBus, and therefore the same file descriptor
+The busNumber if supplied is which I2C bus to use, 0 for Rev 1 boards, 1 for Rev 2 boards, if not supplied the default is 1
+    """
+    with busListLock:
+        bus = busList.get(busNumber)
+        if bus == None:
+            bus = I2CBus(busNumber)
+            busList[busNumber] = bus
+        return bus
+
+
+def CloseAll():
+    """
+CloseAll()
+
+Closes every bus opened by GetBus
+Any boards still using those buses will need Init calling again before they can be used
+    """
+    with busListLock:
+        for bus in busList.values():
+            bus.Close()
+        busList.clear()
+
+
+# Structures passed to the I2C_RDWR ioctl, see linux/i2c.h and linux/i2c-dev.h
+class I2CMessage(ctypes.Structure):
+    _fields_ = [('addr', ctypes.c_uint16),
+                ('flags', ctypes.c_uint16),
+                ('len', ctypes.c_uint16),
+                ('buf', ctypes.POINTER(ctypes.c_uint8))]
+
+
+class I2CTransaction(ctypes.Structure):
+    _fields_ = [('msgs', ctypes.POINTER(I2CMessage)),
+                ('nmsgs', ctypes.c_uint32)]
+
+
+# Class used to talk to a single I2C bus
+class I2CBus:
+    """
+This class owns the file descriptor for a single I2C bus
+
+busNumber               I2C bus number, e.g. 1 for /dev/i2c-1
+device                  The unbuffered file object for the bus device, or an object providing the same write / readinto calls
+address                 The I2C slave address currently selected on the device, None if none has been selected yet
+lock                    Thread lock held for the duration of each transfer, shared by every board on this bus
+processLock             True to also take an advisory flock on the bus device, so other processes are kept out
+combinedReads           True if Read uses a single I2C_RDWR transaction, False for a separate write and read
+    """
+
+    def __init__(self, busNumber, device = None):
+        self.busNumber = busNumber
+        if device == None:
+            device = io.open('/dev/i2c-%d' % (busNumber), 'r+b', buffering = 0)
+        self.device = device
+        self.address = None
+        self.lock = threading.RLock()
+        self.processLock = True
+        self.combinedReads = False
+
+        # Lock state and statistics, see GetLockStatistics
+        self.lockDepth = 0
+        self.fileLocked = False
+        self.lockedAt = 0.0
+        self.ResetLockStatistics()
+
+        # Frames are built in place, the views avoid creating new objects for each transfer
+        self.writeFrame = bytearray(I2C_FRAME_MAX_LEN)
+        self.readFrame = bytearray(I2C_FRAME_MAX_LEN)
+        writeView = memoryview(self.writeFrame)
+        readView = memoryview(self.readFrame)
+        self.writeViews = [writeView[:length] for length in range(I2C_FRAME_MAX_LEN + 1)]
+        self.readViews = [readView[:length] for length in range(I2C_FRAME_MAX_LEN + 1)]
+
+        # The I2C_RDWR messages point straight at the frames above, only the address and lengths change per call
+        bufferType = ctypes.c_uint8 * I2C_FRAME_MAX_LEN
+        bufferPointer = ctypes.POINTER(ctypes.c_uint8)
+        self.messages = (I2CMessage * 2)()
+        self.messages[0].buf = ctypes.cast(bufferType.from_buffer(self.writeFrame), bufferPointer)
+        self.messages[1].buf = ctypes.cast(bufferType.from_buffer(self.readFrame), bufferPointer)
+        self.messages[0].len = 1
+        self.messages[1].flags = I2C_M_RD
+        self.transaction = I2CTransaction(self.messages, 2)
+
+
+    def SelectAddress(self, address):
+        """
+SelectAddress(address)
+
+Points the bus device at the given I2C slave address, the ioctl is skipped if it is already selected
+Should only be called while holding the bus lock, Write and Read do this for you
+        """
+        if address != self.address:
+            fcntl.ioctl(self.device, I2C_SLAVE, address)
+            self.address = address
+
+
+    def Write(self, address, command, data):
+        """
+Write(address, command, data)
+
+Sends a command byte followed by data, a list of 0 or more byte values, to the board at address
+        """
+        length = len(data) + 1
+        self.Acquire()
+        try:
+            self.SelectAddress(address)
+            self.writeFrame[0] = command
+            self.writeFrame[1:length] = data
+            self.device.write(self.writeViews[length])
+        finally:
+            self.Release()
+
+
+    def Read(self, address, command, length, delay = 0):
+        """
+reply = Read(address, command, length, [delay])
+
+Sends a command byte to the board at address, then reads length bytes back
+If delay is given the bus waits that many seconds between the write and the read
+The lock is held throughout, so no other board on this bus can interleave with the transfer
+The reply is returned as a bytearray, which may be shorter than length if the read was cut short
+
+If combinedReads is True this calls ReadCombined instead, delay is ignored in that case
+        """
+        if self.combinedReads:
+            return self.ReadCombined(address, command, length)
+        self.Acquire()
+        try:
+            self.SelectAddress(address)
+            self.writeFrame[0] = command
+            self.device.write(self.writeViews[1])
+            if delay > 0:
+                time.sleep(delay)
+            count = self.device.readinto(self.readViews[length])
+            return self.readFrame[:count]
+        finally:
+            self.Release()
+
+
+    def ReadCombined(self, address, command, length):
+        """
+reply = ReadCombined(address, command, length)
+
+Sends a command byte to the board at address and reads length bytes back in a single I2C_RDWR ioctl
+The write and read are joined by a repeated start, so no other process can use the bus between them
+The reply is returned as a bytearray
+Raises ValueError if length is more than I2C_FRAME_MAX_LEN, the kernel would otherwise write past the end of the frame
+        """
+        if length > I2C_FRAME_MAX_LEN:
+            raise ValueError('Cannot read %d bytes, the most a single read can be is %d' % (length, I2C_FRAME_MAX_LEN))
+        self.Acquire()
+        try:
+            self.writeFrame[0] = command
+            self.messages[0].addr = address
+            self.messages[1].addr = address
+            self.messages[1].len = length
+            fcntl.ioctl(self.device, I2C_RDWR, self.transaction)
+            return self.readFrame[:length]
+        finally:
+            self.Release()
+
+
+    def SetCombinedReads(self, state):
+        """
+SetCombinedReads(state)
+
+Sets if Read should use single I2C_RDWR transactions (True) or a separate write and read (False)
+Raises IOError if state is True and the bus adapter does not support I2C_RDWR
+        """
+        if state:
+            funcs = ctypes.c_ulong()
+            fcntl.ioctl(self.device, I2C_FUNCS, funcs)
+            if not (funcs.value & I2C_FUNC_I2C):
+                raise IOError('I2C bus #%d does not support combined transactions' % (self.busNumber))
+        self.combinedReads = state
+
+
+    def Acquire(self):
+        """
+Acquire()
+
+Takes the bus lock, waiting for other threads and processes to finish with the bus first
+The lock is re-entrant, each call must be matched by a call to Release
+If processLock is True the outermost call also takes an exclusive flock on the bus device
+        """
+        contended = False
+        if not self.lock.acquire(False):
+            contended = True
+            waitStart = monotonic()
+            self.lock.acquire()
+            self.waitTime += monotonic() - waitStart
+        self.lockDepth += 1
+        if self.lockDepth == 1:
+            if self.processLock:
+                try:
+                    fcntl.flock(self.device, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except IOError:
+                    # Another process has the bus, wait for it
+                    contended = True
+                    waitStart = monotonic()
+                    try:
+                        fcntl.flock(self.device, fcntl.LOCK_EX)
+                    except:
+                        self.lockDepth -= 1
+                        self.lock.release()
+                        raise
+                    self.waitTime += monotonic() - waitStart
+                self.fileLocked = True
+            self.lockCount += 1
+            if contended:
+                self.contendedCount += 1
+            self.lockedAt = monotonic()
+
+
+    def Release(self):
+        """
+Release()
+
+Releases the bus lock taken by Acquire
+        """
+        self.lockDepth -= 1
+        if self.lockDepth == 0:
+            held = monotonic() - self.lockedAt
+            self.holdTime += held
+            if held > self.maxHoldTime:
+                self.maxHoldTime = held
+            if self.fileLocked:
+                self.fileLocked = False
+                fcntl.flock(self.device, fcntl.LOCK_UN)
+        self.lock.release()
+
+
+    def __enter__(self):
+        self.Acquire()
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.Release()
+
+
+    def Hold(self, command = None):
+        """
+with bus.Hold([command]):
+
+Holds the bus lock around a group of transfers, the same as "with bus:"
+command is the first command the group sends, BusScheduler uses it to give the hold that command's priority
+        """
+        return self
+
+
+    def GetLockStatistics(self):
+        """
+stats = GetLockStatistics()
+
+Returns a dictionary describing how the bus lock has been used since the last ResetLockStatistics:
+acquired                Number of times the lock has been taken
+contended               Number of those times where another thread or process already held the bus
+waitTime                Total time in seconds spent waiting for the bus
+holdTime                Total time in seconds the bus was held
+maxHoldTime             Longest single time in seconds the bus was held
+        """
+        return {'acquired': self.lockCount,
+                'contended': self.contendedCount,
+                'waitTime': self.waitTime,
+                'holdTime': self.holdTime,
+                'maxHoldTime': self.maxHoldTime}
+
+
+    def ResetLockStatistics(self):
+        """
+ResetLockStatistics()
+
+Clears the counters returned by GetLockStatistics
+        """
+        self.lockCount = 0
+        self.contendedCount = 0
+        self.waitTime = 0.0
+        self.holdTime = 0.0
+        self.maxHoldTime = 0.0
+
+
+    def Close(self):
+        """
+Close()
+
+Closes the bus device, boards using this bus will fail until it is opened again with GetBus
+        """
+        with self.lock:
+            self.device.close()
+            self.address = None
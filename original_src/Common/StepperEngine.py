@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module drives a stepper motor from a ThunderBorg, ZeroBorg, PicoBorg Reverse or Diablo at a steady step rate
+
+Use by creating an engine for an initialised board with the stepping sequence, then moving by a number of steps, e.g.
+import StepperEngine
+import ThunderBorg
+TB = ThunderBorg.ThunderBorg()
+TB.Init()
+sequence = [[1.0, 1.0], [1.0, -1.0], [-1.0, -1.0], [-1.0, 1.0]]
+stepper = StepperEngine.StepperEngine(TB, sequence, 500)
+stepper.acceleration = 2000
+stepper.Move(2000)
+print(stepper.GetReport())
+stepper.Release()
+
+A ZeroBorg can drive a second stepper from motors 3 and 4 by creating another engine with firstMotor = 3.
+
+The sequence is turned into the motor commands to send for each step by the board's CompilePhaseTable
+when the engine is created, so each step only has to send the commands for the next entry with SendPhase.
+Steps are timed against absolute deadlines worked out before the move starts, so the time spent sending
+does not add to the time between steps.
+With an acceleration set the step rate ramps up from a standstill and back down again at the end of the move.
+If a step is sent more than half a step late the rest of the move is pushed back, rather than rushing to catch up.
+"""
+
+# Import the libraries we need
+import array
+import math
+import threading
+import time
+import I2CBus
+
+# Constant values
+RATE_DEFAULT                = 100   # Steps per second
+
+def StepTimes(count, rate, acceleration = None):
+    """
+times = StepTimes(count, rate, [acceleration])
+
+Works out when each of count steps should be sent, in seconds from the first step, as an array
+Steps are sent at rate steps per second, if acceleration is given the rate ramps up from a standstill
+by acceleration steps per second per second, then back down again at the end
+    """
+    times = array.array('d', [0.0]) * count
+    rate = float(rate)
+    distance = count - 1
+    if acceleration == None or acceleration <= 0:
+        for i in range(count):
+            times[i] = i / rate
+        return times
+    if distance <= 0:
+        # A single step has nothing to ramp
+        return times
+    acceleration = float(acceleration)
+    rampSteps = rate * rate / (2.0 * acceleration)
+    if 2.0 * rampSteps > distance:
+        # Never reaches full speed
+        rampSteps = distance / 2.0
+        rate = math.sqrt(2.0 * acceleration * rampSteps)
+    rampTime = rate / acceleration
+    totalTime = 2.0 * rampTime + (distance - 2.0 * rampSteps) / rate
+    for i in range(count):
+        if i <= rampSteps:
+            times[i] = math.sqrt(2.0 * i / acceleration)
+        elif i < distance - rampSteps:
+            times[i] = rampTime + (i - rampSteps) / rate
+        else:
+            times[i] = totalTime - math.sqrt(2.0 * (distance - i) / acceleration)
+    return times
+
+
+# Class used to drive a stepper motor
+class StepperEngine:
+    """
+This class steps a stepper motor through its sequence at a steady rate
+
+board                   The board driving the stepper
+frames                  Commands to send for each entry of the sequence, see the board's CompilePhaseTable
+rate                    Steps per second for moves
+acceleration            Steps per second per second to ramp the rate up and down by, None to start and stop at full rate
+position                Steps moved since the engine was created, negative for reverse
+    """
+
+    def __init__(self, board, sequence, rate = RATE_DEFAULT, firstMotor = 1):
+        self.board = board
+        self.frames = board.CompilePhaseTable(sequence, firstMotor)
+        self.rate = rate
+        self.acceleration = None
+        self.position = 0
+        self.phase = None
+        self.thread = None
+        self.stopEvent = threading.Event()
+        self.ResetReport()
+
+
+    def SendPhase(self, phase):
+        """
+SendPhase(phase)
+
+Sends the commands for one entry of the sequence
+        """
+        self.board.SendPhase(self.frames[phase])
+        self.phase = phase
+
+
+    def Move(self, steps, rate = None, acceleration = None):
+        """
+moved = Move(steps, [rate], [acceleration])
+
+Moves a number of steps, negative to move in reverse, returning once the move is finished
+rate and acceleration default to the engine's rate and acceleration
+Returns the number of steps moved, which is less than asked for if Stop is called from another thread
+        """
+        self.stopEvent.clear()
+        return self.Play(steps, rate, acceleration)
+
+
+    def Play(self, steps, rate, acceleration):
+        """
+moved = Play(steps, rate, acceleration)
+
+Sends the steps for a move, used by Move and MoveInBackground
+        """
+        if rate == None:
+            rate = self.rate
+        if acceleration == None:
+            acceleration = self.acceleration
+        if steps < 0:
+            direction = -1
+            count = -steps
+        else:
+            direction = 1
+            count = steps
+        if count == 0:
+            return 0
+        times = StepTimes(count, rate, acceleration)
+        phases = len(self.frames)
+        if self.phase == None:
+            # Hold the motor at the end of the sequence, so the first step is a single step
+            self.SendPhase(phases - 1)
+        period = 1.0 / rate
+        lateness = 0.0
+        worstLateness = 0.0
+        slips = 0
+        moved = 0
+        startTime = I2CBus.monotonic()
+        firstSent = startTime
+        lastSent = startTime
+        for i in range(count):
+            deadline = startTime + times[i]
+            delay = deadline - I2CBus.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if self.stopEvent.is_set():
+                break
+            now = I2CBus.monotonic()
+            late = now - deadline
+            if i > 0:
+                gap = times[i] - times[i - 1]
+            else:
+                gap = period
+            if late > gap / 2.0:
+                # Too far behind, push the rest of the move back instead of rushing the next steps
+                startTime += late
+                slips += 1
+            self.SendPhase((self.phase + direction) % phases)
+            if i == 0:
+                firstSent = now
+            lastSent = now
+            lateness += late
+            if late > worstLateness:
+                worstLateness = late
+            moved += 1
+            self.position += direction
+        self.steps += moved
+        self.slips += slips
+        self.totalLateness += lateness
+        if worstLateness > self.worstLateness:
+            self.worstLateness = worstLateness
+        if moved > 1:
+            self.requestedRate = (moved - 1) / times[moved - 1]
+            self.achievedRate = (moved - 1) / (lastSent - firstSent)
+        return moved * direction
+
+
+    def MoveInBackground(self, steps, rate = None, acceleration = None):
+        """
+MoveInBackground(steps, [rate], [acceleration])
+
+Starts a move on a background thread and returns straight away, see Move
+Use Wait to wait for the move to finish, or Stop to end it early
+        """
+        self.Wait()
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target = self.Play, args = (steps, rate, acceleration))
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def Wait(self):
+        """
+Wait()
+
+Waits for a move started by MoveInBackground to finish
+        """
+        if self.thread != None:
+            self.thread.join()
+            self.thread = None
+
+
+    def Stop(self):
+        """
+Stop()
+
+Ends a move after the current step, the motor is left holding its position
+If the move was started by MoveInBackground this waits for it to end
+        """
+        self.stopEvent.set()
+        self.Wait()
+
+
+    def Release(self):
+        """
+Release()
+
+Turns the motors off, the next move starts by holding the motor in place again
+        """
+        self.Stop()
+        self.board.MotorsOff()
+        self.phase = None
+
+
+    def GetReport(self):
+        """
+report = GetReport()
+
+Returns a dictionary describing how well steps have kept to their schedule since the last ResetReport:
+steps                   Number of steps sent
+requestedRate           Average steps per second the last move was planned to take, including any ramps
+achievedRate            Average steps per second the last move actually took
+meanLateness            Average time in seconds steps were sent after they were due
+worstLateness           Longest time in seconds a step was sent after it was due
+slips                   Number of times the schedule was pushed back because a step was too late
+        """
+        if self.steps > 0:
+            meanLateness = self.totalLateness / self.steps
+        else:
+            meanLateness = 0.0
+        return {'steps': self.steps,
+                'requestedRate': self.requestedRate,
+                'achievedRate': self.achievedRate,
+                'meanLateness': meanLateness,
+                'worstLateness': self.worstLateness,
+                'slips': self.slips}
+
+
+    def ResetReport(self):
+        """
+ResetReport()
+
+Clears the counters returned by GetReport
+        """
+        self.steps = 0
+        self.slips = 0
+        self.totalLateness = 0.0
+        self.worstLateness = 0.0
+        self.requestedRate = 0.0
+        self.achievedRate = 0.0
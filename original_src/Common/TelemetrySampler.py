@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module polls board readings in the background so control loops can use the latest values without waiting on the bus
+
+Use by adding a channel for each reading with how often it should be taken, then starting the sampler, e.g.
+import TelemetrySampler
+import ThunderBorg
+import XLoBorg
+TB = ThunderBorg.ThunderBorg()
+TB.Init()
+XLoBorg.Init()
+sampler = TelemetrySampler.TelemetrySampler()
+sampler.AddChannel('battery', TB.GetBatteryReading, 2)
+sampler.AddChannel('accelerometer', XLoBorg.ReadAccelerometer, 50, 3)
+sampler.Start()
+sampleTime, voltage = sampler.Latest('battery')
+times, readings = sampler.Snapshot('accelerometer')
+sampler.Stop()
+
+Each channel keeps its readings in a fixed-size ring buffer of floats, stamped with the time the reading was taken.
+Only the sampler thread writes to the buffers, readers copy from them without taking any lock.
+Failed readings (None or an exception) are stored as NaN.
+"""
+
+# Import the libraries we need
+import array
+import threading
+import I2CBus
+
+# Constant values
+BUFFER_SIZE_DEFAULT         = 256   # Readings kept for each channel
+NAN                         = float('nan')
+
+
+# Class used to hold the readings for a single channel
+class RingBuffer:
+    """
+This class holds the last size readings of width values each, with the time of each reading
+
+size                    Number of readings held
+width                   Number of values in each reading
+count                   Total number of readings written, the newest is at index (count - 1) % slots
+slots                   Number of readings stored, one more than size so the reading being written is never one being read
+times                   Time of each reading, from I2CBus.monotonic
+values                  Values of each reading, width values per reading
+    """
+
+    def __init__(self, size, width = 1):
+        self.size = size
+        self.slots = size + 1
+        self.width = width
+        self.count = 0
+        self.times = array.array('d', [0.0] * self.slots)
+        self.values = array.array('d', [NAN] * (self.slots * width))
+
+
+    def Write(self, sampleTime, reading):
+        """
+Write(sampleTime, reading)
+
+Adds a reading, a single value or a sequence of width values, only one thread should write to a buffer
+        """
+        index = self.count % self.slots
+        start = index * self.width
+        if reading == None:
+            for i in range(self.width):
+                self.values[start + i] = NAN
+        elif self.width == 1:
+            self.values[start] = reading
+        else:
+            for i in range(self.width):
+                value = reading[i]
+                if value == None:
+                    value = NAN
+                self.values[start + i] = value
+        self.times[index] = sampleTime
+        # Counted last, so readers never see a reading which is only partly written
+        self.count += 1
+
+
+    def Latest(self):
+        """
+sampleTime, reading = Latest()
+
+Returns the newest reading, a float if width is 1 or a tuple otherwise, (None, None) if there are no readings yet
+        """
+        while True:
+            count = self.count
+            if count == 0:
+                return None, None
+            index = (count - 1) % self.slots
+            sampleTime = self.times[index]
+            start = index * self.width
+            if self.width == 1:
+                reading = self.values[start]
+            else:
+                reading = tuple(self.values[start : start + self.width])
+            # Try again if the writer reached our slot while we were copying, it is overwriting
+            # the reading numbered count - 1 + slots while self.count is count - 1 + slots
+            if self.count - count < self.slots - 1:
+                return sampleTime, reading
+
+
+    def Snapshot(self, count = None):
+        """
+times, values = Snapshot([count])
+
+Returns copies of the last count readings as arrays, all held readings if count is not given, oldest first
+The values hold width values per reading
+        """
+        while True:
+            written = self.count
+            available = min(written, self.size)
+            if count == None or count > available:
+                wanted = available
+            else:
+                wanted = count
+            first = (written - wanted) % self.slots
+            if first + wanted <= self.slots:
+                times = self.times[first : first + wanted]
+                values = self.values[first * self.width : (first + wanted) * self.width]
+            else:
+                split = self.slots - first
+                times = self.times[first:] + self.times[:wanted - split]
+                values = self.values[first * self.width:] + self.values[:(wanted - split) * self.width]
+            # Try again if the writer has started on the slot of any of the readings while we were copying
+            if self.count - written + wanted < self.slots:
+                return times, values
+
+
+    def ReadFrom(self, first):
+        """
+times, values, next = ReadFrom(first)
+
+Returns copies of the readings from reading number first onwards as arrays, counting from 0 for the first reading written
+Readings which have already been overwritten are left out, next is the number to pass as first to get the following readings
+        """
+        while True:
+            written = self.count
+            start = max(first, written - self.size)
+            wanted = written - start
+            if wanted <= 0:
+                return array.array('d'), array.array('d'), written
+            index = start % self.slots
+            if index + wanted <= self.slots:
+                times = self.times[index : index + wanted]
+                values = self.values[index * self.width : (index + wanted) * self.width]
+            else:
+                split = self.slots - index
+                times = self.times[index:] + self.times[:wanted - split]
+                values = self.values[index * self.width:] + self.values[:(wanted - split) * self.width]
+            # Try again if the writer has started on the slot of any of the readings while we were copying
+            if self.count - start < self.slots:
+                return times, values, written
+
+
+# Class used to describe a single reading being polled
+class Channel:
+    """
+This class describes a reading taken by the sampler
+
+name                    Name used to get the readings back
+function                Function called with no parameters to take a reading
+period                  Time in seconds between readings
+nextTime                Time the next reading is due
+buffer                  RingBuffer holding the readings
+errors                  Number of readings which raised an exception or did not fit the channel's width
+missed                  Number of readings skipped because the sampler fell behind
+    """
+
+    def __init__(self, name, function, rate, width, size):
+        self.name = name
+        self.function = function
+        self.period = 1.0 / rate
+        self.nextTime = 0.0
+        self.buffer = RingBuffer(size, width)
+        self.errors = 0
+        self.missed = 0
+
+
+# Class used to poll the channels
+class TelemetrySampler:
+    """
+This class takes readings from each channel at its own rate on a background thread
+
+channels                Channels being sampled, keyed by name
+size                    Number of readings kept for each channel
+thread                  The sampling thread, None when stopped
+    """
+
+    def __init__(self, size = BUFFER_SIZE_DEFAULT):
+        self.channels = {}
+        self.size = size
+        self.thread = None
+        self.stopEvent = threading.Event()
+        self.channelLock = threading.Lock()
+
+
+    def AddChannel(self, name, function, rate, width = 1):
+        """
+AddChannel(name, function, rate, [width])
+
+Adds a reading to take rate times per second by calling function
+width is the number of values function returns, e.g. 3 for XLoBorg.ReadAccelerometer
+Channels can be added while the sampler is running
+        """
+        channel = Channel(name, function, rate, width, self.size)
+        channel.nextTime = I2CBus.monotonic()
+        with self.channelLock:
+            channels = dict(self.channels)
+            channels[name] = channel
+            self.channels = channels
+
+
+    def RemoveChannel(self, name):
+        """
+RemoveChannel(name)
+
+Stops taking a reading, its buffer is discarded
+        """
+        with self.channelLock:
+            channels = dict(self.channels)
+            channels.pop(name, None)
+            self.channels = channels
+
+
+    def Latest(self, name):
+        """
+sampleTime, reading = Latest(name)
+
+Returns the newest reading for a channel and the time it was taken, (None, None) if there are no readings yet
+        """
+        return self.channels[name].buffer.Latest()
+
+
+    def Snapshot(self, name, count = None):
+        """
+times, values = Snapshot(name, [count])
+
+Returns copies of the last count readings for a channel, all held readings if count is not given, oldest first
+Multiple value channels have width values per reading in values
+        """
+        return self.channels[name].buffer.Snapshot(count)
+
+
+    def GetStatistics(self, name):
+        """
+stats = GetStatistics(name)
+
+Returns a dictionary with the number of readings taken, errors and missed readings for a channel
+        """
+        channel = self.channels[name]
+        return {'readings': channel.buffer.count,
+                'errors': channel.errors,
+                'missed': channel.missed}
+
+
+    def Start(self):
+        """
+Start()
+
+Starts taking readings on a background thread
+        """
+        if self.thread != None:
+            return
+        self.stopEvent.clear()
+        now = I2CBus.monotonic()
+        for channel in self.channels.values():
+            channel.nextTime = now
+        self.thread = threading.Thread(target = self.Run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def Stop(self):
+        """
+Stop()
+
+Stops taking readings and waits for the background thread to finish, the readings are kept
+        """
+        if self.thread == None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.thread = None
+
+
+    def Run(self):
+        """
+Run()
+
+The sampling loop, run by the background thread, use Start instead
+        """
+        while not self.stopEvent.is_set():
+            channels = self.channels
+            if len(channels) == 0:
+                self.stopEvent.wait(0.1)
+                continue
+            due = min(channels.values(), key = lambda channel: channel.nextTime)
+            delay = due.nextTime - I2CBus.monotonic()
+            if delay > 0:
+                if self.stopEvent.wait(delay):
+                    break
+            self.Sample(due)
+
+
+    def Sample(self, channel):
+        """
+Sample(channel)
+
+Takes one reading for a channel and works out when the next one is due
+        """
+        try:
+            reading = channel.function()
+            # Checked here so a reading of the wrong width or type cannot stop the sampling thread in Write
+            width = channel.buffer.width
+            if reading == None:
+                pass
+            elif width == 1:
+                reading = float(reading)
+            else:
+                reading = [NAN if value == None else float(value) for value in reading]
+                if len(reading) != width:
+                    raise ValueError('Channel %s gave %d values, expected %d' % (channel.name, len(reading), width))
+        except KeyboardInterrupt:
+            raise
+        except:
+            channel.errors += 1
+            reading = None
+        now = I2CBus.monotonic()
+        channel.buffer.Write(now, reading)
+        # Due times stay on the original schedule, unless we have fallen a whole period or more behind
+        channel.nextTime += channel.period
+        if channel.nextTime < now:
+            behind = int((now - channel.nextTime) / channel.period) + 1
+            channel.missed += behind
+            channel.nextTime += behind * channel.period
@@ -0,0 +1 @@
+../Common/BoardEmulator.py
\ No newline at end of file
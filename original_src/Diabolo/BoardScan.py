@@ -0,0 +1 @@
+../Common/BoardScan.py
\ No newline at end of file
@@ -0,0 +1 @@
+../Common/BusScheduler.py
\ No newline at end of file
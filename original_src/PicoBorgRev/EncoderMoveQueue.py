@@ -0,0 +1 @@
+../Common/EncoderMoveQueue.py
\ No newline at end of file
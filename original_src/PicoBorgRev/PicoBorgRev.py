@@ -27,10 +27,12 @@ See the website at www.piborg.org/picoborgreverse for more details
 """
 
 # Import the libraries we need
-import io
-import fcntl
+from __future__ import print_function
 import types
 import time
+import threading
+import I2CBus
+import BoardCache
 
 # Constant values
 I2C_SLAVE               = 0x0703
@@ -78,6 +80,59 @@ COMMAND_VALUE_ON        = 1     # I2C value representing on
 COMMAND_VALUE_OFF       = 0     # I2C value representing off
 
 
+# Forward and reverse drive commands for motor 1, motor 2, ..., see CompilePhaseTable
+MOTOR_COMMANDS = ((COMMAND_SET_B_FWD, COMMAND_SET_B_REV),
+                  (COMMAND_SET_A_FWD, COMMAND_SET_A_REV))
+
+# Shadow registers used by the write cache, see PicoBorgRev.writeCache
+# Motor and LED writes, giving the registers set and the direction value added before the data (None for no direction)
+CACHED_WRITES = {
+    COMMAND_SET_A_FWD: (['A'], COMMAND_VALUE_FWD),
+    COMMAND_SET_A_REV: (['A'], COMMAND_VALUE_REV),
+    COMMAND_SET_B_FWD: (['B'], COMMAND_VALUE_FWD),
+    COMMAND_SET_B_REV: (['B'], COMMAND_VALUE_REV),
+    COMMAND_SET_ALL_FWD: (['A', 'B'], COMMAND_VALUE_FWD),
+    COMMAND_SET_ALL_REV: (['A', 'B'], COMMAND_VALUE_REV),
+    COMMAND_ALL_OFF: (['A', 'B'], COMMAND_VALUE_FWD),
+    COMMAND_SET_LED: (['LED'], None),
+}
+# Reads which can be answered from a shadow register
+CACHED_READS = {
+    COMMAND_GET_A: 'A',
+    COMMAND_GET_B: 'B',
+    COMMAND_GET_LED: 'LED',
+}
+# Writes which change shadow registers in ways the cache cannot follow
+CACHE_INVALIDATES = {
+    COMMAND_RESET_EPO: ['A', 'B'],
+    COMMAND_SET_EPO_IGNORE: ['A', 'B'],
+    COMMAND_SET_ENC_MODE: ['A', 'B'],
+    COMMAND_MOVE_A_FWD: ['A'],
+    COMMAND_MOVE_A_REV: ['A'],
+    COMMAND_MOVE_B_FWD: ['B'],
+    COMMAND_MOVE_B_REV: ['B'],
+    COMMAND_MOVE_ALL_FWD: ['A', 'B'],
+    COMMAND_MOVE_ALL_REV: ['A', 'B'],
+}
+
+# Read cache, see PicoBorgRev.readCache
+# Time in seconds each cached reply is kept for, keyed by the GET command
+READ_CACHE_TTL = {
+    COMMAND_GET_ID: 60.0,
+    COMMAND_GET_FAILSAFE: 5.0,
+    COMMAND_GET_EPO_IGNORE: 5.0,
+    COMMAND_GET_ENC_MODE: 5.0,
+    COMMAND_GET_ENC_SPEED: 5.0,
+}
+# Cached replies to forget when a command is sent
+READ_CACHE_INVALIDATES = {
+    COMMAND_SET_I2C_ADD: [COMMAND_GET_ID],
+    COMMAND_SET_FAILSAFE: [COMMAND_GET_FAILSAFE],
+    COMMAND_SET_EPO_IGNORE: [COMMAND_GET_EPO_IGNORE],
+    COMMAND_SET_ENC_MODE: [COMMAND_GET_ENC_MODE],
+    COMMAND_SET_ENC_SPEED: [COMMAND_GET_ENC_SPEED],
+}
+
 def ScanForPicoBorgReverse(busNumber = 1):
     """
 ScanForPicoBorgReverse([busNumber])
@@ -86,7 +141,7 @@ Scans the I
 The busNumber if supplied is which IC bus to scan, 0 for Rev 1 boards, 1 for Rev 2 boards, if not supplied the default is 1
     """
     found = []
-    print 'Scanning IC bus #%d' % (busNumber)
+    print('Scanning IC bus #%d' % (busNumber))
     bus = PicoBorgRev()
     for address in range(0x03, 0x78, 1):
         try:
@@ -94,7 +149,7 @@ The busNumber if supplied is which I
             i2cRecv = bus.RawRead(COMMAND_GET_ID, I2C_MAX_LEN)
             if len(i2cRecv) == I2C_MAX_LEN:
                 if i2cRecv[1] == I2C_ID_PICOBORG_REV:
-                    print 'Found PicoBorg Reverse at %02X' % (address)
+                    print('Found PicoBorg Reverse at %02X' % (address))
                     found.append(address)
                 else:
                     pass
@@ -105,11 +160,11 @@ The busNumber if supplied is which I
         except:
             pass
     if len(found) == 0:
-        print 'No PicoBorg Reverse boards found, is bus #%d correct (should be 0 for Rev 1, 1 for Rev 2)' % (busNumber)
+        print('No PicoBorg Reverse boards found, is bus #%d correct (should be 0 for Rev 1, 1 for Rev 2)' % (busNumber))
     elif len(found) == 1:
-        print '1 PicoBorg Reverse board found'
+        print('1 PicoBorg Reverse board found')
     else:
-        print '%d PicoBorg Reverse boards found' % (len(found))
+        print('%d PicoBorg Reverse boards found' % (len(found)))
     return found
 
 
@@ -123,19 +178,19 @@ The busNumber if supplied is which I
 Warning, this new IC address will still be used after resetting the power on the device
     """
     if newAddress < 0x03:
-        print 'Error, IC addresses below 3 (0x03) are reserved, use an address between 3 (0x03) and 119 (0x77)'
+        print('Error, IC addresses below 3 (0x03) are reserved, use an address between 3 (0x03) and 119 (0x77)')
         return
     elif newAddress > 0x77:
-        print 'Error, IC addresses above 119 (0x77) are reserved, use an address between 3 (0x03) and 119 (0x77)'
+        print('Error, IC addresses above 119 (0x77) are reserved, use an address between 3 (0x03) and 119 (0x77)')
         return
     if oldAddress < 0x0:
         found = ScanForPicoBorgReverse(busNumber)
         if len(found) < 1:
-            print 'No PicoBorg Reverse boards found, cannot set a new IC address!'
+            print('No PicoBorg Reverse boards found, cannot set a new IC address!')
             return
         else:
             oldAddress = found[0]
-    print 'Changing IC address from %02X to %02X (bus #%d)' % (oldAddress, newAddress, busNumber)
+    print('Changing IC address from %02X to %02X (bus #%d)' % (oldAddress, newAddress, busNumber))
     bus = PicoBorgRev()
     bus.InitBusOnly(busNumber, oldAddress)
     try:
@@ -143,56 +198,69 @@ Warning, this new I
         if len(i2cRecv) == I2C_MAX_LEN:
             if i2cRecv[1] == I2C_ID_PICOBORG_REV:
                 foundChip = True
-                print 'Found PicoBorg Reverse at %02X' % (oldAddress)
+                print('Found PicoBorg Reverse at %02X' % (oldAddress))
             else:
                 foundChip = False
-                print 'Found a device at %02X, but it is not a PicoBorg Reverse (ID %02X instead of %02X)' % (oldAddress, i2cRecv[1], I2C_ID_PICOBORG_REV)
+                print('Found a device at %02X, but it is not a PicoBorg Reverse (ID %02X instead of %02X)' % (oldAddress, i2cRecv[1], I2C_ID_PICOBORG_REV))
         else:
             foundChip = False
-            print 'Missing PicoBorg Reverse at %02X' % (oldAddress)
+            print('Missing PicoBorg Reverse at %02X' % (oldAddress))
     except KeyboardInterrupt:
         raise
     except:
         foundChip = False
-        print 'Missing PicoBorg Reverse at %02X' % (oldAddress)
+        print('Missing PicoBorg Reverse at %02X' % (oldAddress))
     if foundChip:
         bus.RawWrite(COMMAND_SET_I2C_ADD, [newAddress])
         time.sleep(0.1)
-        print 'Address changed to %02X, attempting to talk with the new address' % (newAddress)
+        print('Address changed to %02X, attempting to talk with the new address' % (newAddress))
         try:
             bus.InitBusOnly(busNumber, newAddress)
             i2cRecv = bus.RawRead(COMMAND_GET_ID, I2C_MAX_LEN)
             if len(i2cRecv) == I2C_MAX_LEN:
                 if i2cRecv[1] == I2C_ID_PICOBORG_REV:
                     foundChip = True
-                    print 'Found PicoBorg Reverse at %02X' % (newAddress)
+                    print('Found PicoBorg Reverse at %02X' % (newAddress))
                 else:
                     foundChip = False
-                    print 'Found a device at %02X, but it is not a PicoBorg Reverse (ID %02X instead of %02X)' % (newAddress, i2cRecv[1], I2C_ID_PICOBORG_REV)
+                    print('Found a device at %02X, but it is not a PicoBorg Reverse (ID %02X instead of %02X)' % (newAddress, i2cRecv[1], I2C_ID_PICOBORG_REV))
             else:
                 foundChip = False
-                print 'Missing PicoBorg Reverse at %02X' % (newAddress)
+                print('Missing PicoBorg Reverse at %02X' % (newAddress))
         except KeyboardInterrupt:
             raise
         except:
             foundChip = False
-            print 'Missing PicoBorg Reverse at %02X' % (newAddress)
+            print('Missing PicoBorg Reverse at %02X' % (newAddress))
     if foundChip:
-        print 'New IC address of %02X set successfully' % (newAddress)
+        print('New IC address of %02X set successfully' % (newAddress))
     else:
-        print 'Failed to set new IC address...'
+        print('Failed to set new IC address...')
 
 
 # Class used to control PicoBorg Reverse
-class PicoBorgRev:
+class PicoBorgRev(BoardCache.ReadCache, BoardCache.WriteCache):
     """
 This module is designed to communicate with the PicoBorg Reverse
 
 busNumber               IC bus on which the PicoBorg Reverse is attached (Rev 1 is bus 0, Rev 2 is bus 1)
 bus                     the smbus object used to talk to the IC bus
+i2cBus                  The shared I2CBus transport used to talk to the IC bus
 i2cAddress              The IC address of the PicoBorg Reverse chip to control
 foundChip               True if the PicoBorg Reverse chip can be seen, False otherwise
 printFunction           Function reference to call when printing text, if None "print" is used
+writeCache              True to skip motor and LED writes which would not change anything, see RawWrite
+readFromCache           True to answer motor and LED reads from the values written, with or without writeCache, see RawRead
+cacheRefresh            Time in seconds before a cached value is sent again, or read from the board again
+readCache               True to keep replies to reads of values which only change when written, see RawRead
+readCacheTtl            Time in seconds each cached reply is kept for, keyed by the GET command
+readCacheHits           Number of reads answered from the read cache
+readCacheMisses         Number of reads which could have been cached but had to be read from the board
+encoderCountsPerSecond  Encoder counts per second moved at full encoder speed, learnt by WaitWhileEncoderMoving, None until known
+encoderPollMin          Shortest time in seconds between checks in WaitWhileEncoderMoving, used close to the expected finish
+encoderPollMax          Longest time in seconds between checks in WaitWhileEncoderMoving
+encoderMoveTime         Time in seconds from the last encoder move being sent to WaitWhileEncoderMoving seeing it finish
+encoderLatency          Time in seconds between the last two checks in WaitWhileEncoderMoving, the most the finish was seen late by
     """
 
     # Shared values used by this class
@@ -200,8 +268,28 @@ printFunction           Function reference to call when printing text, if None "
     i2cAddress              = 0x44  # IC address, override for a different address
     foundChip               = False
     printFunction           = None
-    i2cWrite                = None
-    i2cRead                 = None
+    i2cBus                  = None
+    readCache               = False
+    readCacheTtl            = READ_CACHE_TTL    # Replace, rather than change, to use different times for one board
+    readCacheInvalidates    = READ_CACHE_INVALIDATES
+    readCacheHits           = 0
+    readCacheMisses         = 0
+    readCacheEntries        = None              # Cached reply and time read for each GET command
+    writeCache              = False
+    readFromCache           = False
+    cacheRefresh            = 0.1               # Keep below the 1/4 second the communications failsafe allows
+    shadowRegisters         = None              # Last value and time sent for each register, keyed by register name
+    cachedWrites            = CACHED_WRITES
+    cachedReads             = CACHED_READS
+    cacheInvalidates        = CACHE_INVALIDATES
+    encoderCountsPerSecond  = None
+    encoderPollMin          = 0.005
+    encoderPollMax          = 0.1
+    encoderMoveTime         = 0.0
+    encoderLatency          = 0.0
+    encoderSpeed            = None              # Last encoder speed limit set or read, None if not known yet
+    encoderMoveStart        = None              # Time the last encoder move was sent, None once it has been seen to finish
+    encoderMoveCounts       = 0                 # Counts asked for by the last encoder move
 
 
     def RawWrite(self, command, data):
@@ -211,12 +299,16 @@ RawWrite(command, data)
 Sends a raw command on the I2C bus to the PicoBorg Reverse
 Command codes can be found at the top of PicoBorgRev.py, data is a list of 0 or more byte values
 
+If writeCache is True motor and LED writes are skipped if they match the values last sent less than cacheRefresh seconds ago,
+resending after cacheRefresh seconds keeps the communications failsafe from stopping the motors
+
+Writes which change a value held in the read cache remove it from the cache, see READ_CACHE_INVALIDATES
+The caches are shared with the other board modules, see BoardCache
+
 Under most circumstances you should use the appropriate function instead of RawWrite
         """
-        rawOutput = chr(command)
-        for singleByte in data:
-            rawOutput += chr(singleByte)
-        self.i2cWrite.write(rawOutput)
+        self.ForgetReadCache(command)
+        self.CachedWrite(command, data)
 
 
     def RawRead(self, command, length, retryCount = 3):
@@ -228,20 +320,29 @@ Command codes can be found at the top of PicoBorgRev.py, length is the number of
 
 The function checks that the first byte read back matches the requested command
 If it does not it will retry the request until retryCount is exhausted (default is 3 times)
+If combined reads are enabled on the bus (i2cBus.SetCombinedReads(True)) each attempt is a single I2C_RDWR transaction
+If readFromCache is True motor and LED reads are answered from the write cache when it has a recent enough value
+If readCache is True replies to the commands in readCacheTtl are kept for that long and reused
 
 Under most circumstances you should use the appropriate function instead of RawRead
         """
+        if self.readCache:
+            reply = self.LookupReadCache(command, length)
+            if reply != None:
+                return reply
+        if self.readFromCache:
+            reply = self.ReadWriteCache(command, length)
+            if reply != None:
+                return reply
         while retryCount > 0:
-            self.RawWrite(command, [])
-            rawReply = self.i2cRead.read(length)
-            reply = []
-            for singleByte in rawReply:
-                reply.append(ord(singleByte))
+            reply = self.i2cBus.Read(self.i2cAddress, command, length)
             if command == reply[0]:
                 break
             else:
                 retryCount -= 1
         if retryCount > 0:
+            if self.readCache:
+                self.StoreReadCache(command, reply)
             return reply
         else:
             raise IOError('I2C read for command %d failed' % (command))
@@ -256,10 +357,7 @@ This call does not check the board is present or working, under most circumstanc
         """
         self.busNumber = busNumber
         self.i2cAddress = address
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        self.i2cBus = I2CBus.GetBus(self.busNumber)
 
 
     def Print(self, message):
@@ -269,7 +367,7 @@ Print(message)
 Wrapper used by the PicoBorgRev instance to print messages, will call printFunction if set, print otherwise
         """
         if self.printFunction == None:
-            print message
+            print(message)
         else:
             self.printFunction(message)
 
@@ -296,11 +394,8 @@ If tryOtherBus is True, this function will attempt to use the other bus if the P
         """
         self.Print('Loading PicoBorg Reverse on bus %d, address %02X' % (self.busNumber, self.i2cAddress))
 
-        # Open the bus
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        # Open the bus, shared with any other boards already using it
+        self.i2cBus = I2CBus.GetBus(self.busNumber)
 
         # Check for PicoBorg Reverse
         try:
@@ -492,6 +587,58 @@ SetMotors(1)     -> all motors are moving forward at 100% power
             self.Print('Failed sending all motors drive level!')
 
 
+    def CompilePhaseTable(self, sequence, firstMotor = 1):
+        """
+phases = CompilePhaseTable(sequence, [firstMotor])
+
+Works out the motor commands for every entry of a stepping sequence in one go, ready to send with SendPhase
+sequence is a list of drive levels, from +1 to -1, for each motor starting at firstMotor
+e.g.
+phases = CompilePhaseTable([[1.0, 1.0], [1.0, -1.0], [-1.0, -1.0], [-1.0, 1.0]])
+SendPhase(phases[1])    -> motor 1 forward and motor 2 reverse at 100% power
+Returns a list with the [command, [pwm]] to send for each motor for each entry of the sequence
+        """
+        phases = []
+        for drives in sequence:
+            frames = []
+            for motor in range(len(drives)):
+                power = drives[motor]
+                commandFwd, commandRev = MOTOR_COMMANDS[firstMotor - 1 + motor]
+                if power < 0:
+                    # Reverse
+                    command = commandRev
+                    pwm = -int(PWM_MAX * power)
+                else:
+                    # Forward / stopped
+                    command = commandFwd
+                    pwm = int(PWM_MAX * power)
+                if pwm > PWM_MAX:
+                    pwm = PWM_MAX
+                frames.append([command, [pwm]])
+            phases.append(frames)
+        return phases
+
+
+    def SendPhase(self, frames):
+        """
+SendPhase(frames)
+
+Sends one entry of a stepping sequence made by CompilePhaseTable, the motors are set together while holding the bus
+e.g.
+SendPhase(phases[step])
+        """
+        if len(frames) == 0:
+            return
+        try:
+            with self.i2cBus.Hold(frames[0][0]):
+                for command, data in frames:
+                    self.RawWrite(command, data)
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.Print('Failed sending stepper phase!')
+
+
     def MotorsOff(self):
         """
 MotorsOff()
@@ -769,6 +916,7 @@ EncoderMoveMotor2(5)     -> motor 2 moving forward for 5 counts
 
         try:
             self.RawWrite(command, [countsHigh, countsLow])
+            self.StartEncoderMoveTiming(counts)
         except KeyboardInterrupt:
             raise
         except:
@@ -803,6 +951,7 @@ EncoderMoveMotor1(5)     -> motor 1 moving forward for 5 counts
 
         try:
             self.RawWrite(command, [countsHigh, countsLow])
+            self.StartEncoderMoveTiming(counts)
         except KeyboardInterrupt:
             raise
         except:
@@ -838,6 +987,7 @@ EncoderMoveMotors(5)     -> all motors moving forward for 5 counts
 
         try:
             self.RawWrite(command, [countsHigh, countsLow])
+            self.StartEncoderMoveTiming(counts)
         except KeyboardInterrupt:
             raise
         except:
@@ -872,16 +1022,113 @@ Waits until all motors have finished performing encoder based moves
 If the motors stop moving the function will return True
 If a timeout is provided the function will return False after timeout seconds if the motors are still in motion
         """
-        startTime = time.time()
-        while self.IsEncoderMoving():
+        startTime = I2CBus.monotonic()
+        expectedEnd = self.EstimateEncoderMoveEnd()
+        lastMovingTime = None
+        delay = self.encoderPollMin / 2.0
+        while True:
+            checkTime = I2CBus.monotonic()
+            if not self.IsEncoderMoving():
+                break
+            lastMovingTime = checkTime
+            now = I2CBus.monotonic()
             if timeout >= 0:
-                if (time.time() - startTime) >= timeout:
+                if (now - startTime) >= timeout:
                     self.Print('Timed out after %d seconds waiting for encoder moves to complete' % (timeout))
                     return False
-            time.sleep(0.1)
+            if expectedEnd == None:
+                # No estimate yet, check less often the longer the move goes on
+                delay = min(delay * 2.0, self.encoderPollMax)
+            elif now < expectedEnd:
+                # Check rarely at first, then more and more often as the expected finish gets closer
+                delay = max(self.encoderPollMin, min(self.encoderPollMax, (expectedEnd - now) / 2.0))
+            else:
+                # Later than expected, back off again in case the estimate was well out
+                delay = min(max(delay * 2.0, self.encoderPollMin), self.encoderPollMax)
+            if timeout >= 0:
+                delay = max(0.0, min(delay, startTime + timeout - now))
+            time.sleep(delay)
+        if lastMovingTime == None:
+            # Already finished when we started waiting
+            self.encoderLatency = checkTime - startTime
+        else:
+            self.encoderLatency = checkTime - lastMovingTime
+        if self.encoderMoveStart != None:
+            self.encoderMoveTime = checkTime - self.encoderMoveStart
+            if lastMovingTime != None:
+                self.LearnEncoderRate((lastMovingTime + checkTime) / 2.0 - self.encoderMoveStart)
+            self.encoderMoveStart = None
         return True
 
 
+    def WaitForEncoderMove(self, callback, timeout = -1):
+        """
+thread = WaitForEncoderMove(callback, [timeout])
+
+Waits for encoder based moves to finish on a background thread, then calls callback with the result
+The result is the same as WaitWhileEncoderMoving, True when the motors have stopped or False if timeout ran out first
+Returns the background thread, which can be joined to wait for the callback to finish
+e.g.
+WaitForEncoderMove(MoveDone)    -> MoveDone(True) is called once the motors have finished moving
+        """
+        thread = threading.Thread(target = lambda: callback(self.WaitWhileEncoderMoving(timeout)))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+    def StartEncoderMoveTiming(self, counts):
+        """
+StartEncoderMoveTiming(counts)
+
+Notes the time and size of an encoder move, so WaitWhileEncoderMoving can estimate when it will finish
+If an earlier move is still running the timing is kept from its start and the larger of the two counts is used
+Called by the EncoderMove* functions
+        """
+        now = I2CBus.monotonic()
+        if self.encoderMoveStart != None:
+            expectedEnd = self.EstimateEncoderMoveEnd()
+            if expectedEnd == None or now < expectedEnd:
+                # Another motor is still moving, time both moves together
+                self.encoderMoveCounts = max(self.encoderMoveCounts, abs(counts))
+                return
+        self.encoderMoveStart = now
+        self.encoderMoveCounts = abs(counts)
+
+
+    def EstimateEncoderMoveEnd(self):
+        """
+endTime = EstimateEncoderMoveEnd()
+
+Returns the time, from I2CBus.monotonic, the last encoder move is expected to finish
+Returns None if there is no move being timed or the movement rate has not been learnt yet
+        """
+        if self.encoderMoveStart == None or self.encoderCountsPerSecond == None:
+            return None
+        if self.encoderSpeed == None:
+            self.encoderSpeed = self.GetEncoderSpeed()
+        if not self.encoderSpeed:
+            return None
+        return self.encoderMoveStart + self.encoderMoveCounts / (self.encoderCountsPerSecond * self.encoderSpeed)
+
+
+    def LearnEncoderRate(self, moveTime):
+        """
+LearnEncoderRate(moveTime)
+
+Updates encoderCountsPerSecond from the time in seconds the last encoder move took
+        """
+        if self.encoderSpeed == None:
+            self.encoderSpeed = self.GetEncoderSpeed()
+        if (moveTime <= 0) or (self.encoderMoveCounts <= 0) or (not self.encoderSpeed):
+            return
+        countsPerSecond = self.encoderMoveCounts / (moveTime * self.encoderSpeed)
+        if self.encoderCountsPerSecond == None:
+            self.encoderCountsPerSecond = countsPerSecond
+        else:
+            self.encoderCountsPerSecond += (countsPerSecond - self.encoderCountsPerSecond) / 2.0
+
+
     def SetEncoderSpeed(self, power):
         """
 SetEncoderSpeed(power)
@@ -899,9 +1146,11 @@ SetEncoderSpeed(1)     -> motors may move at up to 100% power
 
         try:
             self.RawWrite(COMMAND_SET_ENC_SPEED, [pwm])
+            self.encoderSpeed = float(pwm) / float(PWM_MAX)
         except KeyboardInterrupt:
             raise
         except:
+            self.encoderSpeed = None
             self.Print('Failed sending motor encoder move speed limit!')
 
 
@@ -935,10 +1184,10 @@ Help()
 Displays the names and descriptions of the various functions and settings provided
         """
         funcList = [PicoBorgRev.__dict__.get(a) for a in dir(PicoBorgRev) if isinstance(PicoBorgRev.__dict__.get(a), types.FunctionType)]
-        funcListSorted = sorted(funcList, key = lambda x: x.func_code.co_firstlineno)
+        funcListSorted = sorted(funcList, key = lambda x: x.__code__.co_firstlineno)
 
-        print self.__doc__
-        print
+        print(self.__doc__)
+        print()
         for func in funcListSorted:
-            print '=== %s === %s' % (func.func_name, func.func_doc)
+            print('=== %s === %s' % (func.__name__, func.__doc__))
 
@@ -0,0 +1 @@
+../Common/StepperEngine.py
\ No newline at end of file
@@ -32,6 +32,9 @@ if not PBR.foundChip:
 PBR.ResetEpo()
 step = -1
 
+# Work out the motor commands for each step once, ready to send
+phases = PBR.CompilePhaseTable(sequence)
+
 # Function to perform a sequence of steps as fast as allowed
 def MoveStep(count):
     global step
@@ -48,9 +51,7 @@ def MoveStep(count):
     while count > 0:
         # Set a starting position if this is the first move
         if step == -1:
-            drive = sequence[-1]
-            PBR.SetMotor1(drive[0])
-            PBR.SetMotor2(drive[1])
+            PBR.SendPhase(phases[-1])
             step = 0
         else:
             step += dir
@@ -63,9 +64,7 @@ def MoveStep(count):
 
         # For this step set the required drive values
         if step < len(sequence):
-            drive = sequence[step]
-            PBR.SetMotor1(drive[0])
-            PBR.SetMotor2(drive[1])
+            PBR.SendPhase(phases[step])
         time.sleep(stepDelay)
         count -= 1
 
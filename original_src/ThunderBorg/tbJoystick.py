@@ -14,6 +14,7 @@ sys.stdout = sys.stderr
 # Setup the ThunderBorg
 TB = ThunderBorg.ThunderBorg()
 #TB.i2cAddress = 0x15                  # Uncomment and change the value if you have changed the board address
+TB.writeCache = True                    # Only send motor and LED changes, repeats are still sent often enough for the failsafe
 TB.Init()
 if not TB.foundChip:
     boards = ThunderBorg.ScanForThunderBorg()
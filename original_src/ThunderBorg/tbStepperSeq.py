@@ -33,6 +33,9 @@ if not TB.foundChip:
     sys.exit()
 step = -1
 
+# Work out the motor commands for each step once, ready to send
+phases = TB.CompilePhaseTable(sequence)
+
 # Function to perform a sequence of steps as fast as allowed
 def MoveStep(count):
     global step
@@ -49,9 +52,7 @@ def MoveStep(count):
     while count > 0:
         # Set a starting position if this is the first move
         if step == -1:
-            drive = sequence[-1]
-            TB.SetMotor1(drive[0])
-            TB.SetMotor2(drive[1])
+            TB.SendPhase(phases[-1])
             step = 0
         else:
             step += dir
@@ -64,9 +65,7 @@ def MoveStep(count):
 
         # For this step set the required drive values
         if step < len(sequence):
-            drive = sequence[step]
-            TB.SetMotor1(drive[0])
-            TB.SetMotor2(drive[1])
+            TB.SendPhase(phases[step])
         time.sleep(stepDelay)
         count -= 1
 
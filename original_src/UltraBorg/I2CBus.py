@@ -0,0 +1 @@
+../Common/I2CBus.py
\ No newline at end of file
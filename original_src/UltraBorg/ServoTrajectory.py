@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module plays smooth, coordinated servo moves on an UltraBorg from a background thread
+
+Use by creating a trajectory for an initialised UltraBorg, queueing moves and starting it, e.g.
+import ServoTrajectory
+import UltraBorg
+UB = UltraBorg.UltraBorg()
+UB.Init()
+trajectory = ServoTrajectory.ServoTrajectory(UB)
+trajectory.Start()
+trajectory.MoveTo([1.0, -1.0, None, None], duration = 2.0)
+trajectory.MoveTo([0.0, 0.0, 0.5, 0.5], maxVelocity = 1.0, maxAcceleration = 2.0)
+trajectory.Wait()
+print(trajectory.GetReport())
+trajectory.Stop()
+
+Each move is worked out in full when it is queued, giving a table of positions for every update.
+All servos in a move start and finish together, following the same speed profile:
+speed up at a constant rate, travel at a constant speed, then slow down at a constant rate.
+Moves queued back to back are played without a gap between them.
+
+Updates are timed against absolute deadlines, so time spent sending does not build up into drift.
+If the thread falls a whole update or more behind it skips ahead, so moves still finish on time.
+The time each update was due and how late it was sent are kept, see GetReport and GetTimings.
+"""
+
+# Import the libraries we need
+import array
+import math
+import threading
+import I2CBus
+import TelemetrySampler
+
+# Constant values
+RATE_DEFAULT                = 50    # Updates sent per second
+HISTORY_SIZE_DEFAULT        = 256   # Update timings kept for GetTimings
+
+
+def PlanMove(distance, duration = None, maxVelocity = None, maxAcceleration = None):
+    """
+totalTime, accelTime = PlanMove(distance, [duration], [maxVelocity], [maxAcceleration])
+
+Works out how long a move of distance (in servo positions) takes, and how long is spent speeding up and slowing down
+maxVelocity is in positions per second, maxAcceleration in positions per second squared
+If duration is given the move takes at least that long, otherwise at least one of the limits must be given
+With only a duration a third of the move is spent speeding up and a third slowing down
+    """
+    distance = abs(float(distance))
+    if maxVelocity != None:
+        maxVelocity = float(maxVelocity)
+    if maxAcceleration != None:
+        maxAcceleration = float(maxAcceleration)
+    if duration != None:
+        duration = float(duration)
+    if maxVelocity == None and maxAcceleration == None:
+        if duration == None:
+            raise ValueError('A move needs a duration, a maximum velocity or a maximum acceleration')
+        return duration, duration / 3.0
+    if distance == 0:
+        totalTime = 0.0
+        accelTime = 0.0
+    elif maxAcceleration == None:
+        # Constant speed throughout
+        totalTime = distance / maxVelocity
+        accelTime = 0.0
+    elif maxVelocity == None or distance * maxAcceleration < maxVelocity * maxVelocity:
+        # Never reaches full speed, speed up for half the move and slow down for the other half
+        accelTime = math.sqrt(distance / maxAcceleration)
+        totalTime = 2.0 * accelTime
+    else:
+        accelTime = maxVelocity / maxAcceleration
+        totalTime = distance / maxVelocity + accelTime
+    if duration != None and duration > totalTime:
+        # Stretch the move, which keeps it within the limits
+        if totalTime > 0:
+            accelTime *= duration / totalTime
+        else:
+            accelTime = duration / 3.0
+        totalTime = duration
+    return totalTime, accelTime
+
+
+def MoveFraction(t, totalTime, accelTime):
+    """
+fraction = MoveFraction(t, totalTime, accelTime)
+
+Returns how far through a move planned by PlanMove we are after t seconds, from 0 to 1
+    """
+    if t >= totalTime:
+        return 1.0
+    if t <= 0:
+        return 0.0
+    if accelTime <= 0:
+        return t / totalTime
+    speed = 1.0 / (totalTime - accelTime)
+    if t < accelTime:
+        return 0.5 * speed * t * t / accelTime
+    if t < totalTime - accelTime:
+        return speed * (t - 0.5 * accelTime)
+    remaining = totalTime - t
+    return 1.0 - 0.5 * speed * remaining * remaining / accelTime
+
+
+# Class used to hold a single planned move
+class Move:
+    """
+This class holds the positions for each update of a move
+
+steps                   Number of updates in the move
+waypoints               Positions for each update, four values per update
+targets                 Positions at the end of the move
+totalTime               Time in seconds the move takes
+    """
+
+    def __init__(self, starts, targets, totalTime, accelTime, period):
+        self.steps = max(1, int(math.ceil(totalTime / period - 1e-9)))
+        self.targets = targets
+        self.totalTime = totalTime
+        self.waypoints = array.array('d', [0.0]) * (self.steps * 4)
+        changes = [targets[i] - starts[i] for i in range(4)]
+        index = 0
+        for step in range(1, self.steps + 1):
+            if step == self.steps:
+                fraction = 1.0
+            else:
+                fraction = MoveFraction(step * period, totalTime, accelTime)
+            for i in range(4):
+                self.waypoints[index] = starts[i] + fraction * changes[i]
+                index += 1
+
+
+# Class used to play moves on an UltraBorg
+class ServoTrajectory:
+    """
+This class plays queued servo moves on an UltraBorg, sending each update at its scheduled time
+
+board                   The UltraBorg being driven
+rate                    Updates sent per second
+positions               Positions last sent for each servo
+maxVelocity             Default maximum velocity for MoveTo in positions per second, None for no limit
+maxAcceleration         Default maximum acceleration for MoveTo in positions per second squared, None for no limit
+thread                  The playing thread, None when stopped
+    """
+
+    def __init__(self, board, rate = RATE_DEFAULT, positions = None, historySize = HISTORY_SIZE_DEFAULT):
+        self.board = board
+        self.rate = rate
+        self.period = 1.0 / rate
+        if positions == None:
+            positions = [board.GetServoPosition1(), board.GetServoPosition2(),
+                         board.GetServoPosition3(), board.GetServoPosition4()]
+            positions = [position or 0.0 for position in positions]
+        self.positions = list(positions)
+        self.plannedPositions = list(positions)
+        self.maxVelocity = None
+        self.maxAcceleration = None
+        self.thread = None
+        self.moves = []
+        self.condition = threading.Condition(threading.Lock())
+        self.stopEvent = threading.Event()
+        self.timings = TelemetrySampler.RingBuffer(historySize, 2)
+        self.ResetReport()
+
+
+    def MoveTo(self, positions, duration = None, maxVelocity = None, maxAcceleration = None):
+        """
+totalTime = MoveTo(positions, [duration], [maxVelocity], [maxAcceleration])
+
+Queues a move of all four servos to positions, a list of four positions from -1 to +1, None to leave a servo where it is
+The move starts from where the previously queued move finishes
+If duration is given the move takes that many seconds, or longer if needed to stay within the limits
+The limits default to maxVelocity and maxAcceleration, they apply to the servo with the furthest to go
+A move to the same positions holds them for the duration
+Returns the time in seconds the move will take
+        """
+        if maxVelocity == None:
+            maxVelocity = self.maxVelocity
+        if maxAcceleration == None:
+            maxAcceleration = self.maxAcceleration
+        with self.condition:
+            starts = list(self.plannedPositions)
+            targets = []
+            for i in range(4):
+                if positions[i] == None:
+                    targets.append(starts[i])
+                else:
+                    targets.append(max(-1.0, min(1.0, float(positions[i]))))
+            distance = max([abs(targets[i] - starts[i]) for i in range(4)])
+            totalTime, accelTime = PlanMove(distance, duration, maxVelocity, maxAcceleration)
+            move = Move(starts, targets, totalTime, accelTime, self.period)
+            self.moves.append(move)
+            self.plannedPositions = targets
+            self.condition.notify_all()
+        return totalTime
+
+
+    def Clear(self):
+        """
+Clear()
+
+Drops any queued moves which have not started, the move being played is finished
+        """
+        with self.condition:
+            del self.moves[1:]
+            if len(self.moves) > 0:
+                self.plannedPositions = list(self.moves[0].targets)
+            else:
+                self.plannedPositions = list(self.positions)
+
+
+    def IsMoving(self):
+        """
+moving = IsMoving()
+
+Returns True while there are moves waiting to be played or being played
+        """
+        with self.condition:
+            return len(self.moves) > 0
+
+
+    def Wait(self, timeout = None):
+        """
+finished = Wait([timeout])
+
+Waits for all queued moves to finish, or for timeout seconds if given
+Returns True if the moves have finished, False if the timeout ran out first
+        """
+        if timeout != None:
+            endTime = I2CBus.monotonic() + timeout
+        with self.condition:
+            while len(self.moves) > 0:
+                if timeout == None:
+                    self.condition.wait()
+                else:
+                    remaining = endTime - I2CBus.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+            return True
+
+
+    def Start(self):
+        """
+Start()
+
+Starts playing moves on a background thread, moves can be queued before or after starting
+        """
+        if self.thread != None:
+            return
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target = self.Run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def Stop(self):
+        """
+Stop()
+
+Stops playing straight away and drops any queued moves, the servos are left where they are
+        """
+        if self.thread == None:
+            return
+        self.stopEvent.set()
+        with self.condition:
+            self.condition.notify_all()
+        self.thread.join()
+        self.thread = None
+        with self.condition:
+            del self.moves[:]
+            self.plannedPositions = list(self.positions)
+            self.condition.notify_all()
+
+
+    def Run(self):
+        """
+Run()
+
+The playing loop, run by the background thread, use Start instead
+        """
+        nextTime = None
+        while not self.stopEvent.is_set():
+            with self.condition:
+                while len(self.moves) == 0 and not self.stopEvent.is_set():
+                    # Nothing left to play, the next move starts whenever it arrives
+                    nextTime = None
+                    self.condition.wait()
+                if self.stopEvent.is_set():
+                    break
+                move = self.moves[0]
+            if nextTime == None:
+                nextTime = I2CBus.monotonic()
+            nextTime = self.Play(move, nextTime)
+            with self.condition:
+                if self.moves and self.moves[0] is move:
+                    del self.moves[0]
+                self.condition.notify_all()
+
+
+    def Play(self, move, nextTime):
+        """
+nextTime = Play(move, nextTime)
+
+Sends the updates for a single move, the first being due at nextTime
+Returns the time the update after the move is due
+        """
+        waypoints = move.waypoints
+        step = 0
+        while step < move.steps:
+            delay = nextTime - I2CBus.monotonic()
+            if delay > 0:
+                if self.stopEvent.wait(delay):
+                    break
+            now = I2CBus.monotonic()
+            lateness = now - nextTime
+            if lateness >= self.period:
+                # Skip the updates we are too late for, but always send the last one
+                behind = min(int(lateness / self.period), move.steps - 1 - step)
+                step += behind
+                nextTime += behind * self.period
+                lateness = now - nextTime
+                self.skipped += behind
+            index = step * 4
+            positions = waypoints[index : index + 4]
+            self.board.SetServoPositions(positions[0], positions[1], positions[2], positions[3])
+            self.positions = list(positions)
+            self.timings.Write(now, (nextTime, lateness))
+            self.updates += 1
+            self.totalLateness += lateness
+            if lateness > self.worstLateness:
+                self.worstLateness = lateness
+            step += 1
+            nextTime += self.period
+        return nextTime
+
+
+    def GetReport(self):
+        """
+report = GetReport()
+
+Returns a dictionary describing how closely updates have kept to their schedule since the last ResetReport:
+updates                 Number of updates sent
+skipped                 Number of updates skipped because the thread fell behind
+meanLateness            Average time in seconds updates were sent after they were due
+worstLateness           Longest time in seconds an update was sent after it was due
+        """
+        if self.updates > 0:
+            meanLateness = self.totalLateness / self.updates
+        else:
+            meanLateness = 0.0
+        return {'updates': self.updates,
+                'skipped': self.skipped,
+                'meanLateness': meanLateness,
+                'worstLateness': self.worstLateness}
+
+
+    def GetTimings(self, count = None):
+        """
+times, values = GetTimings([count])
+
+Returns the last count update timings, all held timings if count is not given, oldest first
+times holds the time each update was sent, values holds the time it was due and how late it was for each update
+        """
+        return self.timings.Snapshot(count)
+
+
+    def ResetReport(self):
+        """
+ResetReport()
+
+Clears the counters returned by GetReport
+        """
+        self.updates = 0
+        self.skipped = 0
+        self.totalLateness = 0.0
+        self.worstLateness = 0.0
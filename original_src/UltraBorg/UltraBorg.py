@@ -27,10 +27,11 @@ See the website at www.piborg.org/ultraborg for more details
 """
 
 # Import the libraries we need
-import io
-import fcntl
+from __future__ import print_function
 import types
 import time
+import I2CBus
+import BoardCache
 
 # Constant values
 I2C_SLAVE                   = 0x0703
@@ -96,6 +97,48 @@ COMMAND_VALUE_REV       = 2     # I2C value representing reverse
 COMMAND_VALUE_ON        = 1     # I2C value representing on
 COMMAND_VALUE_OFF       = 0     # I2C value representing off
 
+# Commands read by GetDistances, in ultrasonic module order
+COMMANDS_GET_TIME_USM   = (COMMAND_GET_TIME_USM1, COMMAND_GET_TIME_USM2, COMMAND_GET_TIME_USM3, COMMAND_GET_TIME_USM4)
+COMMANDS_GET_FILTER_USM = (COMMAND_GET_FILTER_USM1, COMMAND_GET_FILTER_USM2, COMMAND_GET_FILTER_USM3, COMMAND_GET_FILTER_USM4)
+USM_ALL_ATTACHED        = (True, True, True, True)
+
+# Commands sent by SetServoPositions, in servo output order
+COMMANDS_SET_PWM        = (COMMAND_SET_PWM1, COMMAND_SET_PWM2, COMMAND_SET_PWM3, COMMAND_SET_PWM4)
+
+
+# Read cache, see UltraBorg.readCache
+# Time in seconds each cached reply is kept for, keyed by the GET command
+READ_CACHE_TTL = {
+    COMMAND_GET_ID: 60.0,
+    COMMAND_GET_PWM_MIN_1: 60.0,
+    COMMAND_GET_PWM_MAX_1: 60.0,
+    COMMAND_GET_PWM_BOOT_1: 60.0,
+    COMMAND_GET_PWM_MIN_2: 60.0,
+    COMMAND_GET_PWM_MAX_2: 60.0,
+    COMMAND_GET_PWM_BOOT_2: 60.0,
+    COMMAND_GET_PWM_MIN_3: 60.0,
+    COMMAND_GET_PWM_MAX_3: 60.0,
+    COMMAND_GET_PWM_BOOT_3: 60.0,
+    COMMAND_GET_PWM_MIN_4: 60.0,
+    COMMAND_GET_PWM_MAX_4: 60.0,
+    COMMAND_GET_PWM_BOOT_4: 60.0,
+}
+# Cached replies to forget when a command is sent
+READ_CACHE_INVALIDATES = {
+    COMMAND_SET_I2C_ADD: [COMMAND_GET_ID],
+    COMMAND_SET_PWM_MIN_1: [COMMAND_GET_PWM_MIN_1],
+    COMMAND_SET_PWM_MAX_1: [COMMAND_GET_PWM_MAX_1],
+    COMMAND_SET_PWM_BOOT_1: [COMMAND_GET_PWM_BOOT_1],
+    COMMAND_SET_PWM_MIN_2: [COMMAND_GET_PWM_MIN_2],
+    COMMAND_SET_PWM_MAX_2: [COMMAND_GET_PWM_MAX_2],
+    COMMAND_SET_PWM_BOOT_2: [COMMAND_GET_PWM_BOOT_2],
+    COMMAND_SET_PWM_MIN_3: [COMMAND_GET_PWM_MIN_3],
+    COMMAND_SET_PWM_MAX_3: [COMMAND_GET_PWM_MAX_3],
+    COMMAND_SET_PWM_BOOT_3: [COMMAND_GET_PWM_BOOT_3],
+    COMMAND_SET_PWM_MIN_4: [COMMAND_GET_PWM_MIN_4],
+    COMMAND_SET_PWM_MAX_4: [COMMAND_GET_PWM_MAX_4],
+    COMMAND_SET_PWM_BOOT_4: [COMMAND_GET_PWM_BOOT_4],
+}
 
 def ScanForUltraBorg(busNumber = 1):
     """
@@ -105,7 +148,7 @@ Scans the I
 The busNumber if supplied is which IC bus to scan, 0 for Rev 1 boards, 1 for Rev 2 boards, if not supplied the default is 1
     """
     found = []
-    print 'Scanning IC bus #%d' % (busNumber)
+    print('Scanning IC bus #%d' % (busNumber))
     bus = UltraBorg()
     for address in range(0x03, 0x78, 1):
         try:
@@ -113,7 +156,7 @@ The busNumber if supplied is which I
             i2cRecv = bus.RawRead(COMMAND_GET_ID, I2C_MAX_LEN)
             if len(i2cRecv) == I2C_MAX_LEN:
                 if i2cRecv[1] == I2C_ID_SERVO_USM:
-                    print 'Found UltraBorg at %02X' % (address)
+                    print('Found UltraBorg at %02X' % (address))
                     found.append(address)
                 else:
                     pass
@@ -124,11 +167,11 @@ The busNumber if supplied is which I
         except:
             pass
     if len(found) == 0:
-        print 'No UltraBorg boards found, is bus #%d correct (should be 0 for Rev 1, 1 for Rev 2)' % (busNumber)
+        print('No UltraBorg boards found, is bus #%d correct (should be 0 for Rev 1, 1 for Rev 2)' % (busNumber))
     elif len(found) == 1:
-        print '1 UltraBorg board found'
+        print('1 UltraBorg board found')
     else:
-        print '%d UltraBorg boards found' % (len(found))
+        print('%d UltraBorg boards found' % (len(found)))
     return found
 
 
@@ -142,19 +185,19 @@ The busNumber if supplied is which I
 Warning, this new IC address will still be used after resetting the power on the device
     """
     if newAddress < 0x03:
-        print 'Error, IC addresses below 3 (0x03) are reserved, use an address between 3 (0x03) and 119 (0x77)'
+        print('Error, IC addresses below 3 (0x03) are reserved, use an address between 3 (0x03) and 119 (0x77)')
         return
     elif newAddress > 0x77:
-        print 'Error, IC addresses above 119 (0x77) are reserved, use an address between 3 (0x03) and 119 (0x77)'
+        print('Error, IC addresses above 119 (0x77) are reserved, use an address between 3 (0x03) and 119 (0x77)')
         return
     if oldAddress < 0x0:
         found = ScanForUltraBorg(busNumber)
         if len(found) < 1:
-            print 'No UltraBorg boards found, cannot set a new IC address!'
+            print('No UltraBorg boards found, cannot set a new IC address!')
             return
         else:
             oldAddress = found[0]
-    print 'Changing IC address from %02X to %02X (bus #%d)' % (oldAddress, newAddress, busNumber)
+    print('Changing IC address from %02X to %02X (bus #%d)' % (oldAddress, newAddress, busNumber))
     bus = UltraBorg()
     bus.InitBusOnly(busNumber, oldAddress)
     try:
@@ -162,56 +205,64 @@ Warning, this new I
         if len(i2cRecv) == I2C_MAX_LEN:
             if i2cRecv[1] == I2C_ID_SERVO_USM:
                 foundChip = True
-                print 'Found UltraBorg at %02X' % (oldAddress)
+                print('Found UltraBorg at %02X' % (oldAddress))
             else:
                 foundChip = False
-                print 'Found a device at %02X, but it is not a UltraBorg (ID %02X instead of %02X)' % (oldAddress, i2cRecv[1], I2C_ID_SERVO_USM)
+                print('Found a device at %02X, but it is not a UltraBorg (ID %02X instead of %02X)' % (oldAddress, i2cRecv[1], I2C_ID_SERVO_USM))
         else:
             foundChip = False
-            print 'Missing UltraBorg at %02X' % (oldAddress)
+            print('Missing UltraBorg at %02X' % (oldAddress))
     except KeyboardInterrupt:
         raise
     except:
         foundChip = False
-        print 'Missing UltraBorg at %02X' % (oldAddress)
+        print('Missing UltraBorg at %02X' % (oldAddress))
     if foundChip:
         bus.RawWrite(COMMAND_SET_I2C_ADD, [newAddress])
         time.sleep(0.1)
-        print 'Address changed to %02X, attempting to talk with the new address' % (newAddress)
+        print('Address changed to %02X, attempting to talk with the new address' % (newAddress))
         try:
             bus.InitBusOnly(busNumber, newAddress)
             i2cRecv = bus.RawRead(COMMAND_GET_ID, I2C_MAX_LEN)
             if len(i2cRecv) == I2C_MAX_LEN:
                 if i2cRecv[1] == I2C_ID_SERVO_USM:
                     foundChip = True
-                    print 'Found UltraBorg at %02X' % (newAddress)
+                    print('Found UltraBorg at %02X' % (newAddress))
                 else:
                     foundChip = False
-                    print 'Found a device at %02X, but it is not a UltraBorg (ID %02X instead of %02X)' % (newAddress, i2cRecv[1], I2C_ID_SERVO_USM)
+                    print('Found a device at %02X, but it is not a UltraBorg (ID %02X instead of %02X)' % (newAddress, i2cRecv[1], I2C_ID_SERVO_USM))
             else:
                 foundChip = False
-                print 'Missing UltraBorg at %02X' % (newAddress)
+                print('Missing UltraBorg at %02X' % (newAddress))
         except KeyboardInterrupt:
             raise
         except:
             foundChip = False
-            print 'Missing UltraBorg at %02X' % (newAddress)
+            print('Missing UltraBorg at %02X' % (newAddress))
     if foundChip:
-        print 'New IC address of %02X set successfully' % (newAddress)
+        print('New IC address of %02X set successfully' % (newAddress))
     else:
-        print 'Failed to set new IC address...'
+        print('Failed to set new IC address...')
 
 
 # Class used to control UltraBorg
-class UltraBorg:
+class UltraBorg(BoardCache.ReadCache):
     """
 This module is designed to communicate with the UltraBorg
 
 busNumber               IC bus on which the UltraBorg is attached (Rev 1 is bus 0, Rev 2 is bus 1)
 bus                     the smbus object used to talk to the IC bus
+i2cBus                  The shared I2CBus transport used to talk to the IC bus
 i2cAddress              The IC address of the UltraBorg chip to control
 foundChip               True if the UltraBorg chip can be seen, False otherwise
 printFunction           Function reference to call when printing text, if None "print" is used
+readCache               True to keep replies to reads of values which only change when written, see RawRead
+readCacheTtl            Time in seconds each cached reply is kept for, keyed by the GET command
+readCacheHits           Number of reads answered from the read cache
+readCacheMisses         Number of reads which could have been cached but had to be read from the board
+usmAttached             True for each ultrasonic module seen by DetectUltrasonics, None if it has not been run
+skipUnchanged           True to have SetServoPositions only send servos which have changed since its last call
+servoUpdateTime         Time in seconds the last SetServoPositions call held the bus for
     """
 
     # Shared values used by this class
@@ -219,8 +270,19 @@ printFunction           Function reference to call when printing text, if None "
     i2cAddress              = I2C_ID_SERVO_USM  # IC address, override for a different address
     foundChip               = False
     printFunction           = None
-    i2cWrite                = None
-    i2cRead                 = None
+    i2cBus                  = None
+    readCache               = False
+    readCacheTtl            = READ_CACHE_TTL    # Replace, rather than change, to use different times for one board
+    readCacheInvalidates    = READ_CACHE_INVALIDATES
+    readCacheHits           = 0
+    readCacheMisses         = 0
+    readCacheEntries        = None              # Cached reply and time read for each GET command
+    usmAttached             = None
+    skipUnchanged           = False
+    servoUpdateTime         = 0.0
+    servoScales             = None              # PWM change for a position change of 1, for each servo
+    servoOffsets            = None              # PWM level for a position of 0, for each servo
+    lastServoFrames         = None              # [pwmHigh, pwmLow] last sent by SetServoPositions for each servo
 
     # Default calibration adjustments to standard values
     PWM_MIN_1               = PWM_MIN
@@ -239,12 +301,13 @@ RawWrite(command, data)
 Sends a raw command on the I2C bus to the UltraBorg
 Command codes can be found at the top of UltraBorg.py, data is a list of 0 or more byte values
 
+Writes which change a value held in the read cache remove it from the cache, see READ_CACHE_INVALIDATES
+The caches are shared with the other board modules, see BoardCache
+
 Under most circumstances you should use the appropriate function instead of RawWrite
         """
-        rawOutput = chr(command)
-        for singleByte in data:
-            rawOutput += chr(singleByte)
-        self.i2cWrite.write(rawOutput)
+        self.ForgetReadCache(command)
+        self.i2cBus.Write(self.i2cAddress, command, data)
 
 
     def RawRead(self, command, length, retryCount = 3):
@@ -256,21 +319,24 @@ Command codes can be found at the top of UltraBorg.py, length is the number of b
 
 The function checks that the first byte read back matches the requested command
 If it does not it will retry the request until retryCount is exhausted (default is 3 times)
+If combined reads are enabled on the bus (i2cBus.SetCombinedReads(True)) each attempt is a single I2C_RDWR transaction
+If readCache is True replies to the commands in readCacheTtl are kept for that long and reused
 
 Under most circumstances you should use the appropriate function instead of RawRead
         """
+        if self.readCache:
+            reply = self.LookupReadCache(command, length)
+            if reply != None:
+                return reply
         while retryCount > 0:
-            self.RawWrite(command, [])
-            time.sleep(0.000001)
-            rawReply = self.i2cRead.read(length)
-            reply = []
-            for singleByte in rawReply:
-                reply.append(ord(singleByte))
+            reply = self.i2cBus.Read(self.i2cAddress, command, length, 0.000001)
             if command == reply[0]:
                 break
             else:
                 retryCount -= 1
         if retryCount > 0:
+            if self.readCache:
+                self.StoreReadCache(command, reply)
             return reply
         else:
             raise IOError('I2C read for command %d failed' % (command))
@@ -285,10 +351,7 @@ This call does not check the board is present or working, under most circumstanc
         """
         self.busNumber = busNumber
         self.i2cAddress = address
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        self.i2cBus = I2CBus.GetBus(self.busNumber)
 
 
     def Print(self, message):
@@ -298,7 +361,7 @@ Print(message)
 Wrapper used by the UltraBorg instance to print messages, will call printFunction if set, print otherwise
         """
         if self.printFunction == None:
-            print message
+            print(message)
         else:
             self.printFunction(message)
 
@@ -325,11 +388,8 @@ If tryOtherBus is True, this function will attempt to use the other bus if the T
         """
         self.Print('Loading UltraBorg on bus %d, address %02X' % (self.busNumber, self.i2cAddress))
 
-        # Open the bus
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        # Open the bus, shared with any other boards already using it
+        self.i2cBus = I2CBus.GetBus(self.busNumber)
 
         # Check for UltraBorg
         try:
@@ -375,6 +435,11 @@ If tryOtherBus is True, this function will attempt to use the other bus if the T
         self.PWM_MAX_3 = self.GetWithRetry(self.GetServoMaximum3, 5)
         self.PWM_MIN_4 = self.GetWithRetry(self.GetServoMinimum4, 5)
         self.PWM_MAX_4 = self.GetWithRetry(self.GetServoMaximum4, 5)
+        self.UpdateServoScaling()
+
+        # See which ultrasonic modules are attached
+        if self.foundChip:
+            self.DetectUltrasonics()
 
 
     def GetWithRetry(self, function, count):
@@ -648,6 +713,68 @@ e.g.
         return time_us * USM_US_TO_MM
 
 
+    def GetDistances(self, raw = False, attachedOnly = False):
+        """
+distances = GetDistances([raw], [attachedOnly])
+
+Gets the distances for all four ultrasonic modules in millimeters, as a tuple of (distance1, distance2, distance3, distance4)
+The four readings are taken together while holding the bus, so they are not split up by other boards on the bus
+Each distance is 0 for no object detected or no ultrasonic module attached, the same as GetDistance1 to GetDistance4
+If raw is True the unfiltered readings are used instead, the same as GetRawDistance1 to GetRawDistance4
+If attachedOnly is True modules not seen by DetectUltrasonics are not read, they are returned as 0
+Returns None if the readings could not be taken
+e.g.
+(0, 250, 1000, 0) -> Objects 250 mm and 1000 mm away from #2 and #3, nothing in range of #1 and #4
+        """
+        if raw:
+            commands = COMMANDS_GET_TIME_USM
+        else:
+            commands = COMMANDS_GET_FILTER_USM
+        if attachedOnly and self.usmAttached != None:
+            attached = self.usmAttached
+        else:
+            attached = USM_ALL_ATTACHED
+        times_us = [0, 0, 0, 0]
+        try:
+            with self.i2cBus.Hold(commands[0]):
+                for i in range(4):
+                    if attached[i]:
+                        i2cRecv = self.RawRead(commands[i], I2C_MAX_LEN)
+                        times_us[i] = (i2cRecv[1] << 8) + i2cRecv[2]
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.Print('Failed reading ultrasonic distances!')
+            return
+
+        return tuple([time_us * USM_US_TO_MM if time_us != 65535 else 0.0 for time_us in times_us])
+
+
+    def DetectUltrasonics(self):
+        """
+attached = DetectUltrasonics()
+
+Checks which ultrasonic modules are attached, by taking an unfiltered reading from each one
+A module counts as attached if it gives any reading, including out of range
+Returns a tuple of (attached1, attached2, attached3, attached4), also stored in usmAttached for GetDistances
+Returns None and leaves usmAttached unchanged if the readings could not be taken
+        """
+        attached = [False, False, False, False]
+        try:
+            with self.i2cBus.Hold(COMMANDS_GET_TIME_USM[0]):
+                for i in range(4):
+                    i2cRecv = self.RawRead(COMMANDS_GET_TIME_USM[i], I2C_MAX_LEN)
+                    attached[i] = ((i2cRecv[1] << 8) + i2cRecv[2]) != 0
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.Print('Failed checking for ultrasonic modules!')
+            return
+
+        self.usmAttached = tuple(attached)
+        return self.usmAttached
+
+
     def GetServoPosition1(self):
         """
 position = GetServoPosition1()
@@ -848,6 +975,79 @@ e.g.
             self.Print('Failed sending servo output #1!')
 
 
+    def SetServoPositions(self, position1, position2, position3, position4):
+        """
+SetServoPositions(position1, position2, position3, position4)
+
+Sets the drive position for each of the four servo outputs in a single update
+0 is central, -1 is maximum left, +1 is maximum right
+e.g.
+SetServoPositions(0, 0, 0, 0)           -> all servos central
+SetServoPositions(1, -1, 0.5, -0.75)    -> #1 100% to the right, #2 100% to the left, #3 50% to the right, #4 75% to the left
+
+The PWM levels are worked out from the scaling kept by UpdateServoScaling, then the four commands are sent
+back to back while holding the bus.
+The time the bus was held for is stored in servoUpdateTime.
+
+If skipUnchanged is True only servos with a different PWM level to the last call are sent.
+Servo changes made by other functions are not seen, call with skipUnchanged False to resend all four.
+        """
+        if self.servoScales == None:
+            self.UpdateServoScaling()
+        scales = self.servoScales
+        offsets = self.servoOffsets
+        lastFrames = self.lastServoFrames
+        if (not self.skipUnchanged) or (lastFrames == None):
+            lastFrames = [None, None, None, None]
+        try:
+            frames = []
+            for servo, position in enumerate((position1, position2, position3, position4)):
+                pwmDuty = int(position * scales[servo] + offsets[servo])
+                frames.append([(pwmDuty >> 8) & 0xFF, pwmDuty & 0xFF])
+            # Nothing to send means no turn on the bus is needed
+            changed = [servo for servo in range(4) if frames[servo] != lastFrames[servo]]
+            self.servoUpdateTime = 0.0
+            if changed:
+                with self.i2cBus.Hold(COMMANDS_SET_PWM[changed[0]]):
+                    startTime = I2CBus.monotonic()
+                    for servo in changed:
+                        self.RawWrite(COMMANDS_SET_PWM[servo], frames[servo])
+                    self.servoUpdateTime = I2CBus.monotonic() - startTime
+            self.lastServoFrames = frames
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.lastServoFrames = None
+            self.Print('Failed sending servo outputs!')
+
+
+    def UpdateServoScaling(self):
+        """
+UpdateServoScaling()
+
+Works out the scaling used by SetServoPositions from the PWM_MIN_n and PWM_MAX_n limits
+This is done by Init and the SetServoMinimum / SetServoMaximum functions,
+call it yourself if you change the limits in some other way
+        """
+        scales = []
+        offsets = []
+        for minimum, maximum in ((self.PWM_MIN_1, self.PWM_MAX_1),
+                                 (self.PWM_MIN_2, self.PWM_MAX_2),
+                                 (self.PWM_MIN_3, self.PWM_MAX_3),
+                                 (self.PWM_MIN_4, self.PWM_MAX_4)):
+            if minimum == None or maximum == None:
+                # Limits could not be read, SetServoPositions will fail until they are known
+                scales.append(None)
+                offsets.append(None)
+            else:
+                scale = (maximum - minimum) / 2.0
+                scales.append(scale)
+                offsets.append(minimum + scale)
+        self.servoScales = scales
+        self.servoOffsets = offsets
+        self.lastServoFrames = None
+
+
     def GetServoMinimum1(self):
         """
 pwmLevel = GetServoMinimum1()
@@ -1398,6 +1598,7 @@ e.g.
             self.Print('Failed sending servo minimum limit #1!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MIN_1 = self.GetServoMinimum1()
+        self.UpdateServoScaling()
 
 
     def SetServoMinimum2(self, pwmLevel):
@@ -1430,6 +1631,7 @@ e.g.
             self.Print('Failed sending servo minimum limit #2!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MIN_2 = self.GetServoMinimum2()
+        self.UpdateServoScaling()
 
 
     def SetServoMinimum3(self, pwmLevel):
@@ -1462,6 +1664,7 @@ e.g.
             self.Print('Failed sending servo minimum limit #3!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MIN_3 = self.GetServoMinimum3()
+        self.UpdateServoScaling()
 
 
     def SetServoMinimum4(self, pwmLevel):
@@ -1494,6 +1697,7 @@ e.g.
             self.Print('Failed sending servo minimum limit #4!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MIN_4 = self.GetServoMinimum4()
+        self.UpdateServoScaling()
 
 
     def SetServoMaximum1(self, pwmLevel):
@@ -1526,6 +1730,7 @@ e.g.
             self.Print('Failed sending servo maximum limit #1!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MAX_1 = self.GetServoMaximum1()
+        self.UpdateServoScaling()
 
 
     def SetServoMaximum2(self, pwmLevel):
@@ -1558,6 +1763,7 @@ e.g.
             self.Print('Failed sending servo maximum limit #2!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MAX_2 = self.GetServoMaximum2()
+        self.UpdateServoScaling()
 
 
     def SetServoMaximum3(self, pwmLevel):
@@ -1590,6 +1796,7 @@ e.g.
             self.Print('Failed sending servo maximum limit #3!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MAX_3 = self.GetServoMaximum3()
+        self.UpdateServoScaling()
 
 
     def SetServoMaximum4(self, pwmLevel):
@@ -1622,6 +1829,7 @@ e.g.
             self.Print('Failed sending servo maximum limit #4!')
         time.sleep(DELAY_AFTER_EEPROM)
         self.PWM_MAX_4 = self.GetServoMaximum4()
+        self.UpdateServoScaling()
 
 
     def SetServoStartup1(self, pwmLevel):
@@ -1662,7 +1870,7 @@ e.g.
             inRange = True
 
         if not inRange:
-            print 'Servo #1 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_1, self.PWM_MAX_1)
+            print('Servo #1 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_1, self.PWM_MAX_1))
             return
 
         try:
@@ -1712,7 +1920,7 @@ e.g.
             inRange = True
 
         if not inRange:
-            print 'Servo #2 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_2, self.PWM_MAX_2)
+            print('Servo #2 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_2, self.PWM_MAX_2))
             return
 
         try:
@@ -1762,7 +1970,7 @@ e.g.
             inRange = True
 
         if not inRange:
-            print 'Servo #3 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_3, self.PWM_MAX_3)
+            print('Servo #3 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_3, self.PWM_MAX_3))
             return
 
         try:
@@ -1812,7 +2020,7 @@ e.g.
             inRange = True
 
         if not inRange:
-            print 'Servo #4 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_4, self.PWM_MAX_4)
+            print('Servo #4 startup position %d is outside the limits of %d to %d' % (pwmLevel, self.PWM_MIN_4, self.PWM_MAX_4))
             return
 
         try:
@@ -1831,10 +2039,10 @@ Help()
 Displays the names and descriptions of the various functions and settings provided
         """
         funcList = [UltraBorg.__dict__.get(a) for a in dir(UltraBorg) if isinstance(UltraBorg.__dict__.get(a), types.FunctionType)]
-        funcListSorted = sorted(funcList, key = lambda x: x.func_code.co_firstlineno)
+        funcListSorted = sorted(funcList, key = lambda x: x.__code__.co_firstlineno)
 
-        print self.__doc__
-        print
+        print(self.__doc__)
+        print()
         for func in funcListSorted:
-            print '=== %s === %s' % (func.func_name, func.func_doc)
+            print('=== %s === %s' % (func.__name__, func.__doc__))
 
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module filters the raw UltraBorg ultrasonic readings on the Raspberry Pi
+
+The board's own filter (GetDistance1 to GetDistance4) is smooth but slow to follow a moving object,
+the raw readings (GetRawDistance1 to GetRawDistance4) follow quickly but are noisy.
+This filter takes the raw readings and gives smoothed distances along with how fast each object is approaching.
+
+Use by creating a filter for an initialised UltraBorg and calling Read at a steady rate, e.g.
+import UltrasonicFilter
+import UltraBorg
+UB = UltraBorg.UltraBorg()
+UB.Init()
+usmFilter = UltrasonicFilter.UltrasonicFilter(UB)
+while True:
+    distances, velocities = usmFilter.Read()
+    ...
+
+Each reading passes through up to three stages, each of which can be turned off:
+median                  Median of the last medianSize readings, removes single bad readings
+exponential             Exponential smoothing by smoothing, 1 leaves the readings unchanged
+kalman                  Constant velocity Kalman filter, gives the distance and closing velocity
+
+Readings of 0 (nothing in range) are skipped, the last estimate is carried on from.
+After missLimit of them in a row the channel reads 0 again, until an object is seen.
+All of the filter state is held in arrays made when the filter is created.
+"""
+
+# Import the libraries we need
+import array
+import I2CBus
+
+# Constant values
+CHANNELS                    = 4
+MEDIAN_SIZE_DEFAULT         = 3         # Readings the median is taken over
+SMOOTHING_DEFAULT           = 1.0       # Exponential smoothing factor, 1 for none
+ACCELERATION_NOISE_DEFAULT  = 2000.0    # Expected change in object speed, in mm/s per second
+MEASUREMENT_NOISE_DEFAULT   = 15.0      # Expected error in a single raw reading, in mm
+MISS_LIMIT_DEFAULT          = 3         # Readings of 0 in a row before a channel reads 0
+
+
+# Class used to filter the four ultrasonic channels
+class UltrasonicFilter:
+    """
+This class filters raw ultrasonic readings for all four channels
+
+board                   The UltraBorg to read from in Read, None if readings are passed to Update instead
+medianSize              Number of readings the median is taken over, 1 for no median stage
+smoothing               Exponential smoothing factor from 0 to 1, smaller is smoother, 1 for no exponential stage
+kalman                  True to use the Kalman filter stage, False to work velocity out from the change in distance
+accelerationNoise       Expected change in object speed in mm/s per second, larger follows changes faster
+measurementNoise        Expected error in a single reading in mm, larger is smoother
+missLimit               Number of readings of 0 in a row before a channel reads 0
+distances               Filtered distance in mm for each channel, 0 for no object
+velocities              Closing velocity in mm/s for each channel, positive when the object is getting closer
+    """
+
+    def __init__(self, board = None, medianSize = MEDIAN_SIZE_DEFAULT, smoothing = SMOOTHING_DEFAULT, kalman = True,
+                 accelerationNoise = ACCELERATION_NOISE_DEFAULT, measurementNoise = MEASUREMENT_NOISE_DEFAULT,
+                 missLimit = MISS_LIMIT_DEFAULT):
+        self.board = board
+        self.medianSize = max(1, int(medianSize))
+        self.smoothing = smoothing
+        self.kalman = kalman
+        self.accelerationNoise = accelerationNoise
+        self.measurementNoise = measurementNoise
+        self.missLimit = missLimit
+        self.distances = array.array('d', [0.0] * CHANNELS)
+        self.velocities = array.array('d', [0.0] * CHANNELS)
+        # Last medianSize readings for each channel, medianSize values per channel
+        self.history = array.array('d', [0.0] * (CHANNELS * self.medianSize))
+        self.historyCounts = array.array('l', [0] * CHANNELS)
+        self.smoothed = array.array('d', [0.0] * CHANNELS)
+        # Kalman state, distance and velocity (away from the board) with their covariance
+        self.kalmanDistances = array.array('d', [0.0] * CHANNELS)
+        self.kalmanVelocities = array.array('d', [0.0] * CHANNELS)
+        self.covariances = array.array('d', [0.0] * (CHANNELS * 3))
+        self.sampleTimes = array.array('d', [0.0] * CHANNELS)
+        self.tracking = [False] * CHANNELS
+        self.misses = array.array('l', [0] * CHANNELS)
+
+
+    def Reset(self):
+        """
+Reset()
+
+Forgets all readings, each channel starts again from its next reading
+        """
+        for channel in range(CHANNELS):
+            self.ResetChannel(channel)
+
+
+    def ResetChannel(self, channel):
+        """
+ResetChannel(channel)
+
+Forgets the readings for a single channel, numbered from 0
+        """
+        self.distances[channel] = 0.0
+        self.velocities[channel] = 0.0
+        self.historyCounts[channel] = 0
+        self.tracking[channel] = False
+        self.misses[channel] = 0
+
+
+    def Read(self):
+        """
+distances, velocities = Read()
+
+Takes the raw readings for all four channels from board and filters them, see Update
+Returns (None, None) if the readings could not be taken
+        """
+        readings = self.board.GetDistances(raw = True, attachedOnly = True)
+        if readings == None:
+            return None, None
+        return self.Update(readings, I2CBus.monotonic())
+
+
+    def Update(self, readings, sampleTime):
+        """
+distances, velocities = Update(readings, sampleTime)
+
+Filters a set of four raw readings in mm taken at sampleTime, in seconds from I2CBus.monotonic
+Returns the distances and velocities arrays, which are changed in place by the next update
+        """
+        for channel in range(CHANNELS):
+            reading = readings[channel]
+            if not reading:
+                # Nothing in range, carry on from the last estimate for a while
+                self.misses[channel] += 1
+                if self.misses[channel] >= self.missLimit:
+                    self.ResetChannel(channel)
+                continue
+            self.misses[channel] = 0
+            value = self.Median(channel, reading)
+            if not self.tracking[channel]:
+                self.StartChannel(channel, value, sampleTime)
+                continue
+            if self.smoothing < 1.0:
+                value = self.smoothed[channel] + self.smoothing * (value - self.smoothed[channel])
+                self.smoothed[channel] = value
+            if self.kalman:
+                self.KalmanUpdate(channel, value, sampleTime)
+            else:
+                elapsed = sampleTime - self.sampleTimes[channel]
+                if elapsed > 0:
+                    self.velocities[channel] = (self.distances[channel] - value) / elapsed
+                self.distances[channel] = value
+            self.sampleTimes[channel] = sampleTime
+        return self.distances, self.velocities
+
+
+    def Median(self, channel, reading):
+        """
+value = Median(channel, reading)
+
+Adds a reading to a channel's history and returns the median of the readings held
+        """
+        size = self.medianSize
+        if size == 1:
+            return reading
+        start = channel * size
+        count = self.historyCounts[channel]
+        self.history[start + (count % size)] = reading
+        count += 1
+        self.historyCounts[channel] = count
+        if count > size:
+            count = size
+        held = sorted(self.history[start : start + count])
+        middle = count // 2
+        if count % 2:
+            return held[middle]
+        return (held[middle - 1] + held[middle]) * 0.5
+
+
+    def StartChannel(self, channel, value, sampleTime):
+        """
+StartChannel(channel, value, sampleTime)
+
+Starts tracking a newly seen object from its first reading
+        """
+        self.tracking[channel] = True
+        self.smoothed[channel] = value
+        self.distances[channel] = value
+        self.velocities[channel] = 0.0
+        self.kalmanDistances[channel] = value
+        self.kalmanVelocities[channel] = 0.0
+        index = channel * 3
+        self.covariances[index] = self.measurementNoise * self.measurementNoise
+        self.covariances[index + 1] = 0.0
+        # Start unsure of the speed, roughly a second's worth of acceleration
+        self.covariances[index + 2] = self.accelerationNoise * self.accelerationNoise
+        self.sampleTimes[channel] = sampleTime
+
+
+    def KalmanUpdate(self, channel, value, sampleTime):
+        """
+KalmanUpdate(channel, value, sampleTime)
+
+Moves a channel's Kalman estimate on to sampleTime, then corrects it with a reading
+        """
+        dt = sampleTime - self.sampleTimes[channel]
+        if dt < 0:
+            dt = 0.0
+        index = channel * 3
+        p00 = self.covariances[index]
+        p01 = self.covariances[index + 1]
+        p11 = self.covariances[index + 2]
+        distance = self.kalmanDistances[channel]
+        velocity = self.kalmanVelocities[channel]
+
+        # Predict, assuming the object keeps its speed apart from random changes
+        distance += velocity * dt
+        q = self.accelerationNoise * self.accelerationNoise
+        dt2 = dt * dt
+        p00 += dt * (2.0 * p01 + dt * p11) + q * dt2 * dt2 * 0.25
+        p01 += dt * p11 + q * dt2 * dt * 0.5
+        p11 += q * dt2
+
+        # Correct using the reading
+        r = self.measurementNoise * self.measurementNoise
+        s = p00 + r
+        k0 = p00 / s
+        k1 = p01 / s
+        error = value - distance
+        distance += k0 * error
+        velocity += k1 * error
+        p11 -= k1 * p01
+        p01 -= k0 * p01
+        p00 -= k0 * p00
+
+        self.covariances[index] = p00
+        self.covariances[index + 1] = p01
+        self.covariances[index + 2] = p11
+        self.kalmanDistances[channel] = distance
+        self.kalmanVelocities[channel] = velocity
+        if distance < 0:
+            distance = 0.0
+        self.distances[channel] = distance
+        self.velocities[channel] = -velocity
@@ -14,10 +14,7 @@ print 'Press CTRL+C to finish'
 try:
     while True:
         # Read all four ultrasonic values
-        usm1 = UB.GetDistance1()
-        usm2 = UB.GetDistance2()
-        usm3 = UB.GetDistance3()
-        usm4 = UB.GetDistance4()
+        usm1, usm2, usm3, usm4 = UB.GetDistances()
         # Convert to the nearest millimeter
         usm1 = int(usm1)
         usm2 = int(usm2)
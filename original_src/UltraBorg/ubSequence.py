@@ -30,10 +30,7 @@ try:
     servo3 = 0.0
     servo4 = 0.0
     # Set our initial servo positions
-    UB.SetServoPosition1(servo1)
-    UB.SetServoPosition2(servo2)
-    UB.SetServoPosition3(servo3)
-    UB.SetServoPosition4(servo4)
+    UB.SetServoPositions(servo1, servo2, servo3, servo4)
     # Wait a while to be sure the servos have caught up
     time.sleep(startupDelay)
     print 'Sweep to start position'
@@ -50,10 +47,7 @@ try:
             servo3 = servoMin
             servo4 = servoMin
         # Set our new servo positions
-        UB.SetServoPosition1(servo1)
-        UB.SetServoPosition2(servo2)
-        UB.SetServoPosition3(servo3)
-        UB.SetServoPosition4(servo4)
+        UB.SetServoPositions(servo1, servo2, servo3, servo4)
         # Wait until the next step
         time.sleep(stepDelay)
     print 'Sweep all servos through the range'
@@ -73,10 +67,7 @@ try:
         if servo4 > servoMax:
             servo4 -= (servoMax - servoMin)
         # Set our new servo positions
-        UB.SetServoPosition1(servo1)
-        UB.SetServoPosition2(servo2)
-        UB.SetServoPosition3(servo3)
-        UB.SetServoPosition4(servo4)
+        UB.SetServoPositions(servo1, servo2, servo3, servo4)
         # Wait until the next step
         time.sleep(stepDelay)
 except KeyboardInterrupt:
@@ -26,10 +26,7 @@ try:
     servo4 = 0.0
     while True:
         # Read all four ultrasonic values, we use the raw values so we respond quickly
-        usm1 = UB.GetRawDistance1()
-        usm2 = UB.GetRawDistance2()
-        usm3 = UB.GetRawDistance3()
-        usm4 = UB.GetRawDistance4()
+        usm1, usm2, usm3, usm4 = UB.GetDistances(raw = True)
         # Convert to the nearest millimeter
         usm1 = int(usm1)
         usm2 = int(usm2)
@@ -67,10 +64,7 @@ try:
         print '%4d mm -> %.1f %%' % (usm4, servo4 * 100.0)
         print
         # Set our new servo positions
-        UB.SetServoPosition1(servo1)
-        UB.SetServoPosition2(servo2)
-        UB.SetServoPosition3(servo3)
-        UB.SetServoPosition4(servo4)
+        UB.SetServoPositions(servo1, servo2, servo3, servo4)
         # Wait between readings
         time.sleep(.1)
 except KeyboardInterrupt:
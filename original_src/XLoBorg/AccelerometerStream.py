@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module streams every sample the XLoBorg accelerometer takes, for vibration monitoring and similar uses
+
+Use by creating a stream for an initialised XLoBorg with the sample rate wanted, starting it, then reading batches, e.g.
+import AccelerometerStream
+import XLoBorg
+XLB = XLoBorg.XLoBorg()
+XLB.Init()
+stream = AccelerometerStream.AccelerometerStream(XLB, 400)
+stream.Start()
+for times, samples in stream.Batches(0.1):
+    # times holds the time of each sample, samples holds x, y, z in G for each sample
+    ...
+stream.Stop()
+print(stream.GetReport())
+
+The accelerometer is set to take samples at its own rate, see XLoBorg.SetAccelerometerDataRate.
+A background thread reads the status with the sample, so only new samples are kept and none are read twice.
+If the status shows a sample was overwritten before it was read the missed samples are counted as dropped.
+Polls are timed from when the last sample was seen, so the thread sleeps for most of each sample period.
+The MMA8452Q on the XLoBorg has no FIFO, so each sample has to be read before the next one is taken.
+At the higher rates a thread held up for more than a sample period by the system will still drop samples,
+check the dropped count in GetReport to see if this is happening.
+
+Samples are kept in a fixed-size ring buffer, see TelemetrySampler.RingBuffer, so they can also be read with Latest or Snapshot.
+"""
+
+# Import the libraries we need
+import threading
+import I2CBus
+import TelemetrySampler
+import XLoBorg
+
+# Constant values
+RATE_DEFAULT                = 400.0 # Samples per second
+BUFFER_SIZE_DEFAULT         = 4096  # Samples kept, about 5 seconds at 800 samples per second
+POLL_EARLY                  = 0.25  # Fraction of a sample period the next poll is made early by
+POLL_RETRY                  = 0.125 # Fraction of a sample period between polls while waiting for a sample
+
+
+# Class used to stream samples from an XLoBorg accelerometer
+class AccelerometerStream:
+    """
+This class reads each new accelerometer sample from an XLoBorg on a background thread
+
+board                   The XLoBorg being read
+rate                    Samples per second asked for, the accelerometer uses the nearest rate it supports at or above this
+buffer                  The TelemetrySampler.RingBuffer holding the samples, three values (x, y, z in G) per sample
+thread                  The background thread, None when stopped
+    """
+
+    def __init__(self, board, rate = RATE_DEFAULT, bufferSize = BUFFER_SIZE_DEFAULT):
+        self.board = board
+        self.rate = rate
+        self.buffer = TelemetrySampler.RingBuffer(bufferSize, 3)
+        self.thread = None
+        self.condition = threading.Condition(threading.Lock())
+        self.stopEvent = threading.Event()
+        self.ResetReport()
+
+
+    def Start(self):
+        """
+Start()
+
+Sets the accelerometer data rate and starts reading samples on a background thread
+        """
+        if self.thread != None:
+            return
+        self.board.SetAccelerometerDataRate(self.rate)
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target = self.Run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def Stop(self):
+        """
+Stop()
+
+Stops reading samples and waits for the background thread to finish, the samples read are kept
+        """
+        if self.thread == None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.thread = None
+        with self.condition:
+            self.condition.notify_all()
+
+
+    def Run(self):
+        """
+Run()
+
+The reading loop, run by the background thread, use Start instead
+        """
+        board = self.board
+        period = 1.0 / board.accelerometerRate
+        lastSample = None
+        nextPoll = I2CBus.monotonic() + period
+        while not self.stopEvent.is_set():
+            delay = nextPoll - I2CBus.monotonic()
+            if delay > 0:
+                if self.stopEvent.wait(delay):
+                    break
+            values = board.ReadRegisters(board.addressAccelerometer, XLoBorg.ACCEL_REG_STATUS, XLoBorg.ACCEL_STRUCT)
+            now = I2CBus.monotonic()
+            self.polls += 1
+            if values == None:
+                self.failures += 1
+                nextPoll = now + period
+                continue
+            status = values[0]
+            if not (status & XLoBorg.ACCEL_STATUS_ZYXDR):
+                # Nothing new yet, try again shortly
+                self.emptyPolls += 1
+                nextPoll = now + period * POLL_RETRY
+                continue
+            if status & XLoBorg.ACCEL_STATUS_ZYXOW:
+                # At least one sample was taken and replaced before we read it
+                if lastSample == None:
+                    dropped = 1
+                else:
+                    dropped = max(1, int(round((now - lastSample) / period)) - 1)
+                self.dropped += dropped
+            gPerCount = board.gPerCount
+            self.buffer.Write(now, (values[1] * gPerCount, values[2] * gPerCount, values[3] * gPerCount))
+            if self.firstSample == None:
+                self.firstSample = now
+            self.lastSample = now
+            lastSample = now
+            nextPoll = now + period * (1.0 - POLL_EARLY)
+            with self.condition:
+                self.condition.notify_all()
+
+
+    def Read(self, first):
+        """
+times, samples, next = Read(first)
+
+Returns the samples from sample number first onwards, counting from 0 for the first sample read since the stream was created
+samples holds x, y, z in G for each sample, next is the number to pass as first to get the following samples
+Samples which have already been pushed out of the buffer are left out and counted by GetReport as lost
+        """
+        times, samples, count = self.buffer.ReadFrom(first)
+        lost = count - len(times) - first
+        if lost > 0:
+            self.lost += lost
+        return times, samples, count
+
+
+    def Batches(self, interval = None, first = None):
+        """
+for times, samples in Batches([interval], [first]):
+
+Generator giving the samples in batches as they arrive, each sample is given exactly once
+If interval is given a batch is given every interval seconds, otherwise as soon as there are new samples
+first is the sample number to start from, if not given the batches start from the next new sample
+The generator ends once the stream has been stopped and the last samples have been given
+        """
+        if first == None:
+            first = self.buffer.count
+        nextBatch = I2CBus.monotonic()
+        while True:
+            if interval != None:
+                nextBatch += interval
+                delay = nextBatch - I2CBus.monotonic()
+                if delay > 0:
+                    self.stopEvent.wait(delay)
+            with self.condition:
+                while self.buffer.count <= first and self.thread != None and not self.stopEvent.is_set():
+                    self.condition.wait(1.0)
+            times, samples, first = self.Read(first)
+            if len(times) > 0:
+                yield times, samples
+            elif self.thread == None or self.stopEvent.is_set():
+                return
+
+
+    def Wait(self, count, timeout = None):
+        """
+arrived = Wait(count, [timeout])
+
+Waits until at least count samples have been read in total, or for timeout seconds if given
+Returns True if the samples have arrived, False if the timeout ran out or the stream was stopped first
+        """
+        if timeout != None:
+            endTime = I2CBus.monotonic() + timeout
+        with self.condition:
+            while self.buffer.count < count:
+                if self.thread == None:
+                    return False
+                if timeout == None:
+                    self.condition.wait(1.0)
+                else:
+                    remaining = endTime - I2CBus.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(min(remaining, 1.0))
+            return True
+
+
+    def GetReport(self):
+        """
+report = GetReport()
+
+Returns a dictionary describing the samples read since the last ResetReport:
+samples                 Number of samples read
+dropped                 Number of samples the accelerometer replaced before they could be read
+lost                    Number of samples pushed out of the buffer before Read or Batches got to them
+polls                   Number of times the accelerometer was read
+emptyPolls              Number of polls which found no new sample
+failures                Number of polls which failed
+achievedRate            Average samples per second read
+        """
+        samples = self.buffer.count - self.startCount
+        if samples > 1 and self.lastSample > self.firstSample:
+            achievedRate = (samples - 1) / (self.lastSample - self.firstSample)
+        else:
+            achievedRate = 0.0
+        return {'samples': samples,
+                'dropped': self.dropped,
+                'lost': self.lost,
+                'polls': self.polls,
+                'emptyPolls': self.emptyPolls,
+                'failures': self.failures,
+                'achievedRate': achievedRate}
+
+
+    def ResetReport(self):
+        """
+ResetReport()
+
+Clears the counters returned by GetReport
+        """
+        self.startCount = self.buffer.count
+        self.dropped = 0
+        self.lost = 0
+        self.polls = 0
+        self.emptyPolls = 0
+        self.failures = 0
+        self.firstSample = None
+        self.lastSample = None
@@ -0,0 +1 @@
+../Common/AsyncBorg.py
\ No newline at end of file
@@ -0,0 +1,522 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module calibrates the XLoBorg compass and works out a tilt compensated heading in the background
+
+Calibrate once by turning the robot through every direction (including upside down if possible) while samples are collected, e.g.
+import CompassHeading
+import XLoBorg
+XLB = XLoBorg.XLoBorg()
+XLB.Init()
+calibration = CompassHeading.CompassCalibration()
+calibration.Collect(XLB, 30)
+calibration.Fit()
+calibration.Save()
+
+Then use the saved calibration for the heading, e.g.
+calibration = CompassHeading.CompassCalibration()
+calibration.Load()
+heading = CompassHeading.CompassHeading(XLB, calibration)
+heading.Start()
+sampleTime, degrees = heading.Latest()
+heading.Stop()
+
+The calibration removes the magnetic effects of the robot itself:
+hardIron                Offset in raw counts added by magnets and magnetised parts, subtracted from each reading
+softIron                3 x 3 matrix, 9 values row by row, which corrects the stretching caused by nearby iron
+The fit used is an ellipsoid aligned with the compass axes, so softIron only scales each axis.
+
+The heading is worked out from the corrected field and the direction of gravity given by the accelerometer,
+so it stays correct while the robot is tilted.
+The corrections and the alignment of the compass with the accelerometer are combined into one matrix when the
+service is created, so each update is a burst read, a matrix multiply, two cross products and a single atan2.
+"""
+
+# Import the libraries we need
+from __future__ import print_function
+import array
+import json
+import math
+import os
+import threading
+import time
+import I2CBus
+import TelemetrySampler
+import XLoBorg
+
+# Constant values
+RATE_DEFAULT                = 50    # Heading updates per second
+COLLECT_RATE_DEFAULT        = 20    # Calibration samples per second
+HISTORY_SIZE_DEFAULT        = 256   # Headings kept for Snapshot
+IDENTITY                    = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0]
+
+# Default user settings
+calibrationPath = os.path.expanduser('~/.xloborg-compass.json')
+
+
+def SolveLinear(matrix, vector):
+    """
+solution = SolveLinear(matrix, vector)
+
+Solves matrix * solution = vector by Gaussian elimination, matrix is a list of rows
+Returns None if the equations have no single solution
+    """
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for column in range(size):
+        pivot = max(range(column, size), key = lambda row: abs(rows[row][column]))
+        if abs(rows[pivot][column]) < 1e-12:
+            return None
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(column + 1, size):
+            factor = rows[row][column] / rows[column][column]
+            for i in range(column, size + 1):
+                rows[row][i] -= factor * rows[column][i]
+    solution = [0.0] * size
+    for row in range(size - 1, -1, -1):
+        total = rows[row][size]
+        for i in range(row + 1, size):
+            total -= rows[row][i] * solution[i]
+        solution[row] = total / rows[row][row]
+    return solution
+
+
+def MultiplyMatrices(a, b):
+    """
+product = MultiplyMatrices(a, b)
+
+Multiplies two 3 x 3 matrices, each given as 9 values row by row
+    """
+    product = [0.0] * 9
+    for row in range(3):
+        for column in range(3):
+            product[row * 3 + column] = (a[row * 3] * b[column] + a[row * 3 + 1] * b[3 + column] +
+                                         a[row * 3 + 2] * b[6 + column])
+    return product
+
+
+# Class used to work out and hold a compass calibration
+class CompassCalibration:
+    """
+This class collects raw compass readings and fits the hard and soft iron corrections to them
+
+hardIron                X, Y, Z offset in raw counts, subtracted from each reading
+softIron                3 x 3 matrix, 9 values row by row, applied to each reading after the offset is removed
+samples                 Raw readings collected, three values (X, Y, Z) per reading
+residual                How far the corrected samples are from a sphere after Fit, as a fraction of its radius
+printFunction           Function reference to call when printing text, if None "print" is used
+    """
+
+    def __init__(self):
+        self.hardIron = [0.0, 0.0, 0.0]
+        self.softIron = list(IDENTITY)
+        self.samples = array.array('d')
+        self.residual = None
+        self.printFunction = None
+
+
+    def Print(self, message):
+        """
+Print(message)
+
+Wrapper used by the calibration to print messages, will call printFunction if set, print otherwise
+        """
+        if self.printFunction == None:
+            print(message)
+        else:
+            self.printFunction(message)
+
+
+    def AddSample(self, x, y, z):
+        """
+AddSample(x, y, z)
+
+Adds a raw compass reading to the samples
+        """
+        self.samples.extend((x, y, z))
+
+
+    def Collect(self, board, duration, rate = COLLECT_RATE_DEFAULT):
+        """
+count = Collect(board, duration, [rate])
+
+Collects raw readings from an XLoBorg for duration seconds at rate readings per second
+Turn the robot through as many directions as possible while this runs
+Returns the number of readings collected
+        """
+        board.SetCompassDataRate(rate)
+        period = 1.0 / rate
+        startTime = I2CBus.monotonic()
+        nextTime = startTime
+        count = 0
+        while nextTime < startTime + duration:
+            delay = nextTime - I2CBus.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            nextTime += period
+            # Read directly so a failed read is skipped rather than collected as 0, 0, 0
+            values = board.ReadRegisters(board.addressCompass, XLoBorg.COMPASS_REG_DR_STATUS, XLoBorg.COMPASS_STRUCT)
+            if values == None:
+                continue
+            self.AddSample(values[1], values[2], values[3])
+            count += 1
+        self.Print('Collected %d compass readings' % (count))
+        return count
+
+
+    def Clear(self):
+        """
+Clear()
+
+Forgets the collected samples, the current corrections are kept
+        """
+        del self.samples[:]
+
+
+    def Fit(self):
+        """
+fitted = Fit()
+
+Fits the corrections to the collected samples, returns True if the fit worked
+An ellipsoid aligned with the compass axes is fitted, A x^2 + B y^2 + C z^2 + D x + E y + F z = 1,
+its centre gives hardIron and the lengths of its axes give softIron
+If the samples do not cover enough directions for that the minimum and maximum of each axis are used instead
+        """
+        samples = self.samples
+        count = len(samples) // 3
+        if count < 9:
+            self.Print('Not enough samples to calibrate the compass')
+            return False
+
+        # Scale the readings to roughly 1 so the sums stay well conditioned
+        scale = max([abs(value) for value in samples]) or 1.0
+        normal = [[0.0] * 6 for i in range(6)]
+        totals = [0.0] * 6
+        for i in range(0, count * 3, 3):
+            x = samples[i] / scale
+            y = samples[i + 1] / scale
+            z = samples[i + 2] / scale
+            terms = (x * x, y * y, z * z, x, y, z)
+            for row in range(6):
+                term = terms[row]
+                totals[row] += term
+                normalRow = normal[row]
+                for column in range(6):
+                    normalRow[column] += term * terms[column]
+        solution = SolveLinear(normal, totals)
+
+        radii = None
+        if solution != None and min(solution[0:3]) > 0:
+            a, b, c, d, e, f = solution
+            centre = [-d / (2.0 * a), -e / (2.0 * b), -f / (2.0 * c)]
+            g = 1.0 + d * d / (4.0 * a) + e * e / (4.0 * b) + f * f / (4.0 * c)
+            if g > 0:
+                radii = [math.sqrt(g / a), math.sqrt(g / b), math.sqrt(g / c)]
+        if radii == None:
+            # Fall back on the spread of each axis
+            self.Print('Ellipsoid fit failed, using the range of each axis')
+            centre = []
+            radii = []
+            for axis in range(3):
+                values = samples[axis::3]
+                low = min(values) / scale
+                high = max(values) / scale
+                if high - low > 1e-6:
+                    centre.append((high + low) / 2.0)
+                else:
+                    # Never turned through, so the readings are the earth's field plus the offset, keep the old offset
+                    self.Print('Axis %d did not change, keeping its previous hard iron offset' % (axis))
+                    centre.append(self.hardIron[axis] / scale)
+                radii.append((high - low) / 2.0)
+            spread = [value for value in radii if value > 1e-6]
+            if not spread:
+                self.Print('The compass readings did not change, turn the robot while collecting')
+                return False
+            # Axes which were never turned through are left unscaled
+            radius = sum(spread) / len(spread)
+            radii = [value if value > 1e-6 else radius for value in radii]
+
+        radius = sum(radii) / 3.0
+        self.hardIron = [value * scale for value in centre]
+        self.softIron = [radius / radii[0], 0.0, 0.0,
+                         0.0, radius / radii[1], 0.0,
+                         0.0, 0.0, radius / radii[2]]
+
+        # See how round the corrected samples are
+        error = 0.0
+        for i in range(0, count * 3, 3):
+            x, y, z = self.Correct(samples[i], samples[i + 1], samples[i + 2])
+            length = math.sqrt(x * x + y * y + z * z) / (radius * scale)
+            error += (length - 1.0) * (length - 1.0)
+        self.residual = math.sqrt(error / count)
+        self.Print('Compass calibrated, hard iron %s, residual %.3f' % (self.hardIron, self.residual))
+        return True
+
+
+    def Correct(self, x, y, z):
+        """
+x, y, z = Correct(x, y, z)
+
+Applies the corrections to a raw compass reading, the result is still in raw counts
+        """
+        x -= self.hardIron[0]
+        y -= self.hardIron[1]
+        z -= self.hardIron[2]
+        m = self.softIron
+        return (m[0] * x + m[1] * y + m[2] * z,
+                m[3] * x + m[4] * y + m[5] * z,
+                m[6] * x + m[7] * y + m[8] * z)
+
+
+    def Save(self, path = None):
+        """
+Save([path])
+
+Writes the corrections to path, calibrationPath if not given
+        """
+        if path == None:
+            path = calibrationPath
+        stored = {'hardIron': list(self.hardIron), 'softIron': list(self.softIron), 'residual': self.residual}
+        try:
+            with open(path, 'w') as calibrationFile:
+                json.dump(stored, calibrationFile, indent = 1, sort_keys = True)
+        except (IOError, OSError):
+            self.Print('Failed writing the compass calibration to %s' % (path))
+
+
+    def Load(self, path = None):
+        """
+loaded = Load([path])
+
+Reads the corrections from path, calibrationPath if not given
+Returns False and leaves the corrections unchanged if there is no saved calibration
+        """
+        if path == None:
+            path = calibrationPath
+        try:
+            with open(path, 'r') as calibrationFile:
+                stored = json.load(calibrationFile)
+            hardIron = [float(value) for value in stored['hardIron']]
+            softIron = [float(value) for value in stored['softIron']]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return False
+        if len(hardIron) != 3 or len(softIron) != 9:
+            return False
+        self.hardIron = hardIron
+        self.softIron = softIron
+        self.residual = stored.get('residual')
+        return True
+
+
+# Class used to keep a heading up to date in the background
+class CompassHeading:
+    """
+This class works out a tilt compensated heading from an XLoBorg on a background thread
+
+board                   The XLoBorg being read
+rate                    Heading updates per second
+declination             Degrees added to the magnetic heading, east of magnetic north is positive, to give a true heading
+matrix                  Combined compass alignment and soft iron correction, 9 values row by row
+offset                  Hard iron offset in raw counts
+buffer                  The TelemetrySampler.RingBuffer holding the headings in degrees
+thread                  The background thread, None when stopped
+    """
+
+    def __init__(self, board, calibration = None, rate = RATE_DEFAULT, compassAxes = None,
+                 historySize = HISTORY_SIZE_DEFAULT):
+        self.board = board
+        self.rate = rate
+        self.declination = 0.0
+        self.buffer = TelemetrySampler.RingBuffer(historySize, 1)
+        self.thread = None
+        self.stopEvent = threading.Event()
+        self.SetCalibration(calibration, compassAxes)
+        self.ResetReport()
+
+
+    def SetCalibration(self, calibration, compassAxes = None):
+        """
+SetCalibration(calibration, [compassAxes])
+
+Sets the corrections used from a CompassCalibration, None for no corrections
+compassAxes is a 3 x 3 matrix, 9 values row by row, turning compass axes into accelerometer axes, None if they match
+        """
+        if compassAxes == None:
+            compassAxes = IDENTITY
+        if calibration == None:
+            softIron = IDENTITY
+            hardIron = [0.0, 0.0, 0.0]
+        else:
+            softIron = calibration.softIron
+            hardIron = calibration.hardIron
+        # Worked out once here so the updates only need a single multiply
+        self.matrix = MultiplyMatrices([float(value) for value in compassAxes], softIron)
+        self.offset = list(hardIron)
+
+
+    def Heading(self, acceleration, field):
+        """
+degrees = Heading(acceleration, field)
+
+Works out the heading from an accelerometer reading (x, y, z in G) and a raw compass reading
+The heading is the direction the X axis points in, in degrees clockwise from north from 0 to 360
+Returns None if the readings are not usable, for example when the robot is falling
+        """
+        m = self.matrix
+        x = field[0] - self.offset[0]
+        y = field[1] - self.offset[1]
+        z = field[2] - self.offset[2]
+        mx = m[0] * x + m[1] * y + m[2] * z
+        my = m[3] * x + m[4] * y + m[5] * z
+        mz = m[6] * x + m[7] * y + m[8] * z
+        # The accelerometer reads upwards, so down is the other way
+        dx = -acceleration[0]
+        dy = -acceleration[1]
+        dz = -acceleration[2]
+        # East is down x field, north is east x down
+        ex = dy * mz - dz * my
+        ey = dz * mx - dx * mz
+        ez = dx * my - dy * mx
+        nx = ey * dz - ez * dy
+        down = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if down == 0 or (ex == 0 and nx == 0):
+            return None
+        # North carries an extra length of down, which cancels in the angle
+        return (math.degrees(math.atan2(ex * down, nx)) + self.declination) % 360.0
+
+
+    def Update(self):
+        """
+degrees = Update()
+
+Reads the XLoBorg and adds the new heading to buffer, returns None if the heading could not be worked out
+A failed read gives None rather than a heading from the zeros ReadAll would give
+        """
+        board = self.board
+        with board.i2cBus.Hold(XLoBorg.ACCEL_REG_STATUS):
+            accel = board.ReadRegisters(board.addressAccelerometer, XLoBorg.ACCEL_REG_STATUS, XLoBorg.ACCEL_STRUCT)
+            compass = board.ReadRegisters(board.addressCompass, XLoBorg.COMPASS_REG_DR_STATUS, XLoBorg.COMPASS_STRUCT)
+        if accel == None or compass == None:
+            degrees = None
+        else:
+            degrees = self.Heading(accel[1:4], compass[1:4])
+        self.buffer.Write(I2CBus.monotonic(), degrees)
+        return degrees
+
+
+    def Latest(self):
+        """
+sampleTime, degrees = Latest()
+
+Returns the newest heading and the time it was worked out, (None, None) if there is none yet
+The heading is NaN if it could not be worked out
+        """
+        return self.buffer.Latest()
+
+
+    def Snapshot(self, count = None):
+        """
+times, headings = Snapshot([count])
+
+Returns the last count headings, all held headings if count is not given, oldest first
+        """
+        return self.buffer.Snapshot(count)
+
+
+    def Start(self):
+        """
+Start()
+
+Sets the compass to read at least as fast as rate and starts updating the heading on a background thread
+        """
+        if self.thread != None:
+            return
+        self.board.SetCompassDataRate(self.rate)
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target = self.Run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def Stop(self):
+        """
+Stop()
+
+Stops updating the heading and waits for the background thread to finish
+        """
+        if self.thread == None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.thread = None
+
+
+    def Run(self):
+        """
+Run()
+
+The update loop, run by the background thread, use Start instead
+        """
+        period = 1.0 / self.rate
+        nextTime = I2CBus.monotonic()
+        while not self.stopEvent.is_set():
+            delay = nextTime - I2CBus.monotonic()
+            if delay > 0:
+                if self.stopEvent.wait(delay):
+                    break
+            now = I2CBus.monotonic()
+            lateness = now - nextTime
+            if lateness >= period:
+                # Too far behind, skip the updates we have missed rather than rushing to catch up
+                behind = int(lateness / period)
+                nextTime += behind * period
+                lateness -= behind * period
+                self.skipped += behind
+            try:
+                degrees = self.Update()
+            except KeyboardInterrupt:
+                raise
+            except:
+                degrees = None
+            if degrees == None:
+                self.failures += 1
+            self.updates += 1
+            self.totalLateness += lateness
+            if lateness > self.worstLateness:
+                self.worstLateness = lateness
+            nextTime += period
+
+
+    def GetReport(self):
+        """
+report = GetReport()
+
+Returns a dictionary describing the updates since the last ResetReport:
+updates                 Number of updates made
+failures                Number of updates which could not work out a heading
+skipped                 Number of updates skipped because the thread fell behind
+meanLateness            Average time in seconds updates were made after they were due
+worstLateness           Longest time in seconds an update was made after it was due
+        """
+        if self.updates > 0:
+            meanLateness = self.totalLateness / self.updates
+        else:
+            meanLateness = 0.0
+        return {'updates': self.updates,
+                'failures': self.failures,
+                'skipped': self.skipped,
+                'meanLateness': meanLateness,
+                'worstLateness': self.worstLateness}
+
+
+    def ResetReport(self):
+        """
+ResetReport()
+
+Clears the counters returned by GetReport
+        """
+        self.updates = 0
+        self.failures = 0
+        self.skipped = 0
+        self.totalLateness = 0.0
+        self.worstLateness = 0.0
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module keeps an estimate of the XLoBorg's orientation as a quaternion, updated one sample at a time
+
+Use by creating a filter and passing it each accelerometer sample with the latest compass reading, e.g.
+import OrientationFilter
+import AccelerometerStream
+import XLoBorg
+XLB = XLoBorg.XLoBorg()
+XLB.Init()
+stream = AccelerometerStream.AccelerometerStream(XLB, 100)
+orientation = OrientationFilter.OrientationFilter()
+stream.Start()
+for times, samples in stream.Batches(0.02):
+    orientation.UpdateBatch(times, samples, XLB.ReadCompassRaw())
+    roll, pitch, heading = orientation.GetAngles()
+
+Logged readings can be replayed the same way, with a compass reading for every sample, e.g.
+quaternions = orientation.UpdateBatch(times, accelerations, fields, True)
+
+Each update takes a single gradient descent step towards the orientation the readings give (Madgwick's method),
+at up to beta radians per second, so the estimate is smooth without needing the angles worked out from scratch.
+Small errors are closed in proportion to their size, so a still board settles instead of hunting around the readings.
+The XLoBorg has no gyro, so the steps only follow the accelerometer and compass;
+rotation rates from a separate gyro can be passed to Update to be integrated as well.
+The first update sets the orientation straight from the readings.
+
+The quaternion is [w, x, y, z] and turns board axes into world axes: X north, Y west, Z up.
+Compass readings are corrected with a CompassHeading.CompassCalibration if one is given.
+"""
+
+# Import the libraries we need
+import array
+import math
+import CompassHeading
+
+# Constant values
+BETA_DEFAULT                = 1.0   # Largest correction in radians per second, larger follows faster but is noisier
+SETTLE_GRADIENT             = 0.05  # Error gradient below which corrections shrink in proportion to the error
+
+
+def MatrixToQuaternion(m):
+    """
+w, x, y, z = MatrixToQuaternion(m)
+
+Converts a rotation matrix, 9 values row by row, to a quaternion
+    """
+    trace = m[0] + m[4] + m[8]
+    if trace > 0:
+        s = 0.5 / math.sqrt(trace + 1.0)
+        return 0.25 / s, (m[7] - m[5]) * s, (m[2] - m[6]) * s, (m[3] - m[1]) * s
+    if m[0] > m[4] and m[0] > m[8]:
+        s = 2.0 * math.sqrt(1.0 + m[0] - m[4] - m[8])
+        return (m[7] - m[5]) / s, 0.25 * s, (m[1] + m[3]) / s, (m[2] + m[6]) / s
+    if m[4] > m[8]:
+        s = 2.0 * math.sqrt(1.0 + m[4] - m[0] - m[8])
+        return (m[2] - m[6]) / s, (m[1] + m[3]) / s, 0.25 * s, (m[5] + m[7]) / s
+    s = 2.0 * math.sqrt(1.0 + m[8] - m[0] - m[4])
+    return (m[3] - m[1]) / s, (m[2] + m[6]) / s, (m[5] + m[7]) / s, 0.25 * s
+
+
+# Class used to estimate orientation
+class OrientationFilter:
+    """
+This class estimates orientation from accelerometer and compass readings
+
+beta                    Largest correction in radians per second made towards the readings
+declination             Degrees added to the magnetic heading by GetAngles, east of magnetic north is positive
+quaternion              The current orientation as an array of [w, x, y, z], changed in place by each update
+sampleTime              Time of the last update, None before the first update
+matrix                  Combined compass alignment and soft iron correction, 9 values row by row
+offset                  Hard iron offset in raw counts
+    """
+
+    def __init__(self, calibration = None, beta = BETA_DEFAULT, compassAxes = None):
+        self.beta = beta
+        self.declination = 0.0
+        self.quaternion = array.array('d', [1.0, 0.0, 0.0, 0.0])
+        self.SetCalibration(calibration, compassAxes)
+        self.Reset()
+
+
+    def SetCalibration(self, calibration, compassAxes = None):
+        """
+SetCalibration(calibration, [compassAxes])
+
+Sets the corrections used from a CompassCalibration, None for no corrections
+compassAxes is a 3 x 3 matrix, 9 values row by row, turning compass axes into accelerometer axes, None if they match
+        """
+        if compassAxes == None:
+            compassAxes = CompassHeading.IDENTITY
+        if calibration == None:
+            softIron = CompassHeading.IDENTITY
+            hardIron = [0.0, 0.0, 0.0]
+        else:
+            softIron = calibration.softIron
+            hardIron = calibration.hardIron
+        self.matrix = array.array('d', CompassHeading.MultiplyMatrices([float(value) for value in compassAxes], softIron))
+        self.offset = array.array('d', hardIron)
+
+
+    def Reset(self):
+        """
+Reset()
+
+Forgets the current orientation, the next update sets it straight from the readings
+        """
+        self.quaternion[0] = 1.0
+        self.quaternion[1] = 0.0
+        self.quaternion[2] = 0.0
+        self.quaternion[3] = 0.0
+        self.sampleTime = None
+        self.updates = 0
+
+
+    def Update(self, sampleTime, acceleration, field = None, rates = None):
+        """
+quaternion = Update(sampleTime, acceleration, [field], [rates])
+
+Updates the orientation with an accelerometer reading (x, y, z in G) taken at sampleTime seconds
+field is a raw compass reading, without one only the tilt is corrected
+rates is the rotation rate about x, y, z in radians per second from a gyro, if there is one
+Returns the quaternion array
+        """
+        if field is None:
+            mx = my = mz = 0.0
+        else:
+            m = self.matrix
+            x = field[0] - self.offset[0]
+            y = field[1] - self.offset[1]
+            z = field[2] - self.offset[2]
+            mx = m[0] * x + m[1] * y + m[2] * z
+            my = m[3] * x + m[4] * y + m[5] * z
+            mz = m[6] * x + m[7] * y + m[8] * z
+        if rates is None:
+            gx = gy = gz = 0.0
+        else:
+            gx, gy, gz = rates
+        if self.sampleTime == None:
+            if self.Initialise(acceleration[0], acceleration[1], acceleration[2], mx, my, mz):
+                self.sampleTime = sampleTime
+                self.updates += 1
+            return self.quaternion
+        dt = sampleTime - self.sampleTime
+        self.sampleTime = sampleTime
+        if dt > 0:
+            self.Step(acceleration[0], acceleration[1], acceleration[2], mx, my, mz, gx, gy, gz, dt)
+            self.updates += 1
+        return self.quaternion
+
+
+    def UpdateBatch(self, times, accelerations, fields = None, keep = False):
+        """
+quaternions = UpdateBatch(times, accelerations, [fields], [keep])
+
+Updates the orientation with a block of samples, in the same way as calling Update for each one
+accelerations holds x, y, z in G for each sample, either 3 values per sample or a row per sample
+fields is None for no compass readings, a single compass reading to use for every sample, or a reading for each sample
+If keep is True returns an array with w, x, y, z for each sample, otherwise returns the quaternion array
+        """
+        count = len(times)
+        if hasattr(accelerations, 'ravel'):
+            accelerations = accelerations.ravel()
+        single = None
+        if fields is not None:
+            if hasattr(fields, 'ravel'):
+                fields = fields.ravel()
+            if len(fields) == 3:
+                single = fields
+        if keep:
+            quaternions = array.array('d', [0.0]) * (count * 4)
+        quaternion = self.quaternion
+        for i in range(count):
+            index = i * 3
+            if single is not None:
+                field = single
+            elif fields is not None:
+                field = fields[index : index + 3]
+            else:
+                field = None
+            self.Update(times[i], accelerations[index : index + 3], field)
+            if keep:
+                quaternions[i * 4 : i * 4 + 4] = quaternion
+        if keep:
+            return quaternions
+        return quaternion
+
+
+    def Initialise(self, ax, ay, az, mx, my, mz):
+        """
+set = Initialise(ax, ay, az, mx, my, mz)
+
+Sets the orientation straight from an accelerometer reading and a corrected compass reading
+Without a compass reading the heading is taken as north, returns False if the readings are not usable
+        """
+        # Up is the direction the accelerometer reads, west is up x field and north is west x up
+        length = math.sqrt(ax * ax + ay * ay + az * az)
+        if length == 0:
+            return False
+        ux = ax / length
+        uy = ay / length
+        uz = az / length
+        wx = uy * mz - uz * my
+        wy = uz * mx - ux * mz
+        wz = ux * my - uy * mx
+        length = math.sqrt(wx * wx + wy * wy + wz * wz)
+        if length == 0:
+            # No usable field, pick any west at right angles to up
+            if abs(ux) < 0.9:
+                wx, wy, wz = 0.0, uz, -uy
+            else:
+                wx, wy, wz = -uz, 0.0, ux
+            length = math.sqrt(wx * wx + wy * wy + wz * wz)
+        wx /= length
+        wy /= length
+        wz /= length
+        nx = wy * uz - wz * uy
+        ny = wz * ux - wx * uz
+        nz = wx * uy - wy * ux
+        # The rows are the world axes seen from the board, which turns board axes into world axes
+        q = MatrixToQuaternion([nx, ny, nz, wx, wy, wz, ux, uy, uz])
+        for i in range(4):
+            self.quaternion[i] = q[i]
+        return True
+
+
+    def Step(self, ax, ay, az, mx, my, mz, gx, gy, gz, dt):
+        """
+Step(ax, ay, az, mx, my, mz, gx, gy, gz, dt)
+
+Moves the orientation on by dt seconds, used by Update
+The accelerometer and corrected compass readings give a gradient descent step of beta radians per second,
+the rotation rates (all 0 without a gyro) are integrated on top
+        """
+        quaternion = self.quaternion
+        q0 = quaternion[0]
+        q1 = quaternion[1]
+        q2 = quaternion[2]
+        q3 = quaternion[3]
+
+        # Rate of change from the rotation rates
+        qDot0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+        qDot1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+        qDot2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+        qDot3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+
+        length = math.sqrt(ax * ax + ay * ay + az * az)
+        if length > 0:
+            ax /= length
+            ay /= length
+            az /= length
+            _2q0 = 2.0 * q0
+            _2q1 = 2.0 * q1
+            _2q2 = 2.0 * q2
+            _2q3 = 2.0 * q3
+            q0q0 = q0 * q0
+            q1q1 = q1 * q1
+            q2q2 = q2 * q2
+            q3q3 = q3 * q3
+            length = math.sqrt(mx * mx + my * my + mz * mz)
+            if length > 0:
+                # Gravity and magnetic field, the field's direction in the world is worked out from the estimate
+                mx /= length
+                my /= length
+                mz /= length
+                _2q0mx = _2q0 * mx
+                _2q0my = _2q0 * my
+                _2q0mz = _2q0 * mz
+                _2q1mx = _2q1 * mx
+                _2q0q2 = _2q0 * q2
+                _2q2q3 = _2q2 * q3
+                q0q1 = q0 * q1
+                q0q2 = q0 * q2
+                q0q3 = q0 * q3
+                q1q2 = q1 * q2
+                q1q3 = q1 * q3
+                q2q3 = q2 * q3
+                hx = mx * q0q0 - _2q0my * q3 + _2q0mz * q2 + mx * q1q1 + _2q1 * my * q2 + _2q1 * mz * q3 - mx * q2q2 - mx * q3q3
+                hy = _2q0mx * q3 + my * q0q0 - _2q0mz * q1 + _2q1mx * q2 - my * q1q1 + my * q2q2 + _2q2 * mz * q3 - my * q3q3
+                _2bx = math.sqrt(hx * hx + hy * hy)
+                _2bz = -_2q0mx * q2 + _2q0my * q1 + mz * q0q0 + _2q1mx * q3 - mz * q1q1 + _2q2 * my * q3 - mz * q2q2 + mz * q3q3
+                _4bx = 2.0 * _2bx
+                _4bz = 2.0 * _2bz
+                # Errors between the readings and what the estimate expects them to be
+                fax = 2.0 * q1q3 - _2q0q2 - ax
+                fay = 2.0 * q0q1 + _2q2q3 - ay
+                faz = 1.0 - 2.0 * q1q1 - 2.0 * q2q2 - az
+                fmx = _2bx * (0.5 - q2q2 - q3q3) + _2bz * (q1q3 - q0q2) - mx
+                fmy = _2bx * (q1q2 - q0q3) + _2bz * (q0q1 + q2q3) - my
+                fmz = _2bx * (q0q2 + q1q3) + _2bz * (0.5 - q1q1 - q2q2) - mz
+                s0 = -_2q2 * fax + _2q1 * fay - _2bz * q2 * fmx + (-_2bx * q3 + _2bz * q1) * fmy + _2bx * q2 * fmz
+                s1 = _2q3 * fax + _2q0 * fay - 2.0 * _2q1 * faz + _2bz * q3 * fmx + (_2bx * q2 + _2bz * q0) * fmy + (_2bx * q3 - _4bz * q1) * fmz
+                s2 = -_2q0 * fax + _2q3 * fay - 2.0 * _2q2 * faz + (-_4bx * q2 - _2bz * q0) * fmx + (_2bx * q1 + _2bz * q3) * fmy + (_2bx * q0 - _4bz * q2) * fmz
+                s3 = _2q1 * fax + _2q2 * fay + (-_4bx * q3 + _2bz * q1) * fmx + (-_2bx * q0 + _2bz * q2) * fmy + _2bx * q1 * fmz
+            else:
+                # Gravity only
+                _4q0 = 2.0 * _2q0
+                _4q1 = 2.0 * _2q1
+                _4q2 = 2.0 * _2q2
+                _8q1 = 2.0 * _4q1
+                _8q2 = 2.0 * _4q2
+                s0 = _4q0 * q2q2 + _2q2 * ax + _4q0 * q1q1 - _2q1 * ay
+                s1 = _4q1 * q3q3 - _2q3 * ax + 4.0 * q0q0 * q1 - _2q0 * ay - _4q1 + _8q1 * q1q1 + _8q1 * q2q2 + _4q1 * az
+                s2 = 4.0 * q0q0 * q2 + _2q0 * ax + _4q2 * q3q3 - _2q3 * ay - _4q2 + _8q2 * q1q1 + _8q2 * q2q2 + _4q2 * az
+                s3 = 4.0 * q1q1 * q3 - _2q1 * ax + 4.0 * q2q2 * q3 - _2q2 * ay
+            length = math.sqrt(s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3)
+            if length > 0:
+                # Full rate steps for large errors, smaller errors are closed in proportion so the estimate settles
+                step = self.beta / max(length, SETTLE_GRADIENT)
+                qDot0 -= step * s0
+                qDot1 -= step * s1
+                qDot2 -= step * s2
+                qDot3 -= step * s3
+
+        q0 += qDot0 * dt
+        q1 += qDot1 * dt
+        q2 += qDot2 * dt
+        q3 += qDot3 * dt
+        length = math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        quaternion[0] = q0 / length
+        quaternion[1] = q1 / length
+        quaternion[2] = q2 / length
+        quaternion[3] = q3 / length
+
+
+    def GetAngles(self):
+        """
+roll, pitch, heading = GetAngles()
+
+Returns the orientation as angles in degrees
+roll is about the X axis and pitch about the Y axis, both 0 when level
+heading is the direction the X axis points in, clockwise from north from 0 to 360, including the declination
+        """
+        q0, q1, q2, q3 = self.quaternion
+        roll = math.degrees(math.atan2(2.0 * (q0 * q1 + q2 * q3), 1.0 - 2.0 * (q1 * q1 + q2 * q2)))
+        pitch = math.degrees(math.asin(max(-1.0, min(1.0, 2.0 * (q0 * q2 - q3 * q1)))))
+        yaw = math.degrees(math.atan2(2.0 * (q0 * q3 + q1 * q2), 1.0 - 2.0 * (q2 * q2 + q3 * q3)))
+        # Yaw turns towards west, the heading turns towards east
+        return roll, pitch, (self.declination - yaw) % 360.0
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# coding: latin-1
+"""
+This module converts blocks of raw XLoBorg readings to G, microtesla and degrees Celsius in one pass
+
+Use by passing the raw readings, either the register bytes as read from the chips or the raw counts, e.g.
+import SampleConversion
+accelerations = SampleConversion.ConvertAccelerometer(rawAccelerometerBytes)
+fields = SampleConversion.ConvertCompass(rawCompassCounts, hardIron = [120, -45, 300])
+temperatures = SampleConversion.ConvertTemperature(rawTemperatureBytes, 2)
+
+Raw register bytes are laid out as the chips give them:
+accelerometer           3 signed bytes per sample, X, Y then Z (the XLoBorg reads the accelerometer in fast read mode)
+compass                 6 bytes per sample, X, Y then Z as big-endian signed 16 bit values
+temperature             1 signed byte per sample
+Raw counts can be given as an array, a list or a numpy array, with 3 counts (X, Y, Z) per sample.
+
+If numpy is available the conversions are done with numpy and return numpy arrays, with a row of X, Y, Z per sample.
+Otherwise they fall back to the array module and return an array('d') with 3 values per sample,
+the same layout used by TelemetrySampler.RingBuffer.
+"""
+
+# Import the libraries we need
+import array
+import sys
+try:
+    import numpy
+except ImportError:
+    # Not available on this machine, the array module is used instead
+    numpy = None
+
+# Constant values
+G_PER_COUNT_DEFAULT         = 2.0 / 128     # Accelerometer in the 2G range with 8 bit readings, see XLoBorg.gPerCount
+MICROTESLA_PER_COUNT        = 0.1           # Compass sensitivity, 0.1 uT per count
+
+
+def RawArray(raw, typecode, bigEndian = False):
+    """
+values = RawArray(raw, typecode, [bigEndian])
+
+Returns raw as an array('d'), raw register bytes are unpacked as typecode values and raw counts are copied
+If bigEndian is True register bytes are treated as big-endian values
+    """
+    if isinstance(raw, (bytes, bytearray)):
+        values = array.array(typecode)
+        if hasattr(values, 'frombytes'):
+            values.frombytes(bytes(raw))
+        else:
+            values.fromstring(str(raw))
+        if bigEndian and values.itemsize > 1 and sys.byteorder == 'little':
+            values.byteswap()
+        raw = values
+    return array.array('d', raw)
+
+
+def NumpyArray(raw, dtype):
+    """
+values = NumpyArray(raw, dtype)
+
+Returns raw as a numpy array of floats with a row of X, Y, Z per sample, raw register bytes are read as dtype
+    """
+    if isinstance(raw, (bytes, bytearray)):
+        values = numpy.frombuffer(bytes(raw), dtype = dtype)
+    else:
+        values = numpy.asarray(raw)
+    return values.astype(numpy.float64).reshape(-1, 3)
+
+
+def ConvertAccelerometer(raw, gPerCount = G_PER_COUNT_DEFAULT):
+    """
+accelerations = ConvertAccelerometer(raw, [gPerCount])
+
+Converts raw accelerometer readings to G, gPerCount defaults to the XLoBorg's 2G range
+raw is either register bytes (3 signed bytes per sample) or counts (3 per sample)
+    """
+    if numpy != None:
+        return NumpyArray(raw, numpy.int8) * gPerCount
+    accelerations = RawArray(raw, 'b')
+    for i in range(len(accelerations)):
+        accelerations[i] *= gPerCount
+    return accelerations
+
+
+def ConvertCompass(raw, hardIron = None, softIron = None, microteslaPerCount = MICROTESLA_PER_COUNT):
+    """
+fields = ConvertCompass(raw, [hardIron], [softIron], [microteslaPerCount])
+
+Converts raw compass readings to microtesla, correcting for the magnetic effects of the robot if given
+raw is either register bytes (6 bytes per sample, big-endian) or counts (3 per sample)
+hardIron is the X, Y, Z offset in counts, subtracted from each reading
+softIron is a 3 x 3 matrix, as 3 rows or 9 values row by row, multiplied with each reading after the offset is removed
+    """
+    if hardIron is None:
+        hardIron = [0.0, 0.0, 0.0]
+    matrix = None
+    if softIron is not None:
+        matrix = []
+        for row in softIron:
+            if hasattr(row, '__len__'):
+                matrix.extend([float(value) for value in row])
+            else:
+                matrix.append(float(row))
+    if numpy != None:
+        fields = NumpyArray(raw, numpy.dtype('>i2')) - numpy.asarray(hardIron, dtype = numpy.float64)
+        if matrix != None:
+            fields = numpy.dot(fields, numpy.asarray(matrix).reshape(3, 3).T)
+        return fields * microteslaPerCount
+    fields = RawArray(raw, 'h', True)
+    hx, hy, hz = [float(value) for value in hardIron]
+    if matrix == None:
+        for i in range(0, len(fields) - 2, 3):
+            fields[i] = (fields[i] - hx) * microteslaPerCount
+            fields[i + 1] = (fields[i + 1] - hy) * microteslaPerCount
+            fields[i + 2] = (fields[i + 2] - hz) * microteslaPerCount
+    else:
+        m = [value * microteslaPerCount for value in matrix]
+        for i in range(0, len(fields) - 2, 3):
+            x = fields[i] - hx
+            y = fields[i + 1] - hy
+            z = fields[i + 2] - hz
+            fields[i] = m[0] * x + m[1] * y + m[2] * z
+            fields[i + 1] = m[3] * x + m[4] * y + m[5] * z
+            fields[i + 2] = m[6] * x + m[7] * y + m[8] * z
+    return fields
+
+
+def ConvertTemperature(raw, tempOffset = 0):
+    """
+temperatures = ConvertTemperature(raw, [tempOffset])
+
+Converts raw compass die temperatures to degrees Celsius, adding tempOffset as XLoBorg.ReadTemperature does
+raw is either register bytes (1 signed byte per sample) or counts (1 per sample)
+Returns a numpy array of one value per sample if numpy is available, an array('d') otherwise
+    """
+    if numpy != None:
+        if isinstance(raw, (bytes, bytearray)):
+            temperatures = numpy.frombuffer(bytes(raw), dtype = numpy.int8)
+        else:
+            temperatures = numpy.asarray(raw)
+        return temperatures.astype(numpy.float64) + tempOffset
+    temperatures = RawArray(raw, 'b')
+    for i in range(len(temperatures)):
+        temperatures[i] += tempOffset
+    return temperatures
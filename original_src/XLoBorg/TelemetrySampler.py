@@ -0,0 +1 @@
+../Common/TelemetrySampler.py
\ No newline at end of file
@@ -12,11 +12,25 @@ foundCompass            True if the compass chip can be seen, False otherwise
 printFunction           Function reference to call when printing text, if None "print" is used
 gPerCount               Number of G represented by the LSB of the accelerometer at the current sensitivity
 tempOffest              The offset to add to the temperature reading in C
+
+The XLoBorg class does the same job as an object, so more than one XLoBorg can be used, e.g.
+import XLoBorg
+XLB = XLoBorg.XLoBorg()
+XLB.Init()
+(x, y, z), (mx, my, mz), temp = XLB.ReadAll()
+It talks through the shared I2CBus transport and reads each chip in a single burst
+Register reads use combined I2C_RDWR transactions, the chips need a repeated start between the register address and the read
 """
 
 # Import the libraries we need
-import smbus
+from __future__ import print_function
 import struct
+import I2CBus
+try:
+    import smbus
+except ImportError:
+    # Not available on this machine, Init will fail unless smbus is replaced (see BoardEmulator)
+    smbus = None
 
 ### MODULE DATA ###
 # Shared values used by this module
@@ -34,6 +48,27 @@ global tempOffest
 addressAccelerometer = 0x1C
 addressCompass = 0x0E
 
+# Registers used by the XLoBorg class
+ACCEL_REG_STATUS            = 0x00  # Status, followed by the X, Y and Z readings
+ACCEL_REG_SYSMOD            = 0x0B  # System mode
+ACCEL_REG_XYZ_DATA_CFG      = 0x0E  # Range and high pass filter
+ACCEL_REG_CTRL_REG1         = 0x2A  # Data rate, read mode and active state
+ACCEL_STATUS_ZYXDR          = 0x08  # A new X, Y and Z sample is ready
+ACCEL_STATUS_ZYXOW          = 0x80  # A sample was overwritten before it was read
+ACCEL_DATA_RATES            = [800.0, 400.0, 200.0, 100.0, 50.0, 12.5, 6.25, 1.56]   # Samples per second for each CTRL_REG1 data rate setting
+COMPASS_ADC_RATES           = [1280.0, 640.0, 320.0, 160.0, 80.0]   # ADC samples per second for each CTRL_REG1 data rate setting used
+COMPASS_OVERSAMPLES         = [16, 32, 64, 128]                     # ADC samples averaged for each CTRL_REG1 oversample setting
+COMPASS_REG_DR_STATUS       = 0x00  # Data ready status, followed by the X, Y and Z readings
+COMPASS_REG_DIE_TEMP        = 0x0F  # Die temperature
+COMPASS_REG_CTRL_REG1       = 0x10  # Data rate, oversampling and active state
+COMPASS_REG_CTRL_REG2       = 0x11  # Reset and raw mode
+
+# Layouts used to decode register reads, compiled once rather than for every reading
+ACCEL_STRUCT                = struct.Struct('>Bbbb')        # Status, X, Y, Z
+COMPASS_STRUCT              = struct.Struct('>Bhhh')        # Status, X, Y, Z
+COMPASS_ALL_STRUCT          = struct.Struct('>Bhhh8xb')     # Status, X, Y, Z, skipped registers, temperature
+TEMPERATURE_STRUCT          = struct.Struct('>b')
+
 # Check here for Rev 1 vs Rev 2 and select the correct bus
 busNumber = 1
 
@@ -46,7 +81,7 @@ Wrapper used by the XLoBorg module to print messages, will call printFunction if
     """
     global printFunction
     if printFunction == None:
-        print message
+        print(message)
     else:
         printFunction(message)
 
@@ -279,6 +314,303 @@ Reads the die temperature of the compass in degrees Celsius
 
     return temp
 
+# Class used to talk to an XLoBorg
+class XLoBorg:
+    """
+This class is designed to communicate with the XLoBorg, more than one can be used on different buses
+
+busNumber               IC bus on which the XLoBorg is attached (Rev 1 is bus 0, Rev 2 is bus 1)
+i2cBus                  The shared I2CBus transport used to talk to the IC bus
+addressAccelerometer    The IC address of the accelerometer chip
+addressCompass          The IC address of the compass chip
+foundAccelerometer      True if the accelerometer chip can be seen, False otherwise
+foundCompass            True if the compass chip can be seen, False otherwise
+printFunction           Function reference to call when printing text, if None "print" is used
+gPerCount               Number of G represented by the LSB of the accelerometer at the current sensitivity
+accelerometerRate       Samples per second the accelerometer takes, see SetAccelerometerDataRate
+compassRate             Readings per second the compass takes, see SetCompassDataRate
+tempOffset              The offset to add to the temperature reading in C
+    """
+
+    # Shared values used by this class
+    busNumber               = 1                     # Check here for Rev 1 vs Rev 2 and select the correct bus
+    addressAccelerometer    = 0x1C
+    addressCompass          = 0x0E
+    foundAccelerometer      = False
+    foundCompass            = False
+    printFunction           = None
+    i2cBus                  = None
+    gPerCount               = 2.0 / 128
+    accelerometerRate       = ACCEL_DATA_RATES[0]
+    compassRate             = 10.0
+    tempOffset              = 0
+
+
+    def Print(self, message):
+        """
+Print(message)
+
+Wrapper used by the XLoBorg instance to print messages, will call printFunction if set, print otherwise
+        """
+        if self.printFunction == None:
+            print(message)
+        else:
+            self.printFunction(message)
+
+
+    def NoPrint(self, message):
+        """
+NoPrint(message)
+
+Does nothing, intended for disabling diagnostic printout by using:
+XLB = XLoBorg.XLoBorg()
+XLB.printFunction = XLB.NoPrint
+        """
+        pass
+
+
+    def Init(self, tryOtherBus = False):
+        """
+Init([tryOtherBus])
+
+Prepare the I2C driver for talking to the XLoBorg
+
+If tryOtherBus is True, this function will attempt to use the other bus if none of the XLoBorg devices can be found on the current busNumber
+    This is only really useful for early Raspberry Pi models!
+        """
+        self.Print('Loading XLoBorg on bus %d' % (self.busNumber))
+
+        # Open the bus, shared with any other boards already using it
+        self.i2cBus = I2CBus.GetBus(self.busNumber)
+
+        # Check for accelerometer
+        try:
+            self.i2cBus.ReadCombined(self.addressAccelerometer, 1, 1)
+            self.foundAccelerometer = True
+            self.Print('Found accelerometer at %02X' % (self.addressAccelerometer))
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.foundAccelerometer = False
+            self.Print('Missing accelerometer at %02X' % (self.addressAccelerometer))
+
+        # Check for compass
+        try:
+            self.i2cBus.ReadCombined(self.addressCompass, 1, 1)
+            self.foundCompass = True
+            self.Print('Found compass at %02X' % (self.addressCompass))
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.foundCompass = False
+            self.Print('Missing compass at %02X' % (self.addressCompass))
+
+        # See if we are missing chips
+        if not (self.foundAccelerometer or self.foundCompass):
+            self.Print('Both the compass and accelerometer were not found')
+            if tryOtherBus:
+                if self.busNumber == 1:
+                    self.busNumber = 0
+                else:
+                    self.busNumber = 1
+                self.Print('Trying bus %d instead' % (self.busNumber))
+                self.Init(False)
+            else:
+                self.Print('Are you sure your XLoBorg is properly attached, and the I2C drivers are running?')
+        else:
+            self.Print('XLoBorg loaded on bus %d' % (self.busNumber))
+            if self.foundAccelerometer:
+                self.InitAccelerometer()
+            if self.foundCompass:
+                self.InitCompass()
+
+
+    def WriteRegister(self, address, register, data, name):
+        """
+WriteRegister(address, register, data, name)
+
+Writes a single register value to one of the chips, printing a message using name if it fails
+        """
+        try:
+            self.i2cBus.Write(address, register, [data])
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.Print('Failed sending %s!' % (name))
+
+
+    def InitAccelerometer(self):
+        """
+InitAccelerometer()
+
+Initialises the accelerometer to default states, the same as the module level InitAccelerometer
+        """
+        # Setup mode configuration
+        self.SetAccelerometerDataRate(ACCEL_DATA_RATES[0])
+
+        # Setup range
+        data = 0x00                 # Range 2G, no high pass filtering
+        self.WriteRegister(self.addressAccelerometer, ACCEL_REG_XYZ_DATA_CFG, data, 'XYZ_DATA_CFG')
+        self.gPerCount = 2.0 / 128  # 2G over 128 counts
+
+        # System state
+        data = 0x01                 # Awake mode
+        self.WriteRegister(self.addressAccelerometer, ACCEL_REG_SYSMOD, data, 'SYSMOD')
+
+
+    def SetAccelerometerDataRate(self, rate):
+        """
+rate = SetAccelerometerDataRate(rate)
+
+Sets how many samples per second the accelerometer takes, using the slowest rate the chip supports which is at least rate
+The supported rates are listed in ACCEL_DATA_RATES, from 1.56 to 800 samples per second
+Returns the rate used, which is also kept in accelerometerRate
+        """
+        setting = 0
+        for i in range(len(ACCEL_DATA_RATES)):
+            if ACCEL_DATA_RATES[i] >= rate:
+                setting = i
+        data =  (0 << 6)            # Sleep rate 50 Hz
+        data |= (setting << 3)      # Data rate
+        data |= (0 << 2)            # No reduced noise mode
+        data |= (1 << 1)            # Normal read mode
+        # The rate can only be changed in standby, then go active again
+        self.WriteRegister(self.addressAccelerometer, ACCEL_REG_CTRL_REG1, data, 'CTRL_REG1')
+        data |= (1 << 0)            # Active
+        self.WriteRegister(self.addressAccelerometer, ACCEL_REG_CTRL_REG1, data, 'CTRL_REG1')
+        self.accelerometerRate = ACCEL_DATA_RATES[setting]
+        return self.accelerometerRate
+
+
+    def InitCompass(self):
+        """
+InitCompass()
+
+Initialises the compass to default states, the same as the module level InitCompass
+        """
+        # Acquisition mode
+        data  = (1 << 7)            # Reset before each acquisition
+        data |= (1 << 5)            # Raw mode, do not apply user offsets
+        self.WriteRegister(self.addressCompass, COMPASS_REG_CTRL_REG2, data, 'CTRL_REG2')
+
+        # System operation
+        self.SetCompassDataRate(10)
+
+
+    def SetCompassDataRate(self, rate):
+        """
+rate = SetCompassDataRate(rate)
+
+Sets how many readings per second the compass takes, from 0.625 to 80
+The slowest rate which is at least rate is used, averaging as many samples per reading as that rate allows
+Returns the rate used, which is also kept in compassRate
+        """
+        best = None
+        for dataRate in range(len(COMPASS_ADC_RATES)):
+            for oversample in range(len(COMPASS_OVERSAMPLES)):
+                outputRate = COMPASS_ADC_RATES[dataRate] / COMPASS_OVERSAMPLES[oversample]
+                if outputRate < rate:
+                    continue
+                if best == None or outputRate < best[0] or (outputRate == best[0] and oversample > best[2]):
+                    best = (outputRate, dataRate, oversample)
+        if best == None:
+            # Faster than the compass can go, use its fastest rate
+            best = (COMPASS_ADC_RATES[0] / COMPASS_OVERSAMPLES[0], 0, 0)
+        outputRate, dataRate, oversample = best
+        data  = (dataRate << 5)     # Output data rate
+        data |= (oversample << 3)   # Oversample ratio
+        data |= (0 << 2)            # Disable fast read
+        data |= (0 << 1)            # Continuous measurement
+        # The rate can only be changed in standby, then go active again
+        self.WriteRegister(self.addressCompass, COMPASS_REG_CTRL_REG1, data, 'CTRL_REG1')
+        data |= (1 << 0)            # Active mode
+        self.WriteRegister(self.addressCompass, COMPASS_REG_CTRL_REG1, data, 'CTRL_REG1')
+        self.compassRate = outputRate
+        return self.compassRate
+
+
+    def ReadRegisters(self, address, register, layout):
+        """
+values = ReadRegisters(address, register, layout)
+
+Reads the registers from register onwards in a single burst, decoding them with layout, a struct.Struct
+The chips need a repeated start between the register address and the read, so this always uses ReadCombined
+Returns None if the read fails
+        """
+        try:
+            reply = self.i2cBus.ReadCombined(address, register, layout.size)
+        except KeyboardInterrupt:
+            raise
+        except:
+            reply = None
+        if reply == None or len(reply) < layout.size:
+            self.Print('Failed reading registers!')
+            return None
+        return layout.unpack_from(reply)
+
+
+    def ReadAccelerometer(self):
+        """
+x, y, z = ReadAccelerometer()
+
+Reads the X, Y and Z axis force, in terms of Gs
+        """
+        values = self.ReadRegisters(self.addressAccelerometer, ACCEL_REG_STATUS, ACCEL_STRUCT)
+        if values == None:
+            return 0.0, 0.0, 0.0
+        gPerCount = self.gPerCount
+        return values[1] * gPerCount, values[2] * gPerCount, values[3] * gPerCount
+
+
+    def ReadCompassRaw(self):
+        """
+x, y, z = ReadCompassRaw()
+
+Reads the X, Y and Z axis raw magnetometer readings
+        """
+        values = self.ReadRegisters(self.addressCompass, COMPASS_REG_DR_STATUS, COMPASS_STRUCT)
+        if values == None:
+            return 0, 0, 0
+        return values[1:4]
+
+
+    def ReadTemperature(self):
+        """
+temp = ReadTemperature()
+
+Reads the die temperature of the compass in degrees Celsius
+        """
+        values = self.ReadRegisters(self.addressCompass, COMPASS_REG_DIE_TEMP, TEMPERATURE_STRUCT)
+        if values == None:
+            return 0
+        return values[0] + self.tempOffset
+
+
+    def ReadAll(self):
+        """
+(x, y, z), (mx, my, mz), temp = ReadAll()
+
+Reads the accelerometer in Gs, the raw magnetometer readings and the compass temperature in degrees Celsius
+Each chip is read in a single burst and the bus is held for both, so the readings are taken together
+Readings from a chip which was not found by Init, or which could not be read, are 0
+        """
+        accel = None
+        compass = None
+        with self.i2cBus.Hold(ACCEL_REG_STATUS):
+            if self.foundAccelerometer:
+                accel = self.ReadRegisters(self.addressAccelerometer, ACCEL_REG_STATUS, ACCEL_STRUCT)
+            if self.foundCompass:
+                compass = self.ReadRegisters(self.addressCompass, COMPASS_REG_DR_STATUS, COMPASS_ALL_STRUCT)
+        if accel == None:
+            acceleration = (0.0, 0.0, 0.0)
+        else:
+            gPerCount = self.gPerCount
+            acceleration = (accel[1] * gPerCount, accel[2] * gPerCount, accel[3] * gPerCount)
+        if compass == None:
+            return acceleration, (0, 0, 0), 0
+        return acceleration, compass[1:4], compass[4] + self.tempOffset
+
+
 ### STARTUP ROUTINES ###
 # Default user settings
 printFunction = None
@@ -297,7 +629,7 @@ if __name__ == '__main__':
             x, y, z = ReadAccelerometer()
             mx, my, mz = ReadCompassRaw()
             temp = ReadTemperature()
-            print 'X = %+01.4f G, Y = %+01.4f G, Z = %+01.4f G, mX = %+06d, mY = %+06d, mZ = %+06d, T = %+03dC' % (x, y, z, mx, my, mz, temp)
+            print('X = %+01.4f G, Y = %+01.4f G, Z = %+01.4f G, mX = %+06d, mY = %+06d, mZ = %+06d, T = %+03dC' % (x, y, z, mx, my, mz, temp))
             time.sleep(0.1)
     except KeyboardInterrupt:
         # User aborted
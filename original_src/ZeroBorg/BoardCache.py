@@ -0,0 +1 @@
+../Common/BoardCache.py
\ No newline at end of file
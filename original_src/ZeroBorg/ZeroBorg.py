@@ -27,10 +27,11 @@ See the website at www.piborg.org/zeroborg for more details
 """
 
 # Import the libraries we need
-import io
-import fcntl
+from __future__ import print_function
 import types
 import time
+import I2CBus
+import BoardCache
 
 # Constant values
 I2C_SLAVE               = 0x0703
@@ -82,6 +83,61 @@ COMMAND_ANALOG_MAX      = 0x3FF # Maximum value for analog readings
 
 IR_MAX_BYTES            = I2C_LONG_LEN - 2
 
+# Forward and reverse drive commands for motor 1, motor 2, ..., see CompilePhaseTable
+MOTOR_COMMANDS = ((COMMAND_SET_A_FWD, COMMAND_SET_A_REV),
+                  (COMMAND_SET_B_FWD, COMMAND_SET_B_REV),
+                  (COMMAND_SET_C_FWD, COMMAND_SET_C_REV),
+                  (COMMAND_SET_D_FWD, COMMAND_SET_D_REV))
+
+# Shadow registers used by the write cache, see ZeroBorg.writeCache
+# Motor and LED writes, giving the registers set and the direction value added before the data (None for no direction)
+CACHED_WRITES = {
+    COMMAND_SET_A_FWD: (['A'], COMMAND_VALUE_FWD),
+    COMMAND_SET_A_REV: (['A'], COMMAND_VALUE_REV),
+    COMMAND_SET_B_FWD: (['B'], COMMAND_VALUE_FWD),
+    COMMAND_SET_B_REV: (['B'], COMMAND_VALUE_REV),
+    COMMAND_SET_C_FWD: (['C'], COMMAND_VALUE_FWD),
+    COMMAND_SET_C_REV: (['C'], COMMAND_VALUE_REV),
+    COMMAND_SET_D_FWD: (['D'], COMMAND_VALUE_FWD),
+    COMMAND_SET_D_REV: (['D'], COMMAND_VALUE_REV),
+    COMMAND_SET_ALL_FWD: (['A', 'B', 'C', 'D'], COMMAND_VALUE_FWD),
+    COMMAND_SET_ALL_REV: (['A', 'B', 'C', 'D'], COMMAND_VALUE_REV),
+    COMMAND_ALL_OFF: (['A', 'B', 'C', 'D'], COMMAND_VALUE_FWD),
+    COMMAND_SET_LED: (['LED'], None),
+    COMMAND_SET_LED_IR: (['LED_IR'], None),
+}
+# Reads which can be answered from a shadow register
+CACHED_READS = {
+    COMMAND_GET_A: 'A',
+    COMMAND_GET_B: 'B',
+    COMMAND_GET_C: 'C',
+    COMMAND_GET_D: 'D',
+    COMMAND_GET_LED: 'LED',
+    COMMAND_GET_LED_IR: 'LED_IR',
+}
+# Writes which change shadow registers in ways the cache cannot follow
+CACHE_INVALIDATES = {
+    COMMAND_RESET_EPO: ['A', 'B', 'C', 'D'],
+    COMMAND_SET_EPO_IGNORE: ['A', 'B', 'C', 'D'],
+    COMMAND_SET_LED_IR: ['LED'],
+}
+
+# Read cache, see ZeroBorg.readCache
+# Time in seconds each cached reply is kept for, keyed by the GET command
+READ_CACHE_TTL = {
+    COMMAND_GET_ID: 60.0,
+    COMMAND_GET_FAILSAFE: 5.0,
+    COMMAND_GET_EPO_IGNORE: 5.0,
+    COMMAND_GET_LED_IR: 5.0,
+}
+# Cached replies to forget when a command is sent
+READ_CACHE_INVALIDATES = {
+    COMMAND_SET_I2C_ADD: [COMMAND_GET_ID],
+    COMMAND_SET_FAILSAFE: [COMMAND_GET_FAILSAFE],
+    COMMAND_SET_EPO_IGNORE: [COMMAND_GET_EPO_IGNORE],
+    COMMAND_SET_LED_IR: [COMMAND_GET_LED_IR],
+}
+
 def ScanForZeroBorg(busNumber = 1):
     """
 ScanForZeroBorg([busNumber])
@@ -90,7 +146,7 @@ Scans the I
 The busNumber if supplied is which IC bus to scan, 0 for Rev 1 boards, 1 for Rev 2 boards, if not supplied the default is 1
     """
     found = []
-    print 'Scanning IC bus #%d' % (busNumber)
+    print('Scanning IC bus #%d' % (busNumber))
     bus = ZeroBorg()
     for address in range(0x03, 0x78, 1):
         try:
@@ -98,7 +154,7 @@ The busNumber if supplied is which I
             i2cRecv = bus.RawRead(COMMAND_GET_ID, I2C_NORM_LEN)
             if len(i2cRecv) == I2C_NORM_LEN:
                 if i2cRecv[1] == I2C_ID_ZEROBORG:
-                    print 'Found ZeroBorg at %02X' % (address)
+                    print('Found ZeroBorg at %02X' % (address))
                     found.append(address)
                 else:
                     pass
@@ -109,11 +165,11 @@ The busNumber if supplied is which I
         except:
             pass
     if len(found) == 0:
-        print 'No ZeroBorg boards found, is bus #%d correct (should be 0 for Rev 1, 1 for Rev 2)' % (busNumber)
+        print('No ZeroBorg boards found, is bus #%d correct (should be 0 for Rev 1, 1 for Rev 2)' % (busNumber))
     elif len(found) == 1:
-        print '1 ZeroBorg board found'
+        print('1 ZeroBorg board found')
     else:
-        print '%d ZeroBorg boards found' % (len(found))
+        print('%d ZeroBorg boards found' % (len(found)))
     return found
 
 
@@ -127,19 +183,19 @@ The busNumber if supplied is which I
 Warning, this new IC address will still be used after resetting the power on the device
     """
     if newAddress < 0x03:
-        print 'Error, IC addresses below 3 (0x03) are reserved, use an address between 3 (0x03) and 119 (0x77)'
+        print('Error, IC addresses below 3 (0x03) are reserved, use an address between 3 (0x03) and 119 (0x77)')
         return
     elif newAddress > 0x77:
-        print 'Error, IC addresses above 119 (0x77) are reserved, use an address between 3 (0x03) and 119 (0x77)'
+        print('Error, IC addresses above 119 (0x77) are reserved, use an address between 3 (0x03) and 119 (0x77)')
         return
     if oldAddress < 0x0:
         found = ScanForZeroBorg(busNumber)
         if len(found) < 1:
-            print 'No ZeroBorg boards found, cannot set a new IC address!'
+            print('No ZeroBorg boards found, cannot set a new IC address!')
             return
         else:
             oldAddress = found[0]
-    print 'Changing IC address from %02X to %02X (bus #%d)' % (oldAddress, newAddress, busNumber)
+    print('Changing IC address from %02X to %02X (bus #%d)' % (oldAddress, newAddress, busNumber))
     bus = ZeroBorg()
     bus.InitBusOnly(busNumber, oldAddress)
     try:
@@ -147,56 +203,66 @@ Warning, this new I
         if len(i2cRecv) == I2C_NORM_LEN:
             if i2cRecv[1] == I2C_ID_ZEROBORG:
                 foundChip = True
-                print 'Found ZeroBorg at %02X' % (oldAddress)
+                print('Found ZeroBorg at %02X' % (oldAddress))
             else:
                 foundChip = False
-                print 'Found a device at %02X, but it is not a ZeroBorg (ID %02X instead of %02X)' % (oldAddress, i2cRecv[1], I2C_ID_ZEROBORG)
+                print('Found a device at %02X, but it is not a ZeroBorg (ID %02X instead of %02X)' % (oldAddress, i2cRecv[1], I2C_ID_ZEROBORG))
         else:
             foundChip = False
-            print 'Missing ZeroBorg at %02X' % (oldAddress)
+            print('Missing ZeroBorg at %02X' % (oldAddress))
     except KeyboardInterrupt:
         raise
     except:
         foundChip = False
-        print 'Missing ZeroBorg at %02X' % (oldAddress)
+        print('Missing ZeroBorg at %02X' % (oldAddress))
     if foundChip:
         bus.RawWrite(COMMAND_SET_I2C_ADD, [newAddress])
         time.sleep(0.1)
-        print 'Address changed to %02X, attempting to talk with the new address' % (newAddress)
+        print('Address changed to %02X, attempting to talk with the new address' % (newAddress))
         try:
             bus.InitBusOnly(busNumber, newAddress)
             i2cRecv = bus.RawRead(COMMAND_GET_ID, I2C_NORM_LEN)
             if len(i2cRecv) == I2C_NORM_LEN:
                 if i2cRecv[1] == I2C_ID_ZEROBORG:
                     foundChip = True
-                    print 'Found ZeroBorg at %02X' % (newAddress)
+                    print('Found ZeroBorg at %02X' % (newAddress))
                 else:
                     foundChip = False
-                    print 'Found a device at %02X, but it is not a ZeroBorg (ID %02X instead of %02X)' % (newAddress, i2cRecv[1], I2C_ID_ZEROBORG)
+                    print('Found a device at %02X, but it is not a ZeroBorg (ID %02X instead of %02X)' % (newAddress, i2cRecv[1], I2C_ID_ZEROBORG))
             else:
                 foundChip = False
-                print 'Missing ZeroBorg at %02X' % (newAddress)
+                print('Missing ZeroBorg at %02X' % (newAddress))
         except KeyboardInterrupt:
             raise
         except:
             foundChip = False
-            print 'Missing ZeroBorg at %02X' % (newAddress)
+            print('Missing ZeroBorg at %02X' % (newAddress))
     if foundChip:
-        print 'New IC address of %02X set successfully' % (newAddress)
+        print('New IC address of %02X set successfully' % (newAddress))
     else:
-        print 'Failed to set new IC address...'
+        print('Failed to set new IC address...')
 
 
 # Class used to control ZeroBorg
-class ZeroBorg:
+class ZeroBorg(BoardCache.ReadCache, BoardCache.WriteCache):
     """
 This module is designed to communicate with the ZeroBorg
 
 busNumber               IC bus on which the ZeroBorg is attached (Rev 1 is bus 0, Rev 2 is bus 1)
 bus                     the smbus object used to talk to the IC bus
+i2cBus                  The shared I2CBus transport used to talk to the IC bus
 i2cAddress              The IC address of the ZeroBorg chip to control
 foundChip               True if the ZeroBorg chip can be seen, False otherwise
 printFunction           Function reference to call when printing text, if None "print" is used
+writeCache              True to skip motor and LED writes which would not change anything, see RawWrite
+readFromCache           True to answer motor and LED reads from the values written, with or without writeCache, see RawRead
+cacheRefresh            Time in seconds before a cached value is sent again, or read from the board again
+skipUnchanged           True to have SetMotorsIndividually only send motors which have changed since its last call
+motorUpdateTime         Time in seconds the last SetMotorsIndividually call held the bus for
+readCache               True to keep replies to reads of values which only change when written, see RawRead
+readCacheTtl            Time in seconds each cached reply is kept for, keyed by the GET command
+readCacheHits           Number of reads answered from the read cache
+readCacheMisses         Number of reads which could have been cached but had to be read from the board
     """
 
     # Shared values used by this class
@@ -204,8 +270,24 @@ printFunction           Function reference to call when printing text, if None "
     i2cAddress              = I2C_ID_ZEROBORG   # IC address, override for a different address
     foundChip               = False
     printFunction           = None
-    i2cWrite                = None
-    i2cRead                 = None
+    i2cBus                  = None
+    readCache               = False
+    readCacheTtl            = READ_CACHE_TTL    # Replace, rather than change, to use different times for one board
+    readCacheInvalidates    = READ_CACHE_INVALIDATES
+    readCacheHits           = 0
+    readCacheMisses         = 0
+    readCacheEntries        = None              # Cached reply and time read for each GET command
+    writeCache              = False
+    readFromCache           = False
+    cacheRefresh            = 0.1               # Keep below the 1/4 second the communications failsafe allows
+    shadowRegisters         = None              # Last value and time sent for each register, keyed by register name
+    cachedWrites            = CACHED_WRITES
+    cachedReads             = CACHED_READS
+    cacheInvalidates        = CACHE_INVALIDATES
+    skipUnchanged           = False
+    motorUpdateTime         = 0.0
+    lastMotorFrames         = None              # [command, pwm] last sent by SetMotorsIndividually for each motor
+    lastMotorTimes          = None              # Time each of lastMotorFrames was sent
 
 
     def RawWrite(self, command, data):
@@ -215,12 +297,16 @@ RawWrite(command, data)
 Sends a raw command on the I2C bus to the ZeroBorg
 Command codes can be found at the top of ZeroBorg.py, data is a list of 0 or more byte values
 
+If writeCache is True motor and LED writes are skipped if they match the values last sent less than cacheRefresh seconds ago,
+resending after cacheRefresh seconds keeps the communications failsafe from stopping the motors
+
+Writes which change a value held in the read cache remove it from the cache, see READ_CACHE_INVALIDATES
+The caches are shared with the other board modules, see BoardCache
+
 Under most circumstances you should use the appropriate function instead of RawWrite
         """
-        rawOutput = chr(command)
-        for singleByte in data:
-            rawOutput += chr(singleByte)
-        self.i2cWrite.write(rawOutput)
+        self.ForgetReadCache(command)
+        self.CachedWrite(command, data)
 
 
     def RawRead(self, command, length, retryCount = 3):
@@ -232,20 +318,29 @@ Command codes can be found at the top of ZeroBorg.py, length is the number of by
 
 The function checks that the first byte read back matches the requested command
 If it does not it will retry the request until retryCount is exhausted (default is 3 times)
+If combined reads are enabled on the bus (i2cBus.SetCombinedReads(True)) each attempt is a single I2C_RDWR transaction
+If readFromCache is True motor and LED reads are answered from the write cache when it has a recent enough value
+If readCache is True replies to the commands in readCacheTtl are kept for that long and reused
 
 Under most circumstances you should use the appropriate function instead of RawRead
         """
+        if self.readCache:
+            reply = self.LookupReadCache(command, length)
+            if reply != None:
+                return reply
+        if self.readFromCache:
+            reply = self.ReadWriteCache(command, length)
+            if reply != None:
+                return reply
         while retryCount > 0:
-            self.RawWrite(command, [])
-            rawReply = self.i2cRead.read(length)
-            reply = []
-            for singleByte in rawReply:
-                reply.append(ord(singleByte))
+            reply = self.i2cBus.Read(self.i2cAddress, command, length)
             if command == reply[0]:
                 break
             else:
                 retryCount -= 1
         if retryCount > 0:
+            if self.readCache:
+                self.StoreReadCache(command, reply)
             return reply
         else:
             raise IOError('I2C read for command %d failed' % (command))
@@ -260,10 +355,7 @@ This call does not check the board is present or working, under most circumstanc
         """
         self.busNumber = busNumber
         self.i2cAddress = address
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        self.i2cBus = I2CBus.GetBus(self.busNumber)
 
 
     def Print(self, message):
@@ -273,7 +365,7 @@ Print(message)
 Wrapper used by the ZeroBorg instance to print messages, will call printFunction if set, print otherwise
         """
         if self.printFunction == None:
-            print message
+            print(message)
         else:
             self.printFunction(message)
 
@@ -300,11 +392,8 @@ If tryOtherBus is True, this function will attempt to use the other bus if the T
         """
         self.Print('Loading ZeroBorg on bus %d, address %02X' % (self.busNumber, self.i2cAddress))
 
-        # Open the bus
-        self.i2cRead = io.open("/dev/i2c-" + str(self.busNumber), "rb", buffering = 0)
-        fcntl.ioctl(self.i2cRead, I2C_SLAVE, self.i2cAddress)
-        self.i2cWrite = io.open("/dev/i2c-" + str(self.busNumber), "wb", buffering = 0)
-        fcntl.ioctl(self.i2cWrite, I2C_SLAVE, self.i2cAddress)
+        # Open the bus, shared with any other boards already using it
+        self.i2cBus = I2CBus.GetBus(self.busNumber)
 
         # Check for ZeroBorg
         try:
@@ -618,6 +707,122 @@ SetMotors(1)     -> all motors are moving forward at 100% power
             self.Print('Failed sending all motors drive level!')
 
 
+    def SetMotorsIndividually(self, power1, power2, power3, power4):
+        """
+SetMotorsIndividually(power1, power2, power3, power4)
+
+Sets the drive level for each of the four motors, from +1 to -1, in a single update.
+e.g.
+SetMotorsIndividually(0, 0, 0, 0)           -> all motors are stopped
+SetMotorsIndividually(0.5, 0.5, -0.5, -0.5) -> motors 1 and 2 forward, motors 3 and 4 reverse, at 50% power
+
+All four levels are worked out before anything is sent, then the four commands are sent back to back
+while holding the bus, so no other board on the bus can delay some of the motors changing.
+The time the bus was held for is stored in motorUpdateTime.
+
+If skipUnchanged is True only motors with a different drive level to the last call are sent,
+along with any motor which has not been sent for cacheRefresh seconds so the communications failsafe keeps being fed.
+Motor changes made by other functions are not seen, call with skipUnchanged False to resend all four.
+        """
+        frames = []
+        for power, commandFwd, commandRev in ((power1, COMMAND_SET_A_FWD, COMMAND_SET_A_REV),
+                                              (power2, COMMAND_SET_B_FWD, COMMAND_SET_B_REV),
+                                              (power3, COMMAND_SET_C_FWD, COMMAND_SET_C_REV),
+                                              (power4, COMMAND_SET_D_FWD, COMMAND_SET_D_REV)):
+            if power < 0:
+                # Reverse
+                command = commandRev
+                pwm = -int(PWM_MAX * power)
+            else:
+                # Forward / stopped
+                command = commandFwd
+                pwm = int(PWM_MAX * power)
+            if pwm > PWM_MAX:
+                pwm = PWM_MAX
+            frames.append([command, pwm])
+
+        lastFrames = self.lastMotorFrames
+        lastTimes = self.lastMotorTimes
+        if (not self.skipUnchanged) or (lastFrames == None):
+            lastFrames = [None, None, None, None]
+            lastTimes = [None, None, None, None]
+        # Unchanged motors are still resent every cacheRefresh seconds, nothing to send means no turn on the bus is needed
+        oldest = I2CBus.monotonic() - self.cacheRefresh
+        changed = [motor for motor in range(4)
+                   if frames[motor] != lastFrames[motor] or lastTimes[motor] == None or lastTimes[motor] < oldest]
+        try:
+            self.motorUpdateTime = 0.0
+            times = list(lastTimes)
+            if changed:
+                with self.i2cBus.Hold(frames[changed[0]][0]):
+                    startTime = I2CBus.monotonic()
+                    for motor in changed:
+                        frame = frames[motor]
+                        self.RawWrite(frame[0], frame[1:])
+                        times[motor] = startTime
+                    self.motorUpdateTime = I2CBus.monotonic() - startTime
+            self.lastMotorFrames = frames
+            self.lastMotorTimes = times
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.lastMotorFrames = None
+            self.lastMotorTimes = None
+            self.Print('Failed sending motor drive levels!')
+
+
+    def CompilePhaseTable(self, sequence, firstMotor = 1):
+        """
+phases = CompilePhaseTable(sequence, [firstMotor])
+
+Works out the motor commands for every entry of a stepping sequence in one go, ready to send with SendPhase
+sequence is a list of drive levels, from +1 to -1, for each motor starting at firstMotor
+e.g.
+phases = CompilePhaseTable([[1.0, 1.0], [1.0, -1.0], [-1.0, -1.0], [-1.0, 1.0]])
+SendPhase(phases[1])    -> motor 1 forward and motor 2 reverse at 100% power
+Returns a list with the [command, [pwm]] to send for each motor for each entry of the sequence
+        """
+        phases = []
+        for drives in sequence:
+            frames = []
+            for motor in range(len(drives)):
+                power = drives[motor]
+                commandFwd, commandRev = MOTOR_COMMANDS[firstMotor - 1 + motor]
+                if power < 0:
+                    # Reverse
+                    command = commandRev
+                    pwm = -int(PWM_MAX * power)
+                else:
+                    # Forward / stopped
+                    command = commandFwd
+                    pwm = int(PWM_MAX * power)
+                if pwm > PWM_MAX:
+                    pwm = PWM_MAX
+                frames.append([command, [pwm]])
+            phases.append(frames)
+        return phases
+
+
+    def SendPhase(self, frames):
+        """
+SendPhase(frames)
+
+Sends one entry of a stepping sequence made by CompilePhaseTable, the motors are set together while holding the bus
+e.g.
+SendPhase(phases[step])
+        """
+        if len(frames) == 0:
+            return
+        try:
+            with self.i2cBus.Hold(frames[0][0]):
+                for command, data in frames:
+                    self.RawWrite(command, data)
+        except KeyboardInterrupt:
+            raise
+        except:
+            self.Print('Failed sending stepper phase!')
+
+
     def MotorsOff(self):
         """
 MotorsOff()
@@ -920,10 +1125,10 @@ Help()
 Displays the names and descriptions of the various functions and settings provided
         """
         funcList = [ZeroBorg.__dict__.get(a) for a in dir(ZeroBorg) if isinstance(ZeroBorg.__dict__.get(a), types.FunctionType)]
-        funcListSorted = sorted(funcList, key = lambda x: x.func_code.co_firstlineno)
+        funcListSorted = sorted(funcList, key = lambda x: x.__code__.co_firstlineno)
 
-        print self.__doc__
-        print
+        print(self.__doc__)
+        print()
         for func in funcListSorted:
-            print '=== %s === %s' % (func.func_name, func.func_doc)
+            print('=== %s === %s' % (func.__name__, func.__doc__))
 
@@ -147,10 +147,7 @@ try:
                     driveLeft *= slowFactor
                     driveRight *= slowFactor
                 # Set the motors to the new speeds
-                ZB.SetMotor1(-driveLeft * maxPower)
-                ZB.SetMotor2(-driveLeft * maxPower)
-                ZB.SetMotor3(driveRight * maxPower)
-                ZB.SetMotor4(driveRight * maxPower)
+                ZB.SetMotorsIndividually(-driveLeft * maxPower, -driveLeft * maxPower, driveRight * maxPower, driveRight * maxPower)
         # Change the LED to reflect the status of the EPO latch
         ZB.SetLed(ZB.GetEpo())
         # Wait for the interval period
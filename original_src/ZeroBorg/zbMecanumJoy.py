@@ -169,10 +169,7 @@ try:
                     driveRL *= slowFactor
                     driveRR *= slowFactor
                 # Set the motors to the new speeds
-                ZB.SetMotor1(-driveFL * maxPower)
-                ZB.SetMotor2(-driveRL * maxPower)
-                ZB.SetMotor3(+driveFR * maxPower)
-                ZB.SetMotor4(+driveRR * maxPower)
+                ZB.SetMotorsIndividually(-driveFL * maxPower, -driveRL * maxPower, +driveFR * maxPower, +driveRR * maxPower)
         # Change the LED to reflect the status of the EPO latch
         ZB.SetLed(ZB.GetEpo())
         # Wait for the interval period
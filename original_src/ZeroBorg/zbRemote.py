@@ -39,10 +39,7 @@ else:
 # Remote control commands
 def Move(left, right):
     print '%0.2f | %0.2f' % (left, right)
-    ZB.SetMotor1(-left * maxPower)
-    ZB.SetMotor2(-left * maxPower)
-    ZB.SetMotor3(right * maxPower)
-    ZB.SetMotor4(right * maxPower)  
+    ZB.SetMotorsIndividually(-left * maxPower, -left * maxPower, right * maxPower, right * maxPower)
 
 def MoveForward():
     Move(+1.0, +1.0)
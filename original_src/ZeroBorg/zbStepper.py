@@ -38,6 +38,9 @@ if not ZB.foundChip:
 ZB.ResetEpo()
 step = -1
 
+# Work out the motor commands for each step once, ready to send
+phases = ZB.CompilePhaseTable(sequence)
+
 # Function to perform a sequence of steps as fast as allowed
 def MoveStep(count):
     global step
@@ -54,9 +57,7 @@ def MoveStep(count):
     while count > 0:
         # Set a starting position if this is the first move
         if step == -1:
-            drive = sequence[-1]
-            ZB.SetMotor1(drive[0])
-            ZB.SetMotor2(drive[1])
+            ZB.SendPhase(phases[-1])
             step = 0
         else:
             step += dir
@@ -69,9 +70,7 @@ def MoveStep(count):
 
         # For this step set the required drive values
         if step < len(sequence):
-            drive = sequence[step]
-            ZB.SetMotor1(drive[0])
-            ZB.SetMotor2(drive[1])
+            ZB.SendPhase(phases[step])
         time.sleep(stepDelay)
         count -= 1
 
@@ -46,6 +46,10 @@ if not ZB.foundChip:
 #ZB.SetEpoIgnore(True)                 # Uncomment to disable EPO latch, needed if you do not have a switch / jumper
 ZB.ResetEpo()
 
+# Work out the motor commands for each step once, ready to send
+phases12 = ZB.CompilePhaseTable(sequence, 1)
+phases34 = ZB.CompilePhaseTable(sequence, 3)
+
 # Stepper movement thread
 class StepperController(threading.Thread):
     def __init__(self, stepper):
@@ -85,13 +89,10 @@ class StepperController(threading.Thread):
         while (count > 0) and (not self.terminated):
             # Set a starting position if this is the first move
             if self.step == -1:
-                drive = sequence[-1]
                 if stepper == 1:
-                    ZB.SetMotor1(drive[0])
-                    ZB.SetMotor2(drive[1])
+                    ZB.SendPhase(phases12[-1])
                 elif stepper == 2:
-                    ZB.SetMotor3(drive[0])
-                    ZB.SetMotor4(drive[1])
+                    ZB.SendPhase(phases34[-1])
                 self.step = 0
                 time.sleep(timedDelay)
             else:
@@ -105,13 +106,10 @@ class StepperController(threading.Thread):
 
             # For this step set the required drive values
             if self.step < len(sequence):
-                drive = sequence[self.step]
                 if stepper == 1:
-                    ZB.SetMotor1(drive[0])
-                    ZB.SetMotor2(drive[1])
+                    ZB.SendPhase(phases12[self.step])
                 elif stepper == 2:
-                    ZB.SetMotor3(drive[0])
-                    ZB.SetMotor4(drive[1])
+                    ZB.SendPhase(phases34[self.step])
             time.sleep(timedDelay)
             count -= 1
 